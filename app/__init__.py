@@ -1,10 +1,13 @@
 import logging
 import os
+import sqlite3
 
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
 from flask_socketio import SocketIO
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 from config import Config
 
@@ -23,10 +26,30 @@ logging.basicConfig(filename='data/log/app.log', filemode='a',
                     level=logging.INFO)
 
 
+@event.listens_for(Engine, 'connect')
+def sqlite_pragmas(connection, record):
+    """Tunes the SQLite connections for concurrent readers and a single
+    writer."""
+
+    if not app.config['SQLITE_WAL'] or not isinstance(connection,
+                                                      sqlite3.Connection):
+        return
+
+    cursor = connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA cache_size=-{app.config["SQLITE_CACHE_SIZE"]}')
+    cursor.execute(f'PRAGMA busy_timeout={app.config["SQLITE_BUSY_TIMEOUT"]}')
+    cursor.close()
+
+
 from app import models
+from app.core import profiling
 from app.routes import creation, detection, mitigation, root, setting
 
 
+profiling.configure(app.config['PROFILING_SAMPLE'])
+
 app.register_blueprint(root.bp)
 app.register_blueprint(creation.bp, url_prefix='/creation')
 app.register_blueprint(detection.bp, url_prefix='/detection')
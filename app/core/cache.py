@@ -0,0 +1,509 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import zip_longest
+
+from sqlalchemy import and_, bindparam, func
+
+from app import db
+from app.core.columnar import (count_bits, pack_bitmap, port_bitmap,
+                               unpack_bitmap)
+from app.models import Intrusion
+
+
+logger = logging.getLogger('cache')
+
+
+class IntrusionCache:
+    """Active intrusions kept in memory and written behind to the database.
+
+    Each intrusion is identified by the source address, destination address
+    and protocol, its counters and port bitmaps are updated in memory and the
+    new and updated intrusions are written in a single transaction
+    periodically.
+
+    The writes are executed by a DatabaseWriter, if any, so the primary keys
+    assigned by the database to the new intrusions are collected in the next
+    write. Meanwhile, and whenever the intrusion was deleted by others, the
+    rows are found by source, destination and protocol. Only the rows of a
+    write are checked for deletions by others, which are otherwise notified
+    through the discard method, e.g. by the intrusions page.
+
+    The intrusions older than the hard timeout expire. Their deadlines are
+    kept in a heap, so only the intrusions near the deadline are checked.
+    The idle rules are removed by the switch, which also counts the dropped
+    packets, so the intrusions are not expired by the detected flows, which
+    stop once blocked. Instead, the flows of a blocked intrusion detected
+    after the idle timeout mean that its rule was removed.
+
+    Attributes
+    ----------
+    self.interval: float
+        Minimum seconds between the writes.
+    self.intrusions: dict
+        Intrusion state by source, destination and protocol.
+    self.updated: set
+        Keys of the intrusions created or updated since the last write.
+    self.created: set
+        Keys of the intrusions never written.
+    self.writer: obj
+        DatabaseWriter instance, None to write in the calling thread.
+    self.results: list
+        Results of the writes executed in the calling thread.
+    self.discarded: set
+        Keys of the intrusions deleted by others since the last write.
+    self.lock: obj
+        Lock of the discarded intrusions, they are notified by other
+        threads.
+    self.count: int
+        Number of intrusions in the database, including those not written
+        yet.
+    self.flushed: float
+        Time of the last write.
+    self.idle_timeout: float
+        Seconds without packets before the switch removes a rule, 0 if it is
+        never removed.
+    self.hard_timeout: float
+        Seconds before an intrusion expires, 0 to never expire.
+    self.batch: int
+        Maximum number of intrusions expired at once.
+    self.deadlines: list
+        Heap of the deadline and key of the intrusions, a deadline can be
+        earlier than the current deadline of its intrusion."""
+
+    def __init__(self, interval, idle_timeout=0, hard_timeout=0, batch=1000,
+                 writer=None):
+        self.interval = interval
+        self.intrusions = dict()
+        self.updated = set()
+        self.created = set()
+        self.writer = writer
+        self.results = list()
+        self.discarded = set()
+        self.lock = threading.Lock()
+        self.count = 0
+        self.flushed = time.time()
+        self.idle_timeout = idle_timeout
+        self.hard_timeout = hard_timeout
+        self.batch = batch
+        self.deadlines = list()
+        self.load()
+
+    def __contains__(self, key):
+        return key in self.intrusions
+
+    def load(self):
+        """Loads the intrusions of the database with their deadlines since
+        the last flows, so those past the hard timeout are deleted and
+        unblocked by the next expire. Without a hard timeout, the intrusions
+        are loaded by find when detected again."""
+
+        self.count = db.session.query(func.count(Intrusion.id)).scalar()
+        if not self.hard_timeout:
+            return
+
+        now = datetime.now()
+        for intrusion in Intrusion.query:
+            elapsed = (now - intrusion.end_time).total_seconds()
+            self.add(intrusion, time.monotonic() - elapsed)
+        logger.info(f'loaded intrusions: {len(self.intrusions)}')
+
+    def find(self, key):
+        """Loads an intrusion saved by others, e.g. another detection, through
+        the index of source, destination and protocol.
+
+        Parameters
+        ----------
+        key: tuple
+            Source address, destination address and protocol.
+
+        Returns
+        -------
+        bool
+            True if the intrusion is in memory and False otherwise."""
+
+        if key in self.intrusions:
+            return True
+
+        # only the primary key is selected, the intrusion is rarely found.
+        pk = db.session.query(Intrusion.id).filter_by(
+            source_address=key[0], destination_address=key[1],
+            protocol=key[2]).scalar()
+        if pk is None:
+            return False
+
+        self.add(Intrusion.query.get(pk))
+
+        return True
+
+    def add(self, intrusion, created=None):
+        """Adds an intrusion, it is saved in the next write if it has no
+        primary key.
+
+        Parameters
+        ----------
+        intrusion: obj
+            Intrusion object.
+        created: float
+            Monotonic time from which the intrusion expires, by default the
+            current time."""
+
+        key = (intrusion.source_address, intrusion.destination_address,
+               intrusion.protocol)
+        if intrusion.id is None:
+            self.created.add(key)
+            self.count += 1
+
+        self.intrusions[key] = {'id': intrusion.id,
+                                'source_address': intrusion.source_address,
+                                'destination_address':
+                                    intrusion.destination_address,
+                                'protocol': intrusion.protocol,
+                                'start_time': intrusion.start_time,
+                                'end_time': intrusion.end_time,
+                                'flags': intrusion.flags,
+                                'source_port':
+                                    unpack_bitmap(intrusion.source_port),
+                                'destination_port':
+                                    unpack_bitmap(intrusion.destination_port),
+                                'packets': intrusion.packets,
+                                'bytes': intrusion.bytes,
+                                'flows': intrusion.flows,
+                                'rule': intrusion.rule,
+                                'model_id': intrusion.model_id,
+                                'created': time.monotonic()
+                                    if created is None else created,
+                                'seen': time.monotonic()}
+
+        deadline = self.deadline(self.intrusions[key])
+        if deadline is not None:
+            heapq.heappush(self.deadlines, (deadline, key))
+
+        if key in self.created:
+            # columns saved if the intrusion is not updated before the write.
+            self.intrusions[key]['row'] = {
+                column.key: getattr(intrusion, column.key)
+                for column in Intrusion.__table__.columns}
+            self.updated.add(key)
+
+    def discard(self, key):
+        """Notifies an intrusion deleted by others, it is removed from
+        memory in the next write.
+
+        Parameters
+        ----------
+        key: tuple
+            Source address, destination address and protocol."""
+
+        with self.lock:
+            self.discarded.add(key)
+
+    def block(self, key, rule):
+        """Sets the flow rule of an intrusion.
+
+        Parameters
+        ----------
+        key: tuple
+            Source address, destination address and protocol.
+        rule: str
+            Rule name."""
+
+        if key in self.intrusions:
+            self.intrusions[key]['rule'] = rule
+            self.updated.add(key)
+
+    def update(self, flow):
+        """Aggregates a modified flow in its intrusion.
+
+        Parameters
+        ----------
+        flow: list
+            Modified flow of a known intrusion.
+
+        Returns
+        -------
+        str
+            Rule removed by the switch for being idle, the intrusion must be
+            blocked again, None otherwise."""
+
+        key = (flow[2], flow[3], flow[4])
+        intrusion = self.intrusions[key]
+
+        removed = None
+        if (self.idle_timeout and intrusion['rule'] != 'no rule' and
+                time.monotonic() - intrusion['seen'] >= self.idle_timeout):
+            removed = intrusion['rule']
+            intrusion['rule'] = 'no rule'
+
+        intrusion['end_time'] = flow[1]
+        # the flows of other protocols have a single flags count.
+        intrusion['flags'] = [x+y for x, y in zip_longest(intrusion['flags'],
+                                                          flow[5],
+                                                          fillvalue=0)]
+        intrusion['source_port'] |= port_bitmap(flow[6])
+        intrusion['destination_port'] |= port_bitmap(flow[7])
+        intrusion['packets'] += flow[9]
+        intrusion['bytes'] += flow[10]
+        intrusion['flows'] += flow[16]
+        intrusion['seen'] = time.monotonic()
+        intrusion.pop('row', None)
+
+        self.updated.add(key)
+
+        return removed
+
+    def flush(self, force=False):
+        """Writes the new and updated intrusions in a single transaction.
+
+        The primary keys of the intrusions written before are collected, and
+        the intrusions removed from the database, e.g. false positives, are
+        also removed from memory. Nothing is written without new or updated
+        intrusions.
+
+        Parameters
+        ----------
+        force: bool
+            Whether to write before the interval."""
+
+        if not force and time.time() - self.flushed < self.interval:
+            return
+        self.flushed = time.time()
+
+        if self.writer is not None:
+            results = self.writer.collect()
+        else:
+            results, self.results = self.results, list()
+        missing = set()
+        for created, removed in results:
+            for source, destination, protocol, pk in created:
+                intrusion = self.intrusions.get((source, destination,
+                                                 protocol))
+                if intrusion is not None and intrusion['id'] is None:
+                    intrusion['id'] = pk
+            missing.update(removed)
+        with self.lock:
+            discarded, self.discarded = self.discarded, set()
+        discarded.update(key for key, intrusion in self.intrusions.items()
+                         if intrusion['id'] in missing)
+        for key in discarded:
+            self.intrusions.pop(key, None)
+            self.updated.discard(key)
+            self.created.discard(key)
+        self.count -= len(discarded)
+
+        created = [key for key in self.updated if key in self.created]
+        inserts = list()
+        for key in created:
+            intrusion = self.intrusions[key]
+            row = intrusion.pop('row', None) or self.row(intrusion)
+            row['rule'] = intrusion['rule']
+            inserts.append(row)
+        updates = [self.row(self.intrusions[key])
+                   for key in self.updated.difference(created)]
+        if created or updates:
+            logger.info(f'created intrusions: {len(inserts)}, '
+                        f'updated intrusions: {len(updates)}')
+        self.created.clear()
+        self.updated.clear()
+
+        if inserts or updates:
+            self.submit(lambda: self.write(inserts, updates, list()))
+
+    def submit(self, write):
+        """Executes a write through the writer or in the calling thread.
+
+        Parameters
+        ----------
+        write: func
+            Function that changes the session without committing it."""
+
+        if self.writer is not None:
+            self.writer.submit(write)
+        else:
+            result = write()
+            db.session.commit()
+            self.results.append(result)
+
+    @staticmethod
+    def write(inserts, updates, deletes):
+        """Changes the intrusions in the session.
+
+        The intrusions are updated and deleted by source, destination and
+        protocol, so the rows deleted by others are skipped and the new
+        intrusions saved by others, e.g. another detection, are updated.
+        Only the updated rows are checked for deletions.
+
+        Parameters
+        ----------
+        inserts: list
+            Columns of the new intrusions.
+        updates: list
+            Columns of the updated intrusions.
+        deletes: list
+            Source address, destination address and protocol of the expired
+            intrusions.
+
+        Returns
+        -------
+        tuple
+            Source address, destination address, protocol and primary key of
+            the new intrusions, and primary keys of the updated intrusions not
+            in the database."""
+
+        table = Intrusion.__table__
+        flow = and_(table.c.source_address == bindparam('key_source'),
+                    table.c.destination_address ==
+                    bindparam('key_destination'),
+                    table.c.protocol == bindparam('key_protocol'))
+
+        if deletes:
+            db.session.execute(table.delete().where(flow),
+                               [{'key_source': source,
+                                 'key_destination': destination,
+                                 'key_protocol': protocol}
+                                for source, destination, protocol in deletes])
+
+        known = [row['id'] for row in updates if row['id'] is not None]
+        created = list()
+        for row in inserts:
+            key = (row['source_address'], row['destination_address'],
+                   row['protocol'])
+            # the intrusion may have been saved by others since it was found.
+            pk = db.session.query(Intrusion.id).filter_by(
+                source_address=key[0], destination_address=key[1],
+                protocol=key[2]).scalar()
+            if pk is None:
+                pk = db.session.execute(
+                    table.insert(),
+                    {column: value for column, value in row.items()
+                     if column != 'id'}).inserted_primary_key[0]
+            else:
+                updates = updates + [row]
+            created.append((*key, pk))
+
+        if updates:
+            db.session.execute(
+                table.update().where(flow),
+                [{**{column: value for column, value in row.items()
+                     if column != 'id'},
+                  'key_source': row['source_address'],
+                  'key_destination': row['destination_address'],
+                  'key_protocol': row['protocol']} for row in updates])
+
+        missing = list()
+        # only the updated primary keys, in chunks below the limit of
+        # variables of SQLite.
+        for idx in range(0, len(known), 500):
+            chunk = known[idx:idx+500]
+            existing = {pk for pk, in db.session.query(Intrusion.id).filter(
+                Intrusion.id.in_(chunk))}
+            missing.extend(pk for pk in chunk if pk not in existing)
+
+        return created, missing
+
+    def deadline(self, intrusion):
+        """Computes when an intrusion expires.
+
+        Parameters
+        ----------
+        intrusion: dict
+            Intrusion state.
+
+        Returns
+        -------
+        float
+            Monotonic time of the expiration, None if it never expires."""
+
+        if self.hard_timeout:
+            return intrusion['created'] + self.hard_timeout
+
+    def expire(self):
+        """Removes the expired intrusions from memory and the database.
+
+        The deadlines in the heap are checked against the current deadline of
+        their intrusions, which is pushed again if the intrusion was removed
+        and added again since.
+
+        Returns
+        -------
+        list
+            Source address, destination address, protocol and rule of the
+            expired intrusions."""
+
+        now = time.monotonic()
+        expired = list()
+
+        while (self.deadlines and self.deadlines[0][0] <= now and
+               len(expired) < self.batch):
+            _, key = heapq.heappop(self.deadlines)
+            if key not in self.intrusions:
+                continue
+
+            deadline = self.deadline(self.intrusions[key])
+            if deadline > now:
+                heapq.heappush(self.deadlines, (deadline, key))
+            else:
+                expired.append(key)
+
+        if not expired:
+            return list()
+
+        intrusions = [self.intrusions.pop(key) for key in expired]
+        self.updated.difference_update(expired)
+        self.count -= len(expired)
+
+        # the intrusions never written are not deleted.
+        deletes = [key for key in expired if key not in self.created]
+        self.created.difference_update(expired)
+        if deletes:
+            self.submit(lambda: self.write(list(), list(), deletes))
+        logger.info(f'expired intrusions: {len(expired)}')
+
+        return [(*key, intrusion['rule'])
+                for key, intrusion in zip(expired, intrusions)]
+
+    @staticmethod
+    def row(intrusion):
+        """Creates the database row of an intrusion.
+
+        Parameters
+        ----------
+        intrusion: dict
+            Intrusion state.
+
+        Returns
+        -------
+        dict
+            Intrusion columns."""
+
+        duration = (intrusion['end_time'] - intrusion['start_time']).seconds
+        if duration:
+            bps = intrusion['bytes']/duration
+            pps = intrusion['packets']/duration
+        else:
+            bps, pps = 0, 0
+        bpp = intrusion['bytes']/intrusion['packets']
+
+        return {'id': intrusion['id'],
+                'start_time': intrusion['start_time'],
+                'end_time': intrusion['end_time'],
+                'source_address': intrusion['source_address'],
+                'destination_address': intrusion['destination_address'],
+                'protocol': intrusion['protocol'],
+                **dict(zip(Intrusion.flag_columns, intrusion['flags'])),
+                'source_port': pack_bitmap(intrusion['source_port']),
+                'destination_port': pack_bitmap(intrusion['destination_port']),
+                'duration': duration,
+                'packets': intrusion['packets'],
+                'bytes': intrusion['bytes'],
+                'bytes_per_second': int(round(bps)),
+                'bytes_per_packets': int(round(bpp)),
+                'packtes_per_second': int(round(pps)),
+                'number_source_port': count_bits(intrusion['source_port']),
+                'number_destination_port':
+                    count_bits(intrusion['destination_port']),
+                'flows': intrusion['flows'],
+                'rule': intrusion['rule'],
+                'model_id': intrusion['model_id']}
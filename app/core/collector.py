@@ -0,0 +1,530 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import struct
+import threading
+import time
+from datetime import datetime
+
+
+logger = logging.getLogger('collector')
+
+# protocol names as displayed by nfdump.
+protocols = {1: 'ICMP', 2: 'IGMP', 4: 'IPIP', 6: 'TCP', 17: 'UDP',
+             41: 'IPv6', 47: 'GRE', 50: 'ESP', 51: 'AH', 58: 'ICMP6',
+             89: 'OSPF', 103: 'PIM', 132: 'SCTP'}
+
+# NetFlow v9 and IPFIX information elements used by the formatted flows.
+fields = {1: 'bytes', 2: 'packets', 4: 'protocol', 6: 'flags',
+          7: 'source_port', 8: 'source_address', 11: 'destination_port',
+          12: 'destination_address', 21: 'last_uptime', 22: 'first_uptime',
+          27: 'source_address', 28: 'destination_address', 32: 'icmp',
+          139: 'icmp', 150: 'first_seconds', 151: 'last_seconds',
+          152: 'first_milliseconds', 153: 'last_milliseconds',
+          160: 'init_milliseconds'}
+
+v5_header = struct.Struct('!HHIIIIBBH')
+v5_record = struct.Struct('!4s4s4sHHIIIIHHBBBBHHBBH')
+v9_header = struct.Struct('!HHIIII')
+ipfix_header = struct.Struct('!HHIII')
+set_header = struct.Struct('!HH')
+
+
+class Decoder:
+    """Decodes NetFlow v5, v9 and IPFIX datagrams into formatted IP flows.
+
+    The formatted IP flows have the same features and order produced by the
+    Formatter class, so they can be used directly by the Modifier class.
+
+    Attributes
+    ----------
+    self.templates: dict
+        Templates announced by the exporters, by exporter address, source
+        identification and template identification."""
+
+    def __init__(self):
+        self.templates = dict()
+
+    def decode(self, datagram, address):
+        """Decodes a datagram according to its version.
+
+        Parameters
+        ----------
+        datagram: bytes
+            NetFlow or IPFIX datagram.
+        address: tuple
+            Exporter address.
+
+        Returns
+        -------
+        list of list
+            Formatted IP flows."""
+
+        try:
+            version = struct.unpack_from('!H', datagram)[0]
+
+            if version == 5:
+                return self.decode_v5(datagram)
+            elif version == 9:
+                return self.decode_v9(datagram, address)
+            elif version == 10:
+                return self.decode_ipfix(datagram, address)
+            logger.warning(f'unknown version {version} from {address[0]}')
+        except (IndexError, struct.error, ValueError) as error:
+            logger.warning(f'malformed datagram from {address[0]}: {error}')
+
+        return list()
+
+    def decode_v5(self, datagram):
+        """Decodes a NetFlow v5 datagram.
+
+        Parameters
+        ----------
+        datagram: bytes
+            NetFlow v5 datagram.
+
+        Returns
+        -------
+        list of list
+            Formatted IP flows."""
+
+        (_, count, uptime, secs, nsecs,
+         _, _, _, _) = v5_header.unpack_from(datagram)
+        # wall clock milliseconds when the router booted.
+        boot = secs * 1000 + nsecs // 1000000 - uptime
+        flows = list()
+
+        for idx in range(count):
+            record = v5_record.unpack_from(
+                datagram, v5_header.size + idx * v5_record.size)
+            flows.append(self.format_flow(
+                {'source_address': record[0],
+                 'destination_address': record[1],
+                 'packets': record[5], 'bytes': record[6],
+                 'first_milliseconds': boot + record[7],
+                 'last_milliseconds': boot + record[8],
+                 'source_port': record[9], 'destination_port': record[10],
+                 'flags': record[12], 'protocol': record[13]}))
+
+        return flows
+
+    def decode_v9(self, datagram, address):
+        """Decodes a NetFlow v9 datagram.
+
+        Parameters
+        ----------
+        datagram: bytes
+            NetFlow v9 datagram.
+        address: tuple
+            Exporter address.
+
+        Returns
+        -------
+        list of list
+            Formatted IP flows."""
+
+        _, _, uptime, secs, _, source = v9_header.unpack_from(datagram)
+        boot = secs * 1000 - uptime
+
+        return self.decode_sets(datagram, v9_header.size, len(datagram),
+                                (address[0], 9, source), 0, boot)
+
+    def decode_ipfix(self, datagram, address):
+        """Decodes an IPFIX message.
+
+        Parameters
+        ----------
+        datagram: bytes
+            IPFIX message.
+        address: tuple
+            Exporter address.
+
+        Returns
+        -------
+        list of list
+            Formatted IP flows."""
+
+        _, length, _, _, domain = ipfix_header.unpack_from(datagram)
+
+        return self.decode_sets(datagram, ipfix_header.size,
+                                min(length, len(datagram)),
+                                (address[0], 10, domain), 2, None)
+
+    def decode_sets(self, datagram, offset, end, source, template_set, boot):
+        """Decodes the template and data sets of a v9 or IPFIX datagram.
+
+        Parameters
+        ----------
+        datagram: bytes
+            NetFlow v9 or IPFIX datagram.
+        offset: int
+            Position of the first set.
+        end: int
+            Position where the sets finish.
+        source: tuple
+            Exporter address, version and source identification.
+        template_set: int
+            Set identification of the templates, 0 for v9 and 2 for IPFIX.
+        boot: int
+            Wall clock milliseconds when the exporter booted, None when the
+            records carry it.
+
+        Returns
+        -------
+        list of list
+            Formatted IP flows."""
+
+        flows = list()
+
+        while offset + set_header.size <= end:
+            set_id, length = set_header.unpack_from(datagram, offset)
+            if length < set_header.size:
+                raise ValueError('invalid set length')
+            body = datagram[offset+set_header.size:offset+length]
+            offset += length
+
+            if set_id == template_set:
+                self.decode_templates(body, source, template_set == 2)
+            elif set_id >= 256:
+                template = self.templates.get((*source, set_id))
+                if template is None:
+                    logger.debug(f'no template {set_id} from {source[0]}')
+                    continue
+                flows.extend(self.decode_records(body, template, boot))
+
+        return flows
+
+    def decode_templates(self, body, source, ipfix):
+        """Decodes a template set and stores the templates.
+
+        Parameters
+        ----------
+        body: bytes
+            Template set without the header.
+        source: tuple
+            Exporter address, version and source identification.
+        ipfix: bool
+            Signals the IPFIX enterprise bit."""
+
+        offset = 0
+
+        while offset + 4 <= len(body):
+            template_id, count = struct.unpack_from('!HH', body, offset)
+            offset += 4
+            template = list()
+
+            for _ in range(count):
+                field, length = struct.unpack_from('!HH', body, offset)
+                offset += 4
+                if ipfix and field & 0x8000:
+                    # enterprise specific fields are skipped.
+                    offset += 4
+                    field = None
+                template.append((field, length))
+            self.templates[(*source, template_id)] = template
+
+    def decode_records(self, body, template, boot):
+        """Decodes the records of a data set.
+
+        Parameters
+        ----------
+        body: bytes
+            Data set without the header.
+        template: list
+            Fields and lengths of the records.
+        boot: int
+            Wall clock milliseconds when the exporter booted.
+
+        Returns
+        -------
+        list of list
+            Formatted IP flows."""
+
+        flows = list()
+        offset = 0
+        minimum = sum(length for _, length in template if length != 65535)
+
+        # the remaining bytes are padding when smaller than a record.
+        while minimum and offset + minimum <= len(body):
+            values = dict()
+
+            for field, length in template:
+                if length == 65535:
+                    # IPFIX variable length.
+                    length = body[offset]
+                    offset += 1
+                    if length == 255:
+                        length = struct.unpack_from('!H', body, offset)[0]
+                        offset += 2
+                value = body[offset:offset+length]
+                offset += length
+
+                if field in fields:
+                    name = fields[field]
+                    if 'address' not in name:
+                        value = int.from_bytes(value, 'big')
+                    values[name] = value
+
+            if 'first_uptime' in values:
+                start = boot
+                if start is None:
+                    start = values.get('init_milliseconds', 0)
+                values['first_milliseconds'] = start + values['first_uptime']
+                values['last_milliseconds'] = (start +
+                                               values.get('last_uptime', 0))
+            elif 'first_seconds' in values:
+                values['first_milliseconds'] = values['first_seconds'] * 1000
+                values['last_milliseconds'] = values['last_seconds'] * 1000
+            if 'icmp' in values and not values.get('destination_port'):
+                values['destination_port'] = values['icmp']
+            flows.append(self.format_flow(values))
+
+        return flows
+
+    def format_flow(self, values):
+        """Creates a formatted IP flow from the decoded values.
+
+        Parameters
+        ----------
+        values: dict
+            Decoded values of a flow record.
+
+        Returns
+        -------
+        list
+            Formatted IP flow."""
+
+        first = values.get('first_milliseconds', 0)
+        last = values.get('last_milliseconds', first)
+        number = values.get('protocol', 0)
+        protocol = protocols.get(number, str(number))
+        sp = values.get('source_port', 0)
+        dp = values.get('destination_port', 0)
+
+        if protocol == 'TCP':
+            flags = values.get('flags', 0)
+            # same order used by the Formatter class, U A S F R P.
+            flags = [int(bool(flags & bit))
+                     for bit in [0x20, 0x10, 0x02, 0x01, 0x04, 0x08]]
+        else:
+            flags = [0]
+
+        if protocol in ['ICMP', 'ICMP6']:
+            # type and code as displayed by nfdump.
+            sp, dp = 0, f'{dp >> 8}.{dp & 255}'
+
+        return [datetime.fromtimestamp(first // 1000),
+                datetime.fromtimestamp(last // 1000),
+                self.format_address(values.get('source_address', b'')),
+                self.format_address(values.get('destination_address', b'')),
+                protocol, flags, str(sp), str(dp),
+                round((last - first) / 1000),
+                values.get('packets', 0), values.get('bytes', 0)]
+
+    def format_address(self, address):
+        """Formats an IP address as displayed by nfdump.
+
+        Parameters
+        ----------
+        address: bytes
+            Packed IPv4 or IPv6 address.
+
+        Returns
+        -------
+        str
+            IP address."""
+
+        if len(address) == 4:
+            return str(ipaddress.IPv4Address(address))
+        elif len(address) == 16:
+            return ipaddress.IPv6Address(address).exploded
+
+        return '000.000.000.000'
+
+
+class CollectorProtocol(asyncio.DatagramProtocol):
+    """Receives the datagrams of the exporters.
+
+    Attributes
+    ----------
+    self.collector: obj
+        Collector that owns the protocol."""
+
+    def __init__(self, collector):
+        self.collector = collector
+
+    def datagram_received(self, data, addr):
+        self.collector.receive(data, addr)
+
+
+class Collector:
+    """Collects NetFlow v5, v9 and IPFIX flows in an asyncio event loop.
+
+    The event loop runs in its own thread and the formatted IP flows are handed
+    to a callback as soon as they are decoded, without temporary files.
+
+    Attributes
+    ----------
+    self.host: str
+        Address to listen.
+    self.port: int
+        UDP port to listen, 0 for a free port.
+    self.callback: func
+        Receives the formatted IP flows of each datagram.
+    self.record: str
+        Absolute path of a file to record the datagrams, None to not record.
+    self.decoder: obj
+        Decoder instance.
+    self.loop: obj
+        Event loop of the collector thread.
+    self.error: obj
+        Exception raised while starting to listen, None otherwise."""
+
+    def __init__(self, host, port, callback, record=None):
+        self.host = host
+        self.port = port
+        self.callback = callback
+        self.record = record
+        self.decoder = Decoder()
+        self.loop = None
+        self.error = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.record_file = None
+
+    def start(self, timeout=10):
+        """Starts the collector thread and waits until it is listening.
+
+        Parameters
+        ----------
+        timeout: float
+            Seconds waiting for the collector to listen.
+
+        Returns
+        -------
+        int
+            UDP port being listened."""
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        if not self.ready.wait(timeout):
+            raise TimeoutError(f'collector not listening after {timeout} s')
+        if self.error is not None:
+            # e.g. the port is already used by nfcapd.
+            self.thread.join()
+            raise self.error
+
+        return self.port
+
+    def run(self):
+        """Runs the event loop of the collector thread."""
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            if self.record:
+                self.record_file = open(self.record, 'ab')
+
+            transport, _ = self.loop.run_until_complete(
+                self.loop.create_datagram_endpoint(
+                    lambda: CollectorProtocol(self),
+                    local_addr=(self.host, self.port)))
+            self.port = transport.get_extra_info('sockname')[1]
+            logger.info(f'collector listening: {self.host}:{self.port}')
+        except Exception as error:
+            logger.error(f'collector not listening: {error}')
+            self.error = error
+            self.loop.close()
+            if self.record_file:
+                self.record_file.close()
+            return
+        finally:
+            # the thread waiting in start is released even on errors.
+            self.ready.set()
+
+        try:
+            self.loop.run_forever()
+        finally:
+            transport.close()
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.close()
+            if self.record_file:
+                self.record_file.close()
+
+    def stop(self):
+        """Stops the collector thread."""
+
+        if self.thread and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    def receive(self, datagram, address):
+        """Decodes a datagram and hands the flows to the callback.
+
+        Parameters
+        ----------
+        datagram: bytes
+            NetFlow or IPFIX datagram.
+        address: tuple
+            Exporter address."""
+
+        if self.record_file:
+            self.record_file.write(struct.pack('!I', len(datagram)))
+            self.record_file.write(datagram)
+
+        flows = self.decoder.decode(datagram, address)
+        if flows:
+            self.callback(flows)
+
+
+def load_datagrams(record):
+    """Loads the datagrams recorded by a collector.
+
+    Parameters
+    ----------
+    record: str
+        Absolute path of the record file.
+
+    Yields
+    ------
+    bytes
+        NetFlow or IPFIX datagram."""
+
+    with open(record, 'rb') as file:
+        while True:
+            size = file.read(4)
+            if len(size) < 4:
+                break
+            yield file.read(struct.unpack('!I', size)[0])
+
+
+def replay(datagrams, host, port, interval=0):
+    """Sends recorded datagrams to a collector.
+
+    Parameters
+    ----------
+    datagrams: iterable
+        NetFlow or IPFIX datagrams.
+    host: str
+        Address of the collector.
+    port: int
+        UDP port of the collector.
+    interval: float
+        Seconds between datagrams.
+
+    Returns
+    -------
+    int
+        Number of sent datagrams."""
+
+    count = 0
+
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for datagram in datagrams:
+            sock.sendto(datagram, (host, port))
+            count += 1
+            if interval:
+                time.sleep(interval)
+
+    return count
@@ -0,0 +1,564 @@
+import ast
+import ipaddress
+
+import numpy as np
+
+
+# order of the TCP flags counts, the same used by the Formatter class.
+flags_order = ['U', 'A', 'S', 'F', 'R', 'P']
+
+# features of the list format, the index is the position in the flow.
+features = ['start', 'end', 'source', 'destination', 'protocol', 'flags',
+            'source_ports', 'destination_ports', 'duration', 'packets',
+            'bytes', 'bps', 'bpp', 'pps', 'nsp', 'ndp', 'flw', 'label']
+
+# missing address value used by the Formatter class.
+missing_address = '000.000.000.000'
+# all ones address, never used as a flow address, represents the missing one.
+missing_code = (2**64 - 1, 2**64 - 1)
+# prefix of the IPv4-mapped IPv6 addresses.
+ipv4_mapped = 0xffff << 32
+# flag of ICMP type and code ports, displayed as type.code by nfdump.
+icmp_port = 0x10000
+
+
+class FlowColumns:
+    """Columnar representation of formatted or modified IP flows.
+
+    Each feature is a NumPy array instead of a position in a Python list per
+    flow, which reduces the memory and allows vectorized operations.
+
+    Attributes
+    ----------
+    self.start: array
+        Start time as int64 seconds since epoch, without time zone.
+    self.end: array
+        End time as int64 seconds since epoch, without time zone.
+    self.source: array
+        Source address as uint64 pairs of a 128 bits integer, IPv4 addresses
+        are IPv4-mapped.
+    self.destination: array
+        Destination address as uint64 pairs of a 128 bits integer.
+    self.protocol: array
+        Protocol code, index of the protocols attribute.
+    self.protocols: list
+        Protocol names.
+    self.flags: array
+        Matrix with the TCP flags counts in the U, A, S, F, R, P order, uint16
+        or uint32 when modified.
+    self.source_ports: array
+        Source ports of all flows, int32 with ICMP type and code flagged.
+    self.source_offsets: array
+        Position of the source ports of each flow, flow i has the ports from
+        offsets[i] to offsets[i+1].
+    self.destination_ports: array
+        Destination ports of all flows.
+    self.destination_offsets: array
+        Position of the destination ports of each flow.
+    self.duration: array
+        Duration in seconds.
+    self.packets: array
+        Number of packets.
+    self.bytes: array
+        Number of bytes.
+    self.modified: dict
+        Arrays of the features created by the Modifier class, empty if the
+        flows were not modified."""
+
+    def __init__(self, start, end, source, destination, protocol, protocols,
+                 flags, source_ports, source_offsets, destination_ports,
+                 destination_offsets, duration, packets, bytes,
+                 modified=None):
+        self.start = start
+        self.end = end
+        self.source = source
+        self.destination = destination
+        self.protocol = protocol
+        self.protocols = protocols
+        self.flags = flags
+        self.source_ports = source_ports
+        self.source_offsets = source_offsets
+        self.destination_ports = destination_ports
+        self.destination_offsets = destination_offsets
+        self.duration = duration
+        self.packets = packets
+        self.bytes = bytes
+        self.modified = modified or dict()
+
+    def __len__(self):
+        return len(self.start)
+
+    def column(self, idx):
+        """Gets the array of a feature by its position in the list format.
+
+        Parameters
+        ----------
+        idx: int
+            Position of the feature.
+
+        Returns
+        -------
+        array
+            Feature values."""
+
+        name = features[idx]
+        if name in self.modified:
+            return self.modified[name]
+
+        return getattr(self, name)
+
+    @classmethod
+    def from_flows(cls, flows):
+        """Creates the columns from formatted or modified IP flows.
+
+        Parameters
+        ----------
+        flows: list of list
+            Formatted or modified IP flows in the list format.
+
+        Returns
+        -------
+        obj
+            FlowColumns instance."""
+
+        return cls.from_columns(list(zip(*flows)) or [()] * len(features))
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Creates the columns from the features of the list format.
+
+        Parameters
+        ----------
+        columns: list
+            Values of each feature of formatted or modified IP flows, in the
+            list format order.
+
+        Returns
+        -------
+        obj
+            FlowColumns instance."""
+
+        protocol, protocols = encode_protocols(columns[4])
+        tcp = np.array(protocols) == 'TCP'
+
+        # the counts of the modified flows are sums of many flows.
+        dtype = np.uint32 if len(columns) == len(features) else np.uint16
+        flags = np.zeros((len(protocol), len(flags_order)), dtype=dtype)
+        for idx, flow_flags in enumerate(columns[5]):
+            if len(flow_flags) == len(flags_order):
+                flags[idx] = flow_flags
+        flags[~tcp[protocol]] = 0
+
+        source_ports, source_offsets = encode_port_sets(columns[6])
+        destination_ports, destination_offsets = encode_port_sets(columns[7])
+
+        modified = dict()
+        if len(columns) == len(features):
+            for idx in range(11, len(features)):
+                modified[features[idx]] = np.array(columns[idx],
+                                                   dtype=np.int64)
+
+        return cls(encode_times(columns[0]), encode_times(columns[1]),
+                   encode_addresses(columns[2]),
+                   encode_addresses(columns[3]),
+                   protocol, protocols, flags,
+                   source_ports, source_offsets,
+                   destination_ports, destination_offsets,
+                   np.array(columns[8], dtype=np.int64),
+                   np.array(columns[9], dtype=np.int64),
+                   np.array(columns[10], dtype=np.int64),
+                   modified)
+
+    def to_flows(self):
+        """Converts the columns to the list format.
+
+        Returns
+        -------
+        list of list
+            Formatted or modified IP flows."""
+
+        protocols = np.array(self.protocols, dtype=object)[self.protocol]
+        tcp = protocols == 'TCP'
+        flags = [flow_flags if is_tcp else [0]
+                 for flow_flags, is_tcp in zip(self.flags.tolist(),
+                                               tcp.tolist())]
+
+        columns = [decode_times(self.start), decode_times(self.end),
+                   decode_addresses(self.source),
+                   decode_addresses(self.destination),
+                   protocols.tolist(), flags]
+
+        if self.modified:
+            columns.append(decode_port_sets(self.source_ports,
+                                            self.source_offsets))
+            columns.append(decode_port_sets(self.destination_ports,
+                                            self.destination_offsets))
+        else:
+            columns.append(decode_ports(self.source_ports))
+            columns.append(decode_ports(self.destination_ports))
+
+        columns.extend([self.duration.tolist(), self.packets.tolist(),
+                        self.bytes.tolist()])
+        for name in features[11:]:
+            if name in self.modified:
+                columns.append(self.modified[name].tolist())
+
+        return [list(flow) for flow in zip(*columns)]
+
+
+def encode_times(values):
+    """Converts date and time strings or objects to seconds since epoch.
+
+    Parameters
+    ----------
+    values: iterable
+        Dates and times in the %Y-%m-%d %H:%M:%S format or datetime objects.
+
+    Returns
+    -------
+    array
+        int64 seconds."""
+
+    return np.array(values, dtype='datetime64[s]').astype(np.int64)
+
+
+def decode_times(values):
+    """Converts seconds since epoch to datetime objects.
+
+    Parameters
+    ----------
+    values: array
+        int64 seconds.
+
+    Returns
+    -------
+    list
+        Datetime objects."""
+
+    return values.astype('datetime64[s]').astype(object).tolist()
+
+
+def encode_addresses(values):
+    """Converts IP addresses to uint64 pairs of 128 bits integers.
+
+    Each unique address is parsed only once.
+
+    Parameters
+    ----------
+    values: iterable
+        IPv4 and IPv6 addresses.
+
+    Returns
+    -------
+    array
+        Matrix with the high and low 64 bits of the addresses."""
+
+    uniques, inverse = np.unique(np.array(values, dtype=str),
+                                 return_inverse=True)
+    codes = np.empty((len(uniques), 2), dtype=np.uint64)
+
+    for idx, address in enumerate(uniques.tolist()):
+        if address == missing_address:
+            codes[idx] = missing_code
+            continue
+        address = ipaddress.ip_address(address)
+        value = int(address)
+        if address.version == 4:
+            value |= ipv4_mapped
+        codes[idx] = (value >> 64, value & (2**64 - 1))
+
+    return codes[inverse.reshape(-1)]
+
+
+def decode_addresses(codes):
+    """Converts uint64 pairs of 128 bits integers to IP addresses.
+
+    IPv6 addresses are displayed in full format, as nfdump -6 does.
+
+    Parameters
+    ----------
+    codes: array
+        Matrix with the high and low 64 bits of the addresses.
+
+    Returns
+    -------
+    list
+        IP addresses."""
+
+    if not len(codes):
+        return list()
+
+    uniques, inverse = np.unique(codes, axis=0, return_inverse=True)
+    addresses = list()
+
+    for high, low in uniques.tolist():
+        if (high, low) == missing_code:
+            addresses.append(missing_address)
+            continue
+        value = high << 64 | low
+        if high == 0 and value >> 32 == 0xffff:
+            addresses.append(str(ipaddress.IPv4Address(value & 0xffffffff)))
+        else:
+            addresses.append(ipaddress.IPv6Address(value).exploded)
+
+    return np.array(addresses, dtype=object)[inverse.reshape(-1)].tolist()
+
+
+def encode_protocols(values):
+    """Converts protocol names to small integer codes.
+
+    Parameters
+    ----------
+    values: iterable
+        Protocol names.
+
+    Returns
+    -------
+    tuple
+        Codes and protocol names indexed by the codes."""
+
+    uniques, inverse = np.unique(np.array(values, dtype=str),
+                                 return_inverse=True)
+    dtype = np.min_scalar_type(max(len(uniques) - 1, 0))
+
+    return inverse.reshape(-1).astype(dtype), uniques.tolist()
+
+
+def encode_port(port):
+    """Converts a port to integer.
+
+    Parameters
+    ----------
+    port: str
+        Port number or ICMP type.code.
+
+    Returns
+    -------
+    int
+        Port number or flagged ICMP type and code."""
+
+    if '.' in port:
+        icmp_type, code = port.split('.')
+        return icmp_port | int(icmp_type) << 8 | int(code)
+
+    return int(port)
+
+
+def decode_port(port):
+    """Converts an integer to port.
+
+    Parameters
+    ----------
+    port: int
+        Port number or flagged ICMP type and code.
+
+    Returns
+    -------
+    str
+        Port number or ICMP type.code."""
+
+    if port & icmp_port:
+        return f'{port >> 8 & 0xff}.{port & 0xff}'
+
+    return str(port)
+
+
+def encode_ports(values):
+    """Converts the ports of formatted flows to integers.
+
+    Parameters
+    ----------
+    values: iterable
+        A port per flow.
+
+    Returns
+    -------
+    array
+        int32 ports."""
+
+    uniques, inverse = np.unique(np.array(values, dtype=str),
+                                 return_inverse=True)
+    codes = np.array([encode_port(port) for port in uniques.tolist()],
+                     dtype=np.int32)
+
+    return codes[inverse.reshape(-1)]
+
+
+def decode_ports(ports):
+    """Converts integers to the ports of formatted flows.
+
+    Parameters
+    ----------
+    ports: array
+        int32 ports.
+
+    Returns
+    -------
+    list
+        A port per flow."""
+
+    return [decode_port(port) for port in ports.tolist()]
+
+
+def encode_port_sets(values):
+    """Converts ports or sets of ports to integers and offsets.
+
+    Parameters
+    ----------
+    values: iterable
+        A port or set of ports per flow.
+
+    Returns
+    -------
+    tuple
+        int32 ports of all flows and the position of each flow ports."""
+
+    values = list(values)
+    if not values or isinstance(values[0], str):
+        ports = encode_ports(values)
+        return ports, np.arange(len(ports) + 1, dtype=np.int64)
+
+    sizes = np.array([len(ports) for ports in values], dtype=np.int64)
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    ports = encode_ports([port for ports in values for port in ports])
+
+    return ports, offsets
+
+
+def decode_port_sets(ports, offsets):
+    """Converts integers and offsets to sets of ports.
+
+    Parameters
+    ----------
+    ports: array
+        int32 ports of all flows.
+    offsets: array
+        Position of each flow ports.
+
+    Returns
+    -------
+    list
+        A set of ports per flow."""
+
+    ports = decode_ports(ports)
+    offsets = offsets.tolist()
+
+    return [set(ports[start:end])
+            for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def port_bitmap(ports):
+    """Converts ports to a bitmap of 65536 bits.
+
+    The ICMP type and code are the bit type*256+code, they do not collide
+    with TCP and UDP ports because the protocol is kept aside.
+
+    Parameters
+    ----------
+    ports: iterable
+        Port numbers or ICMP type.code.
+
+    Returns
+    -------
+    int
+        Bitmap with the bit of each port set."""
+
+    bitmap = 0
+    for port in ports:
+        bitmap |= 1 << (encode_port(port) & 0xffff)
+
+    return bitmap
+
+
+def bitmap_ports(bitmap, icmp=False):
+    """Converts a bitmap of 65536 bits to ports.
+
+    Parameters
+    ----------
+    bitmap: int
+        Bitmap with the bit of each port set.
+    icmp: bool
+        Whether the bits are ICMP type and code.
+
+    Returns
+    -------
+    list
+        Ordered port numbers or ICMP type.code."""
+
+    ports = list()
+    while bitmap:
+        lowest = bitmap & -bitmap
+        port = lowest.bit_length() - 1
+        ports.append(decode_port(icmp_port | port) if icmp else str(port))
+        bitmap ^= lowest
+
+    return ports
+
+
+def pack_bitmap(bitmap):
+    """Converts a bitmap to bytes, without the trailing empty bytes.
+
+    Parameters
+    ----------
+    bitmap: int
+        Bitmap of 65536 bits.
+
+    Returns
+    -------
+    bytes
+        Little-endian bitmap of at most 8192 bytes."""
+
+    return bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+
+
+def unpack_bitmap(data):
+    """Converts bytes to a bitmap.
+
+    Parameters
+    ----------
+    data: bytes
+        Little-endian bitmap.
+
+    Returns
+    -------
+    int
+        Bitmap of 65536 bits."""
+
+    return int.from_bytes(data or b'', 'little')
+
+
+def count_bits(bitmap):
+    """Counts the ports of a bitmap.
+
+    Parameters
+    ----------
+    bitmap: int
+        Bitmap of 65536 bits.
+
+    Returns
+    -------
+    int
+        Number of bits set."""
+
+    return bin(bitmap).count('1')
+
+
+def parse_literals(values):
+    """Evaluates the Python literals of a column, each unique value only once.
+
+    Parameters
+    ----------
+    values: iterable
+        Python literals as strings.
+
+    Returns
+    -------
+    list
+        Evaluated values."""
+
+    cache = dict()
+
+    return [cache[value] if value in cache
+            else cache.setdefault(value, ast.literal_eval(value))
+            for value in values]
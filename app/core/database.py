@@ -0,0 +1,118 @@
+import logging
+import queue
+import threading
+import time
+
+from app import db
+from app.core import metrics
+
+
+logger = logging.getLogger('database')
+
+
+class DatabaseWriter(threading.Thread):
+    """Single thread that writes to the database.
+
+    The writes queued while a transaction is committed are executed in the
+    next one, so many writes cost a single commit and the other threads do
+    not wait for the disk. If the transaction fails, each write is executed
+    again in its own transaction.
+
+    Attributes
+    ----------
+    self.requests: obj
+        Queue of the writes, functions executed in the writer session.
+    self.results: list
+        Results of the writes since the last collection.
+    self.lock: obj
+        Lock of the results."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.requests = queue.Queue()
+        self.results = list()
+        self.lock = threading.Lock()
+
+    def submit(self, write):
+        """Queues a write.
+
+        Parameters
+        ----------
+        write: func
+            Function that changes the session without committing it."""
+
+        self.requests.put(write)
+
+    def stop(self):
+        """Stops the thread after the queued writes."""
+
+        self.requests.put(None)
+        self.join()
+
+    def run(self):
+        running = True
+
+        while running:
+            writes = [self.requests.get()]
+            # coalescing the writes queued meanwhile.
+            while True:
+                try:
+                    writes.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in writes:
+                running = False
+                writes = [write for write in writes if write is not None]
+
+            start = time.perf_counter()
+            try:
+                results = [write() for write in writes]
+                db.session.commit()
+            except Exception as error:
+                logger.error(f'coalesced writes failed: {error}')
+                db.session.rollback()
+                # a failed write does not discard the others.
+                results = [self.execute(write) for write in writes]
+            metrics.flush_seconds.observe(time.perf_counter() - start)
+
+            with self.lock:
+                self.results.extend(result for result in results
+                                    if result is not None)
+        db.session.remove()
+
+    def execute(self, write):
+        """Executes a write in its own transaction.
+
+        Parameters
+        ----------
+        write: func
+            Function that changes the session without committing it.
+
+        Returns
+        -------
+        object
+            Result of the write, None if it failed."""
+
+        try:
+            result = write()
+            db.session.commit()
+        except Exception as error:
+            logger.exception(error)
+            db.session.rollback()
+            return None
+
+        return result
+
+    def collect(self):
+        """Gets the results of the writes since the last collection.
+
+        Returns
+        -------
+        list
+            Results of the writes that returned something."""
+
+        with self.lock:
+            results, self.results = self.results, list()
+
+        return results
@@ -1,5 +1,7 @@
+import joblib
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import GridSearchCV
+from sklearn.model_selection import GridSearchCV, ParameterGrid
 from sklearn.naive_bayes import GaussianNB
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.neural_network import MLPClassifier
@@ -7,7 +9,7 @@ from sklearn.pipeline import Pipeline
 from sklearn.svm import SVC
 from sklearn.tree import DecisionTreeClassifier
 
-from app.core.util import timing
+from app.core.profiling import profile
 
 
 class Detector:
@@ -21,9 +23,12 @@ class Detector:
     def __init__(self, classifier):
         self.classifier = classifier
 
-    def define_tuning(self, preprocessing, kfolds, tmp_directory):
+    def define_tuning(self, preprocessing, kfolds, tmp_directory, n_jobs=None,
+                      progress=None):
         """Exhaustive search over a set of hyperparameters.
 
+        The candidates and folds are fitted by a pool of n_jobs workers.
+
         Parameters
         ----------
         preprocessing: obj
@@ -33,7 +38,13 @@ class Detector:
         tmp_directory: str
             Absoulute path of a temporary directory to cache each transformer
             after calling fit. It avoids computing the fit transformers many
-            times in a case of grid search"""
+            times in a case of grid search
+        n_jobs: int
+            Number of workers of the search. None means a single worker and -1
+            all processors.
+        progress: str
+            Absolute path of a file that counts the fitted folds. None to not
+            count them."""
 
         if preprocessing:
             # chaining estimators in a fixed sequence of steps.
@@ -48,9 +59,12 @@ class Detector:
 
         self.classifier['obj'] = GridSearchCV(self.classifier['obj'],
                                               self.classifier['param'],
-                                              cv=kfolds)
+                                              cv=kfolds,
+                                              n_jobs=n_jobs,
+                                              scoring=(ProgressScorer(progress)
+                                                       if progress else None))
 
-    @timing
+    @profile(sample=1)
     def train(self, training_features, training_labels):
         """Training the machine learning algorithm.
 
@@ -70,7 +84,37 @@ class Detector:
 
         return self.classifier['obj'].best_params_
 
-    @timing
+    def count_fits(self):
+        """Counts the folds fitted by the search, without the refit.
+
+        Returns
+        -------
+        int
+            Number of candidates times number of folds."""
+
+        search = self.classifier['obj']
+
+        return len(ParameterGrid(search.param_grid)) * search.cv
+
+    def search_duration(self):
+        """Sums the processing time of every fit and score of the search.
+
+        The tasks run in worker processes, whose CPU time is not visible to
+        this process, so the time measured by each worker is summed instead.
+
+        Returns
+        -------
+        float
+            Processing time in seconds across all workers."""
+
+        search = self.classifier['obj']
+        splits = search.n_splits_
+        duration = (np.sum(search.cv_results_['mean_fit_time']) +
+                    np.sum(search.cv_results_['mean_score_time'])) * splits
+
+        return round(float(duration + search.refit_time_), 7)
+
+    @profile(sample=1)
     def retrain(self, features, labels):
         """Retrains the machine learning algorithm with the best estimator that
         was chosen by the search.
@@ -85,7 +129,7 @@ class Detector:
         self.classifier['obj'] = self.classifier['obj'].best_estimator_
         self.classifier['obj'].fit(features, labels)
 
-    @timing
+    @profile(sample=1)
     def test(self, test_features):
         """Makes predictions with the machine learning model.
 
@@ -102,6 +146,52 @@ class Detector:
         return self.classifier['obj'].predict(test_features)
 
 
+class ProgressScorer:
+    """Scores the estimator as the default scorer and counts the scored folds.
+
+    The folds are fitted by worker processes, so each one appends a byte to a
+    file whose size is the number of fitted folds.
+
+    Attributes
+    ----------
+    self.path: str
+        Absolute path of the file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, estimator, features, labels):
+        with open(self.path, 'ab') as progress:
+            progress.write(b'.')
+
+        return estimator.score(features, labels)
+
+
+def share_array(array, directory, name):
+    """Dumps an array to a file and loads it memory-mapped.
+
+    The workers of the search receive the file path of a memory-mapped array
+    instead of a pickled copy of the array for each task.
+
+    Parameters
+    ----------
+    array: list
+        Features or labels.
+    directory: str
+        Absolute path of a temporary directory.
+    name: str
+        File name.
+
+    Returns
+    -------
+    memmap
+        Read-only array backed by the file."""
+
+    joblib.dump(np.asarray(array), f'{directory}/{name}')
+
+    return joblib.load(f'{directory}/{name}', mmap_mode='r')
+
+
 # classifiers methods to be used by detector instance.
 classifiers_obj = {
     'decision_tree': {
@@ -21,3 +21,36 @@ def flows_csv(header, flows, dst_path, file_name):
         writer.writerow(header)
         for entry in flows:
             writer.writerow(entry)
+
+
+def flows_csv_chunks(header, chunks, dst_path, file_name):
+    """Exports chunks of flows to CSV file as they are processed, replacing
+    the file if it exists.
+
+    Parameters
+    ----------
+    header: list
+        Features description.
+    chunks: iterable
+        IP flows chunks.
+    dst_path: str
+        Destination path where the file will be exported.
+    file_name: str
+        Name of CSV file.
+
+    Returns
+    -------
+    int
+        Number of exported flows."""
+
+    size = 0
+
+    with open(f'{dst_path}{file_name}', mode='w') as file:
+        writer = csv.writer(file)
+
+        writer.writerow(header)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            size += len(chunk)
+
+    return size
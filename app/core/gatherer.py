@@ -1,8 +1,9 @@
 import csv
 import os
 import subprocess
+from datetime import datetime
 
-from app.core import util
+from app.core import profiling, util
 
 
 def split_pcap(pcap_path, pcap_files, split_size):
@@ -95,7 +96,12 @@ def convert_nfcapd_csv(nfcapd_path, nfcapd_files, csv_path, file_name):
     csv_path: str
         Absolute CSV path.
     file_name: str
-        Name of CSV file."""
+        Name of CSV file.
+
+    Returns
+    -------
+    str
+        Name of the created CSV file."""
 
     file_name = f'{file_name}_' \
                 f'{nfcapd_files[0].split("nfcapd.")[1]}_'\
@@ -107,8 +113,10 @@ def convert_nfcapd_csv(nfcapd_path, nfcapd_files, csv_path, file_name):
                    f'{csv_path}{file_name}',
                    shell=True, check=True)
 
+    return file_name
 
-@util.timing
+
+@profiling.profile
 def open_csv(csv_path, csv_file, sample_size=-1):
     """Opens CSV file.
 
@@ -144,6 +152,131 @@ def open_csv(csv_path, csv_file, sample_size=-1):
     return header, flows
 
 
+def stream_csv(csv_path, csv_file, sample_size=-1, chunk_size=10000,
+               chunk_bytes=None):
+    """Opens CSV file to be read in chunks.
+
+    Unlike open_csv, the IP flows are not loaded at once, so the memory used is
+    bounded by the chunk size instead of the file size.
+
+    Parameters
+    ----------
+    csv_path: list
+        Absolute CSV path.
+    csv_file: list
+        CSV file to be open.
+    sample_size: int
+        Sample size. -1 for all lines.
+    chunk_size: int
+        Maximum number of lines in each chunk.
+    chunk_bytes: int
+        Maximum approximate number of bytes in each chunk. None to consider
+        only the number of lines.
+
+    Returns
+    -------
+    tuple
+        Header and generator of IP flows chunks."""
+
+    file = open(f'{csv_path}{csv_file}')
+    reader = csv.reader(file)
+    header = next(reader)
+
+    return header, read_chunks(file, reader, sample_size,
+                               chunk_size, chunk_bytes)
+
+
+def read_chunks(file, reader, sample_size, chunk_size, chunk_bytes):
+    """Reads the lines of an opened CSV file in chunks.
+
+    The file is closed when all lines are read or the generator is discarded.
+
+    Parameters
+    ----------
+    file: obj
+        Opened CSV file.
+    reader: obj
+        CSV reader of the opened file.
+    sample_size: int
+        Sample size. -1 for all lines.
+    chunk_size: int
+        Maximum number of lines in each chunk.
+    chunk_bytes: int
+        Maximum approximate number of bytes in each chunk.
+
+    Yields
+    ------
+    list of list
+        IP flows chunk."""
+
+    with file:
+        chunk = list()
+        size = 0
+
+        for idx, line in enumerate(reader):
+            # checking if sample was reached.
+            if idx == sample_size:
+                break
+            chunk.append(line)
+
+            if chunk_bytes:
+                # fields length plus the separators.
+                size += sum(map(len, line)) + len(line)
+
+            if (len(chunk) == chunk_size or
+                    (chunk_bytes and size >= chunk_bytes)):
+                yield chunk
+                chunk = list()
+                size = 0
+
+        if chunk:
+            yield chunk
+
+
+def split_windows(flows, window):
+    """Splits the flows into windows of capture time.
+
+    The flows are sorted by start time, as converted by nfdump, and a flow
+    that starts before the previous one stays in the current window.
+
+    Parameters
+    ----------
+    flows: list
+        IP flows without the summary lines.
+    window: int
+        Seconds of capture of each window.
+
+    Yields
+    ------
+    tuple
+        Number of windows since the first one and the flows of the window."""
+
+    epoch = datetime(1970, 1, 1)
+    # window of each unique start time.
+    indexes = dict()
+    first, current, batch = None, 0, list()
+
+    for flow in flows:
+        index = indexes.get(flow[0])
+        if index is None:
+            try:
+                start = datetime.strptime(flow[0], '%Y-%m-%d %H:%M:%S')
+                index = int((start - epoch).total_seconds() // window)
+            except ValueError:
+                index = -1
+            indexes[flow[0]] = index
+
+        if first is None and index >= 0:
+            first = current = index
+        if index > current:
+            yield current - first, batch
+            current, batch = index, list()
+        batch.append(flow)
+
+    if batch:
+        yield current - (first or 0), batch
+
+
 def capture_nfcapd(nfcapd_path, win_time):
     """Captures netflow data from the network according to a time interval and
     store into nfcapd files.
@@ -0,0 +1,394 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+# seconds of the latency buckets, from milliseconds to a nfcapd rotation.
+BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1, 2.5, 5, 10, 30, 60]
+
+
+def escape(value):
+    """Escapes a label value of the text exposition format.
+
+    Parameters
+    ----------
+    value: str
+        Label value.
+
+    Returns
+    -------
+    str
+        Escaped value."""
+
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def sample(name, labels, value):
+    """Formats a sample of the text exposition format.
+
+    Parameters
+    ----------
+    name: str
+        Sample name.
+    labels: list
+        Label names and values.
+    value: float
+        Sample value.
+
+    Returns
+    -------
+    str
+        Sample line."""
+
+    if labels:
+        name += '{' + ','.join(f'{label}="{escape(label_value)}"'
+                               for label, label_value in labels) + '}'
+    if value == float('inf'):
+        return f'{name} +Inf'
+
+    # the shortest representation that keeps every digit of the value.
+    return f'{name} {value!r}'
+
+
+def format_bound(bound):
+    """Formats the upper bound of a histogram bucket.
+
+    Parameters
+    ----------
+    bound: float
+        Upper bound.
+
+    Returns
+    -------
+    str
+        Bound as a label value."""
+
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+class Metric:
+    """Metric with a value by label values.
+
+    Attributes
+    ----------
+    self.name: str
+        Metric name.
+    self.description: str
+        Metric description.
+    self.labels: list
+        Label names.
+    self.values: dict
+        Value by label values.
+    self.lock: obj
+        Lock of the values."""
+
+    type = 'untyped'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = list(labels)
+        self.values = dict()
+        self.lock = threading.Lock()
+        # a metric without labels is exposed before being changed.
+        if not self.labels:
+            self.values[()] = self.initial()
+
+    def initial(self):
+        """Gets the initial value of a label values.
+
+        Returns
+        -------
+        object
+            Initial value."""
+
+        return 0
+
+    def key(self, labels):
+        """Gets the label values in the order of the label names.
+
+        Parameters
+        ----------
+        labels: dict
+            Label values by name.
+
+        Returns
+        -------
+        tuple
+            Label values."""
+
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name} labels are {self.labels}')
+
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def samples(self):
+        """Gets the samples of the metric.
+
+        Returns
+        -------
+        list
+            Name, labels and value of each sample."""
+
+        with self.lock:
+            values = dict(self.values)
+
+        return [(self.name, list(zip(self.labels, key)), value)
+                for key, value in sorted(values.items())]
+
+    def expose(self):
+        """Formats the metric in the text exposition format.
+
+        Returns
+        -------
+        str
+            Help, type and sample lines."""
+
+        lines = [f'# HELP {self.name} {self.description}',
+                 f'# TYPE {self.name} {self.type}']
+        lines.extend(sample(*metric_sample)
+                     for metric_sample in self.samples())
+
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing metric."""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Increases the counter.
+
+        Parameters
+        ----------
+        amount: int
+            Increase.
+        **labels
+            Label values."""
+
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Metric that goes up and down, set or read from a function.
+
+    Attributes
+    ----------
+    self.functions: dict
+        Function returning the value by label values."""
+
+    type = 'gauge'
+
+    def __init__(self, name, description, labels=()):
+        super().__init__(name, description, labels)
+        self.functions = dict()
+
+    def set(self, value, **labels):
+        """Sets the gauge.
+
+        Parameters
+        ----------
+        value: float
+            Gauge value.
+        **labels
+            Label values."""
+
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def track(self, function, **labels):
+        """Reads the gauge from a function whenever it is exposed.
+
+        Parameters
+        ----------
+        function: func
+            Function returning the value, None to stop tracking.
+        **labels
+            Label values."""
+
+        key = self.key(labels)
+        with self.lock:
+            if function is None:
+                self.functions.pop(key, None)
+                self.values.pop(key, None)
+            else:
+                self.functions[key] = function
+
+    def samples(self):
+        with self.lock:
+            functions = dict(self.functions)
+        for key, function in functions.items():
+            value = function()
+            with self.lock:
+                self.values[key] = value
+
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets.
+
+    Attributes
+    ----------
+    self.buckets: list
+        Upper bounds of the buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=BUCKETS):
+        self.buckets = list(buckets) + [float('inf')]
+        super().__init__(name, description, labels)
+
+    def initial(self):
+        # count of each bucket, count and sum of the observations.
+        return [[0] * len(self.buckets), 0, 0.0]
+
+    def observe(self, value, **labels):
+        """Records an observation.
+
+        Parameters
+        ----------
+        value: float
+            Observed value.
+        **labels
+            Label values."""
+
+        key = self.key(labels)
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = self.initial()
+            counts, _, _ = observations = self.values[key]
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[idx] += 1
+                    break
+            observations[1] += 1
+            observations[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the seconds spent in a block.
+
+        Parameters
+        ----------
+        **labels
+            Label values."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            values = {key: (list(counts), count, total)
+                      for key, (counts, count, total) in self.values.items()}
+
+        samples = list()
+        for key, (counts, count, total) in sorted(values.items()):
+            labels = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f'{self.name}_bucket',
+                                labels + [('le', format_bound(bound))],
+                                cumulative))
+            samples.append((f'{self.name}_count', labels, count))
+            samples.append((f'{self.name}_sum', labels, total))
+
+        return samples
+
+
+class Registry:
+    """Metrics exposed together.
+
+    Attributes
+    ----------
+    self.metrics: list
+        Registered metrics."""
+
+    def __init__(self):
+        self.metrics = list()
+
+    def register(self, metric):
+        """Registers a metric.
+
+        Parameters
+        ----------
+        metric: obj
+            Metric instance.
+
+        Returns
+        -------
+        obj
+            The registered metric."""
+
+        self.metrics.append(metric)
+
+        return metric
+
+    def expose(self):
+        """Formats all metrics in the text exposition format.
+
+        Returns
+        -------
+        str
+            Metrics separated by lines."""
+
+        return '\n'.join(metric.expose() for metric in self.metrics) + '\n'
+
+
+registry = Registry()
+
+# realtime detection.
+flows = registry.register(Counter(
+    'ips_realtime_flows_total', 'Flows ingested by the realtime detection.'))
+window_flows = registry.register(Gauge(
+    'ips_realtime_window_flows', 'Flows ingested in the last window.'))
+windows = registry.register(Counter(
+    'ips_realtime_windows_total', 'Windows processed by the realtime '
+    'detection.'))
+stage_seconds = registry.register(Histogram(
+    'ips_realtime_stage_seconds', 'Seconds spent in each stage of a window.',
+    ['stage']))
+window_seconds = registry.register(Histogram(
+    'ips_realtime_window_seconds', 'Seconds from the reception of a window '
+    'until its intrusions are handled.'))
+queue_depth = registry.register(Gauge(
+    'ips_realtime_queue_depth', 'Items waiting in each queue.', ['queue']))
+intrusions = registry.register(Counter(
+    'ips_realtime_intrusions_total', 'Intrusions detected.'))
+active_intrusions = registry.register(Gauge(
+    'ips_realtime_active_intrusions', 'Intrusions not expired yet.'))
+dropped_windows = registry.register(Counter(
+    'ips_realtime_dropped_windows_total', 'Windows dropped by a full queue.',
+    ['stage']))
+dropped_flows = registry.register(Counter(
+    'ips_realtime_dropped_flows_total', 'Flows dropped or left out by the '
+    'sampling of a full queue.', ['stage']))
+
+# mitigation.
+rules = registry.register(Counter(
+    'ips_mitigation_rules_total', 'Flow rules pushed to or removed from '
+    'the controller.', ['action']))
+controller_errors = registry.register(Counter(
+    'ips_mitigation_controller_errors_total', 'Failed requests to the '
+    'controller.', ['method']))
+block_seconds = registry.register(Histogram(
+    'ips_mitigation_block_seconds', 'Seconds from the detection of an '
+    'intrusion until its rule is pushed.'))
+topology_lookups = registry.register(Counter(
+    'ips_mitigation_topology_lookups_total', 'Addresses looked up in the '
+    'topology cache, by result: hit or miss.', ['result']))
+
+# database.
+flush_seconds = registry.register(Histogram(
+    'ips_database_flush_seconds', 'Seconds spent committing the coalesced '
+    'writes.'))
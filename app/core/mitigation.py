@@ -1,8 +1,157 @@
+import bisect
+import ipaddress
 import json
+import logging
+import queue
+import threading
+import time
 from http import client
 
-from app import db
-from app.core import util
+from app import app, db
+from app.core import metrics, profiling
+from app.models import Intrusion
+
+
+logger = logging.getLogger('mitigation')
+
+# connection pools and rule compactors shared by the clients of each
+# controller.
+pools = dict()
+compactors = dict()
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive HTTP connections to a server.
+
+    Connections are created on demand up to the pool size and reused by the
+    next requests, so a request does not cost a TCP handshake.
+
+    Attributes
+    ----------
+    self.host: str
+        Server IP address.
+    self.port: int
+        Server port.
+    self.size: int
+        Maximum number of connections.
+    self.timeout: float
+        Seconds to wait for the server and for a free connection.
+    self.idle: obj
+        Queue of the connections not in use.
+    self.created: int
+        Number of connections created.
+    self.lock: obj
+        Lock of the created counter."""
+
+    def __init__(self, host, port, size, timeout):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Gets an idle connection or creates a new one.
+
+        Returns
+        -------
+        obj
+            HTTP connection."""
+
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                if self.created < self.size:
+                    self.created += 1
+                    return client.HTTPConnection(self.host, self.port,
+                                                 timeout=self.timeout)
+
+        return self.idle.get(timeout=self.timeout)
+
+    def release(self, conn):
+        """Returns a connection to the pool.
+
+        Parameters
+        ----------
+        conn: obj
+            HTTP connection."""
+
+        self.idle.put(conn)
+
+    def request(self, action, uri, body, headers):
+        """Executes a HTTP request through a pooled connection.
+
+        A connection closed by the server while idle is reconnected and the
+        request is sent once more.
+
+        Parameters
+        ----------
+        action: str
+            HTTP method.
+        uri: str
+            URI of the resource.
+        body: str
+            Request body.
+        headers: dict
+            Request headers.
+
+        Returns
+        -------
+        tuple
+            Status code and response body returned by server."""
+
+        conn = self.acquire()
+
+        try:
+            for attempt in range(2):
+                reused = conn.sock is not None
+                try:
+                    conn.request(action, uri, body, headers)
+                    resp = conn.getresponse()
+                    ret = (resp.status, resp.read())
+                    if resp.will_close:
+                        conn.close()
+
+                    return ret
+                except (client.HTTPException, ConnectionError):
+                    # the next request opens a new connection.
+                    conn.close()
+                    if not reused or attempt:
+                        raise
+                except OSError:
+                    conn.close()
+                    raise
+        finally:
+            self.release(conn)
+
+
+def connection_pool(host, port):
+    """Gets the connection pool of a server, creating it if necessary.
+
+    Parameters
+    ----------
+    host: str
+        Server IP address.
+    port: int
+        Server port.
+
+    Returns
+    -------
+    obj
+        ConnectionPool instance."""
+
+    with pools_lock:
+        if (host, port) not in pools:
+            pools[(host, port)] = ConnectionPool(
+                host, port,
+                app.config['CONTROLLER_POOL_SIZE'],
+                app.config['CONTROLLER_TIMEOUT'])
+
+        return pools[(host, port)]
 
 
 class StaticEntryFlowPusher:
@@ -13,12 +162,15 @@ class StaticEntryFlowPusher:
     ----------
     self.controller_ip: str
         IP address of the Floodlight controller.
-    self.controller_port: str
-        Port of the Floodlight controller."""
+    self.controller_port: int
+        Port of the Floodlight controller.
+    self.pool: obj
+        Keep-alive connections to the controller."""
 
     def __init__(self):
-        self.controller_ip = '127.0.0.1'
-        self.controller_port = '8080'
+        self.controller_ip = app.config['CONTROLLER_HOST']
+        self.controller_port = app.config['CONTROLLER_PORT']
+        self.pool = connection_pool(self.controller_ip, self.controller_port)
 
     def rest_call(self, action, uri, data):
         """Executes a REST call to the Floodlight controller.
@@ -37,16 +189,16 @@ class StaticEntryFlowPusher:
         tuple
             Status code and response body returned by server."""
 
-        # HTTP request.
-        conn = client.HTTPConnection(self.controller_ip, self.controller_port)
-        conn.request(action, uri, json.dumps(data),
-                     {'Content-type': 'application/json',
-                      'Accept': 'application/json'})
-
-        # HTTP response.
-        resp = conn.getresponse()
-        ret = (resp.status, resp.read())
-        conn.close()
+        # HTTP request and response.
+        try:
+            ret = self.pool.request(action, uri, json.dumps(data),
+                                    {'Content-type': 'application/json',
+                                     'Accept': 'application/json'})
+        except Exception:
+            metrics.controller_errors.inc(method=action)
+            raise
+        if ret[0] != 200:
+            metrics.controller_errors.inc(method=action)
 
         return ret
 
@@ -97,6 +249,722 @@ class StaticEntryFlowPusher:
         return ret[0] == 200
 
 
+class TopologyCache:
+    """Switch where each device address is attached, from the devices known
+    by the Floodlight controller.
+
+    The devices are downloaded again in background when the time to live
+    expires, or at once when an address is not found.
+
+    Attributes
+    ----------
+    self.pusher: obj
+        StaticEntryFlowPusher instance to get the devices.
+    self.ttl: float
+        Seconds before the devices are downloaded again.
+    self.interval: float
+        Minimum seconds between the downloads caused by unknown addresses.
+    self.switches: dict
+        Switch identification by IPv4 and IPv6 address.
+    self.refreshed: float
+        Time of the last download.
+    self.hits: int
+        Number of addresses found.
+    self.misses: int
+        Number of addresses not found.
+    self.lock: obj
+        Lock of the downloads.
+    self.counters_lock: obj
+        Lock of the hits and misses, the lookups are made by many
+        threads.
+    self.thread: obj
+        Thread of the background download."""
+
+    def __init__(self, pusher, ttl, interval):
+        self.pusher = pusher
+        self.ttl = ttl
+        self.interval = interval
+        self.switches = dict()
+        self.refreshed = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.counters_lock = threading.Lock()
+        self.thread = None
+
+    def lookup(self, address):
+        """Gets the switch where an address is attached.
+
+        Parameters
+        ----------
+        address: str
+            IPv4 or IPv6 address.
+
+        Returns
+        -------
+        str
+            Switch identification, None if the address is unknown."""
+
+        address = normalize_address(address)
+        switch = self.switches.get(address)
+
+        if switch is not None:
+            with self.counters_lock:
+                self.hits += 1
+            metrics.topology_lookups.inc(result='hit')
+            if time.time() - self.refreshed > self.ttl:
+                self.refresh_background()
+
+            return switch
+
+        with self.counters_lock:
+            self.misses += 1
+        metrics.topology_lookups.inc(result='miss')
+        # the device may have been attached after the last download.
+        if time.time() - self.refreshed > self.interval:
+            self.refresh()
+
+        return self.switches.get(address)
+
+    def refresh(self):
+        """Downloads the devices and indexes them by address."""
+
+        with self.lock:
+            # another thread may have just downloaded them.
+            if time.time() - self.refreshed <= self.interval:
+                return
+
+            switches = dict()
+            for device in self.pusher.get()['devices']:
+                if not device.get('attachmentPoint'):
+                    continue
+                switch = device['attachmentPoint'][0]['switch']
+                for address in (device.get('ipv4', list()) +
+                                device.get('ipv6', list())):
+                    switches[normalize_address(address)] = switch
+
+            # replacing the dict at once, the lookups are not locked.
+            self.switches = switches
+            self.refreshed = time.time()
+        logger.info(f'devices addresses: {len(switches)}')
+
+    def refresh_background(self):
+        """Downloads the devices in a thread, if not downloading yet."""
+
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.refresh, daemon=True)
+            self.thread.start()
+
+    def stats(self):
+        """Gets the counters of the cache.
+
+        Returns
+        -------
+        dict
+            Number of hits, misses and addresses."""
+
+        with self.counters_lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'addresses': len(self.switches)}
+
+
+class MitigationDispatcher:
+    """Blocks the intrusions in background threads, so the detection does
+    not wait for the controller.
+
+    The intrusions are queued and blocked, unblocked when they expire or
+    blocked again when the switch removed their idle rule, by a fixed number
+    of threads, the rule names are collected to be saved in bulk.
+
+    Attributes
+    ----------
+    self.mitigator: obj
+        Mitigator instance.
+    self.workers: int
+        Number of threads blocking intrusions at the same time.
+    self.requests: obj
+        Queue of the actions, intrusions and queuing times.
+    self.results: list
+        Key and rule name of the intrusions blocked since the last
+        collection.
+    self.lock: obj
+        Lock of the results.
+    self.threads: list
+        Threads blocking the intrusions."""
+
+    def __init__(self, mitigator, workers):
+        self.mitigator = mitigator
+        self.workers = workers
+        self.requests = queue.Queue()
+        self.results = list()
+        self.lock = threading.Lock()
+        self.threads = list()
+
+    def start(self):
+        """Starts the threads."""
+
+        self.threads = [threading.Thread(target=self.work, daemon=True)
+                        for _ in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """Stops the threads after the queued intrusions are blocked."""
+
+        for _ in self.threads:
+            self.requests.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = list()
+
+    def submit(self, intrusion):
+        """Queues an intrusion to be blocked.
+
+        Parameters
+        ----------
+        intrusion: obj
+            Intrusion object."""
+
+        self.requests.put(('block', intrusion, time.perf_counter()))
+
+    def retire(self, intrusion):
+        """Queues an expired intrusion to be unblocked.
+
+        Parameters
+        ----------
+        intrusion: obj
+            Intrusion object with its rule name."""
+
+        self.requests.put(('unblock', intrusion, time.perf_counter()))
+
+    def renew(self, intrusion):
+        """Queues an intrusion whose rule was removed by the switch to be
+        blocked again.
+
+        Parameters
+        ----------
+        intrusion: obj
+            Intrusion object with the removed rule name."""
+
+        self.requests.put(('renew', intrusion, time.perf_counter()))
+
+    def work(self):
+        """Blocks or unblocks the queued intrusions until stopped."""
+
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+
+            action, intrusion, queued = request
+            key = (intrusion.source_address, intrusion.destination_address,
+                   intrusion.protocol)
+            if action == 'unblock':
+                try:
+                    self.mitigator.unblock(intrusion)
+                    metrics.rules.inc(action='unblock')
+                except Exception as error:
+                    logger.error(f'intrusion not unblocked: {key}, '
+                                 f'error: {error}')
+                continue
+
+            try:
+                if action == 'renew':
+                    rule = self.mitigator.renew(intrusion)
+                else:
+                    rule = self.mitigator.block_attack(intrusion)
+            except Exception as error:
+                logger.error(f'intrusion not blocked: {key}, error: {error}')
+                continue
+
+            if rule:
+                # time-to-block, including the wait in the queue.
+                metrics.block_seconds.observe(time.perf_counter() - queued)
+                metrics.rules.inc(action='block')
+                with self.lock:
+                    self.results.append((key, rule))
+            else:
+                logger.error(f'intrusion not blocked: {key}')
+
+    def collect(self):
+        """Gets the intrusions blocked since the last collection.
+
+        Returns
+        -------
+        list
+            Key and rule name of each intrusion."""
+
+        with self.lock:
+            results, self.results = self.results, list()
+
+        return results
+
+
+def is_ipv4(*addresses):
+    """Checks if all addresses are IPv4.
+
+    Parameters
+    ----------
+    *addresses
+        IP addresses.
+
+    Returns
+    -------
+    bool
+        True if all addresses are IPv4."""
+
+    try:
+        for address in addresses:
+            ipaddress.IPv4Address(address)
+    except ValueError:
+        return False
+
+    return True
+
+
+def normalize_address(address):
+    """Converts IPv6 addresses to the compressed format.
+
+    The controller and the flows can display the same IPv6 address in
+    different formats.
+
+    Parameters
+    ----------
+    address: str
+        IPv4 or IPv6 address.
+
+    Returns
+    -------
+    str
+        IPv4 address or compressed IPv6 address."""
+
+    if ':' in address:
+        try:
+            return ipaddress.ip_address(address).compressed
+        except ValueError:
+            pass
+
+    return address
+
+
+class RuleCompactor:
+    """Blocked sources merged in prefix rules, by switch and destination.
+
+    Adjacent sources are merged in the minimal set of prefixes, which cover
+    only blocked sources. If allowed, when a switch would have more rules
+    than its maximum, the sources are grouped in wider prefixes, also
+    covering hosts not blocked, never shorter than the minimum prefix
+    length. The new rules still over the maximum are left out, starting
+    from the prefixes with the fewest sources. Only the rules that changed
+    are pushed to or deleted from the controller.
+
+    Attributes
+    ----------
+    self.pusher: obj
+        StaticEntryFlowPusher instance to push and delete the rules.
+    self.min_prefix: int
+        Minimum prefix length of the rules.
+    self.max_rules: int
+        Maximum number of rules of a switch.
+    self.widen: bool
+        Whether the prefixes may cover sources not blocked.
+    self.timeouts: dict
+        Idle and hard timeouts of the rules.
+    self.sources: dict
+        Blocked IPv4 sources as integers by switch and destination.
+    self.rules: dict
+        Rules installed by switch and name.
+    self.locks: dict
+        Lock of each switch, the rules of a switch are pushed in order.
+    self.lock: obj
+        Lock of the locks dict.
+    self.restored: obj
+        Event set once the sources blocked before a restart are restored."""
+
+    def __init__(self, pusher, min_prefix, max_rules, widen=False,
+                 idle_timeout=0, hard_timeout=0):
+        self.pusher = pusher
+        self.min_prefix = min_prefix
+        self.max_rules = max_rules
+        self.widen = widen
+        self.timeouts = {'idle_timeout': str(idle_timeout),
+                         'hard_timeout': str(hard_timeout)}
+        self.sources = dict()
+        self.rules = dict()
+        self.locks = dict()
+        self.lock = threading.Lock()
+        self.restored = threading.Event()
+
+    def switch_lock(self, switch):
+        with self.lock:
+            return self.locks.setdefault(switch, threading.Lock())
+
+    def add(self, switch, source, destination):
+        """Blocks a source and pushes the changed rules of its switch.
+
+        Parameters
+        ----------
+        switch: str
+            Switch identification.
+        source: str
+            IPv4 source address.
+        destination: str
+            IPv4 destination address.
+
+        Returns
+        -------
+        bool
+            True if a rule of the switch blocks the source, or will block it
+            once pushed again, and False if it was left out."""
+
+        address = int(ipaddress.IPv4Address(source))
+
+        with self.switch_lock(switch):
+            destinations = self.sources.setdefault(switch, dict())
+            destinations.setdefault(destination, set()).add(address)
+            rules = self.push(switch)
+
+            if blocks(rules, address, destination):
+                return True
+
+            # a source left out is not kept, its intrusion has no rule.
+            destinations[destination].discard(address)
+            if not destinations[destination]:
+                del destinations[destination]
+
+        return False
+
+    def renew(self, switch, source, destination):
+        """Blocks again a source whose prefix rule was removed by the switch,
+        the rule being pushed again even if the prefixes did not change.
+
+        Parameters
+        ----------
+        switch: str
+            Switch identification.
+        source: str
+            IPv4 source address.
+        destination: str
+            IPv4 destination address.
+
+        Returns
+        -------
+        bool
+            True if a rule of the switch blocks the source, or will block it
+            once pushed again, and False if it was left out."""
+
+        address = int(ipaddress.IPv4Address(source))
+
+        with self.switch_lock(switch):
+            installed = self.rules.get(switch, dict())
+            # the removed rule is still recorded as installed.
+            for name in [name for name, rule in installed.items()
+                         if blocks({name: rule}, address, destination)]:
+                del installed[name]
+
+        return self.add(switch, source, destination)
+
+    def restore(self, blocked, get_switch):
+        """Blocks again the sources blocked before a restart and pushes the
+        rules of their switches.
+
+        Parameters
+        ----------
+        blocked: list
+            Source and destination IPv4 addresses of the blocked intrusions.
+        get_switch: func
+            Gets the switch where a source is attached."""
+
+        switches = set()
+        for source, destination in blocked:
+            switch = get_switch(source)
+            if switch is None:
+                logger.warning(f'source not restored: {source}, '
+                               f'unknown switch')
+                continue
+
+            destinations = self.sources.setdefault(switch, dict())
+            destinations.setdefault(destination, set()).add(
+                int(ipaddress.IPv4Address(source)))
+            switches.add(switch)
+
+        for switch in switches:
+            with self.switch_lock(switch):
+                self.push(switch)
+        logger.info(f'restored switches: {len(switches)}')
+
+    def remove(self, source, destination):
+        """Unblocks a source and pushes the changed rules of its switches.
+
+        Parameters
+        ----------
+        source: str
+            IPv4 source address.
+        destination: str
+            IPv4 destination address."""
+
+        address = int(ipaddress.IPv4Address(source))
+
+        for switch in list(self.sources):
+            with self.switch_lock(switch):
+                sources = self.sources[switch].get(destination, set())
+                if address in sources:
+                    sources.discard(address)
+                    if not sources:
+                        del self.sources[switch][destination]
+                    self.push(switch)
+
+    def push(self, switch):
+        """Pushes the new rules and deletes the old rules of a switch.
+
+        Only the rules accepted by the controller are recorded, so the failed
+        ones are pushed or deleted again by the next push of the switch.
+
+        Parameters
+        ----------
+        switch: str
+            Switch identification.
+
+        Returns
+        -------
+        dict
+            Rules of the switch by name, including the failed ones."""
+
+        rules = self.compact(switch)
+        installed = dict(self.rules.get(switch, dict()))
+        pushed, deleted = 0, 0
+
+        # the new rules are pushed first to not unblock any source.
+        for name in rules.keys() - installed.keys():
+            if self.request(self.pusher.post, rules[name]):
+                installed[name] = rules[name]
+                pushed += 1
+        for name in installed.keys() - rules.keys():
+            if self.request(self.pusher.delete, {'name': name}):
+                del installed[name]
+                deleted += 1
+        self.rules[switch] = installed
+        logger.info(f'switch: {switch}, rules: {len(installed)}, '
+                    f'pushed: {pushed}, deleted: {deleted}, '
+                    f'failed: {len(rules.keys() ^ installed.keys())}')
+
+        return rules
+
+    @staticmethod
+    def request(method, rule):
+        """Pushes or deletes a rule, the errors of the controller are logged.
+
+        Parameters
+        ----------
+        method: func
+            Post or delete method of the pusher.
+        rule: dict
+            Rule, or its name to delete it.
+
+        Returns
+        -------
+        bool
+            True if the controller accepted the request and False otherwise."""
+
+        try:
+            if method(rule):
+                return True
+            logger.error(f'rule not changed: {rule["name"]}')
+        except Exception as error:
+            logger.error(f'rule not changed: {rule["name"]}, error: {error}')
+
+        return False
+
+    def compact(self, switch):
+        """Creates the prefix rules of a switch.
+
+        Parameters
+        ----------
+        switch: str
+            Switch identification.
+
+        Returns
+        -------
+        dict
+            Rules by name."""
+
+        destinations = self.sources.get(switch, dict())
+
+        # the sources are grouped in wider prefixes until the rules fit, if
+        # the prefixes may cover sources not blocked.
+        granularities = (range(32, self.min_prefix - 1, -1) if self.widen
+                         else [32])
+        for granularity in granularities:
+            prefixes = {destination: collapse_addresses(sources,
+                                                        granularity,
+                                                        self.min_prefix)
+                        for destination, sources in destinations.items()}
+            if sum(map(len, prefixes.values())) <= self.max_rules:
+                break
+
+        networks = [(destination, network)
+                    for destination, destination_networks in prefixes.items()
+                    for network in destination_networks]
+        if len(networks) > self.max_rules:
+            logger.warning(f'switch: {switch}, rules over the maximum: '
+                           f'{len(networks) - self.max_rules}')
+            # keeping the installed prefixes, so no blocked source is
+            # unblocked, and then the prefixes of the most sources.
+            installed = self.rules.get(switch, dict())
+            sources = covered_sources(destinations, prefixes)
+            networks = sorted(
+                networks,
+                key=lambda network: (
+                    f'block_{switch}_{network[1]}_{network[0]}'
+                    not in installed, -sources[network]))
+            networks = networks[:self.max_rules]
+
+        rules = dict()
+        for destination, network in networks:
+            name = f'block_{switch}_{network}_{destination}'
+            rules[name] = {'switch': switch, 'name': name, 'cookie': '0',
+                           'priority': '32768', 'active': 'true',
+                           'eth_type': '0x0800', 'ipv4_src': network,
+                           'ipv4_dst': destination, **self.timeouts}
+
+        return rules
+
+
+def blocks(rules, address, destination):
+    """Checks if a rule blocks a source.
+
+    Parameters
+    ----------
+    rules: dict
+        Rules by name.
+    address: int
+        IPv4 source address as integer.
+    destination: str
+        IPv4 destination address.
+
+    Returns
+    -------
+    bool
+        True if the source is blocked and False otherwise."""
+
+    source = ipaddress.IPv4Address(address)
+
+    return any(rule['ipv4_dst'] == destination and
+               source in ipaddress.IPv4Network(rule['ipv4_src'])
+               for rule in rules.values())
+
+
+def covered_sources(destinations, prefixes):
+    """Counts the sources covered by each prefix.
+
+    Parameters
+    ----------
+    destinations: dict
+        IPv4 sources as integers by destination.
+    prefixes: dict
+        Sorted prefixes covering the sources by destination.
+
+    Returns
+    -------
+    dict
+        Number of sources by destination and prefix."""
+
+    counts = dict()
+
+    for destination, networks in prefixes.items():
+        starts = [int(ipaddress.IPv4Network(network).network_address)
+                  for network in networks]
+        for source in destinations[destination]:
+            network = networks[bisect.bisect_right(starts, source) - 1]
+            counts[(destination, network)] = counts.get(
+                (destination, network), 0) + 1
+
+    return counts
+
+
+def collapse_addresses(addresses, granularity, min_prefix):
+    """Merges IPv4 addresses in the minimal list of prefixes.
+
+    Parameters
+    ----------
+    addresses: set
+        IPv4 addresses as integers.
+    granularity: int
+        Prefix length of the smallest prefixes. Lengths shorter than 32 also
+        cover addresses not in the set.
+    min_prefix: int
+        Minimum prefix length of the merged prefixes.
+
+    Returns
+    -------
+    list
+        Prefixes in the address/length format."""
+
+    mask = (2**32 - 1) >> (32-granularity) << (32-granularity)
+    networks = list()
+
+    for address in sorted({address & mask for address in addresses}):
+        networks.append((address, granularity))
+
+        # merging the last two prefixes while they are siblings.
+        while len(networks) > 1:
+            (first, length), (second, second_length) = networks[-2:]
+            size = 1 << (32-length)
+            if (length != second_length or length - 1 < min_prefix or
+                    first & size or first + size != second):
+                break
+            networks[-2:] = [(first, length - 1)]
+
+    return [f'{ipaddress.IPv4Address(address)}/{length}'
+            for address, length in networks]
+
+
+def rule_compactor(mitigator):
+    """Gets the rule compactor of a controller, creating it if necessary.
+
+    A new compactor restores the sources of the intrusions blocked by prefix
+    rules, so they can be unblocked after a restart. The restore is executed
+    outside the lock of the pools, the other callers wait for it.
+
+    Parameters
+    ----------
+    mitigator: obj
+        Mitigator instance.
+
+    Returns
+    -------
+    obj
+        RuleCompactor instance."""
+
+    key = (mitigator.controller_ip, mitigator.controller_port)
+
+    with pools_lock:
+        created = key not in compactors
+        if created:
+            compactors[key] = RuleCompactor(
+                mitigator,
+                app.config['RULE_MIN_PREFIX'],
+                app.config['RULE_MAX_PER_SWITCH'],
+                app.config['RULE_WIDEN_PREFIX'],
+                app.config['RULE_IDLE_TIMEOUT'],
+                app.config['RULE_HARD_TIMEOUT'])
+        compactor = compactors[key]
+
+    if created:
+        try:
+            compactor.restore(
+                db.session.query(Intrusion.source_address,
+                                 Intrusion.destination_address)
+                .filter_by(rule='compact').all(),
+                mitigator.get_switch)
+        finally:
+            compactor.restored.set()
+    else:
+        compactor.restored.wait()
+
+    return compactor
+
+
 class Mitigator(StaticEntryFlowPusher):
     """Mitigates intrusions by inserting flow table entries in the
     OpenFlow devices through the Floodlight controller.
@@ -109,17 +977,33 @@ class Mitigator(StaticEntryFlowPusher):
     self.count: int
         Counter of the flow rules.
     self.rule: dict
-        Rule pattern to be used to block an intrusion."""
+        Rule pattern to be used to block an intrusion, the switch removes
+        it after the idle or hard timeout.
+    self.topology: obj
+        Switch of each device address.
+    self.lock: obj
+        Lock of the rules counter, the intrusions can be blocked by many
+        threads.
+    self.compactor: obj
+        Prefix rules of the blocked sources, None if the rules are not
+        compacted."""
 
     def __init__(self):
         super().__init__()
         self.count = 1
+        self.lock = threading.Lock()
         self.rule = {'switch': '', 'name': '', 'cookie': '0',
                      'priority': '32768', 'active': 'true',
                      'eth_type': '0x0800', 'ipv4_src': '',
-                     'ipv4_dst': ''}
+                     'ipv4_dst': '',
+                     'idle_timeout': str(app.config['RULE_IDLE_TIMEOUT']),
+                     'hard_timeout': str(app.config['RULE_HARD_TIMEOUT'])}
+        self.topology = TopologyCache(self, app.config['TOPOLOGY_TTL'],
+                                      app.config['TOPOLOGY_MISS_INTERVAL'])
+        self.compactor = (rule_compactor(self)
+                          if app.config['RULE_COMPACTION'] else None)
 
-    @util.timing
+    @profiling.profile
     def get_switch(self, source_address):
         """Gets the switch where the intrusion device are attached.
 
@@ -133,39 +1017,92 @@ class Mitigator(StaticEntryFlowPusher):
         str
             Switch identification."""
 
-        network_data = self.get()
+        return self.topology.lookup(source_address)
 
-        for device in network_data['devices']:
-              if device['ipv4']:
-                  if source_address == device['ipv4'][0]:
-                    return device['attachmentPoint'][0]['switch']
-
-    @util.timing
+    @profiling.profile
     def block_attack(self, intrusion):
         """Inserts flow rules to blocked the intrusion devices.
 
-        Flow rules are saved in a database to allow deletion if the blocked
-        device is a false positive.
+        The rule name must be saved in a database to allow deletion if the
+        blocked device is a false positive.
 
         Parameters
         ----------
         intrusion: obj
-            Intrusion object."""
+            Intrusion object.
+
+        Returns
+        -------
+        str
+            Rule name, compact if the source is blocked by a prefix rule or
+            None if the rule was not inserted."""
+
+        switch = self.get_switch(intrusion.source_address)
+        if switch is None:
+            # no rule of an unknown switch would block the source.
+            logger.warning(f'intrusion not blocked: '
+                           f'{intrusion.source_address}, unknown switch')
+            return None
+
+        if self.compactor and is_ipv4(intrusion.source_address,
+                                      intrusion.destination_address):
+            if self.compactor.add(switch, intrusion.source_address,
+                                  intrusion.destination_address):
+                return 'compact'
+            return None
+
+        with self.lock:
+            name = 'block' + str(self.count)
+            self.count += 1
 
         # defining rule.
-        self.rule['switch'] = self.get_switch(intrusion.source_address)
-        self.rule['name'] = 'block' + str(self.count)
-        self.rule['ipv4_src'] = intrusion.source_address
-        self.rule['ipv4_dst'] = intrusion.destination_address
-        self.post(self.rule)
-
-        self.count += 1
-        # saving rule in database.
-        intrusion.rule = self.rule['name']
-        db.session.add(intrusion)
-        db.session.commit()
-
-    @util.timing
+        rule = dict(self.rule)
+        rule['switch'] = switch
+        rule['name'] = name
+        rule['ipv4_src'] = intrusion.source_address
+        rule['ipv4_dst'] = intrusion.destination_address
+
+        if self.post(rule):
+            return name
+
+    def renew(self, intrusion):
+        """Blocks again an intrusion whose rule was removed by the switch.
+
+        The prefix rule of a compacted source is pushed again, the other
+        rules are deleted, as they are still known by the controller, and
+        inserted again.
+
+        Parameters
+        ----------
+        intrusion: obj
+            Intrusion object with the removed rule name.
+
+        Returns
+        -------
+        str
+            Rule name, compact if the source is blocked by a prefix rule or
+            None if the rule was not inserted."""
+
+        if intrusion.rule == 'compact' and self.compactor:
+            switch = self.get_switch(intrusion.source_address)
+            if switch is None:
+                logger.warning(f'intrusion not blocked: '
+                               f'{intrusion.source_address}, unknown switch')
+                return None
+            if self.compactor.renew(switch, intrusion.source_address,
+                                    intrusion.destination_address):
+                return 'compact'
+            return None
+
+        try:
+            self.unblock(intrusion)
+        except Exception as error:
+            logger.warning(f'removed rule not deleted: {intrusion.rule}, '
+                           f'error: {error}')
+
+        return self.block_attack(intrusion)
+
+    @profiling.profile
     def remove_rule(self, rule):
         """Deletes the flow rule in case of a false positive.
 
@@ -175,3 +1112,19 @@ class Mitigator(StaticEntryFlowPusher):
             Rule name to be deleted."""
 
         self.delete({'name': rule})
+
+    def unblock(self, intrusion):
+        """Removes the rule or the source from the prefix rules that block an
+        intrusion.
+
+        Parameters
+        ----------
+        intrusion: obj
+            Intrusion object."""
+
+        if intrusion.rule == 'compact':
+            if self.compactor:
+                self.compactor.remove(intrusion.source_address,
+                                      intrusion.destination_address)
+        else:
+            self.remove_rule(intrusion.rule)
@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core import exporter, gatherer
+from app.core.preprocessing import Formatter, Modifier
+
+
+def preprocess_file(path, file, dst_path, sample, label, threshold,
+                    chunk_size, chunk_bytes):
+    """Gathers, formats, aggregates and exports the flows of a CSV file.
+
+    It runs independently of other files, so it can be executed by a worker
+    process.
+
+    Parameters
+    ----------
+    path: str
+        Absolute CSV path.
+    file: str
+        CSV file with raw IP flows.
+    dst_path: str
+        Destination path where the modified flows will be exported.
+    sample: int
+        Sample size. -1 for all lines.
+    label: int
+        Flow class.
+    threshold: int
+        Aggregation threshold.
+    chunk_size: int
+        Maximum number of lines in each chunk.
+    chunk_bytes: int
+        Maximum approximate number of bytes in each chunk.
+
+    Returns
+    -------
+    tuple
+        File name, number of modified flows and duration in seconds."""
+
+    start = time.perf_counter()
+
+    # gathering flows in chunks.
+    header, chunks = gatherer.stream_csv(path, file, sample,
+                                         chunk_size, chunk_bytes)
+
+    # preprocessing flows.
+    formatter = Formatter(bulk=True)
+    header = formatter.format_header(header)
+    chunks = formatter.format_chunks(chunks)
+
+    modifier = Modifier(label=label, threshold=threshold)
+    header = modifier.extend_header(header)
+    chunks = modifier.aggregate_chunks(chunks)
+
+    # exporting flows, the size is only known at the end.
+    name = file.split('.csv')[0]
+    try:
+        size = exporter.flows_csv_chunks(header, chunks, dst_path,
+                                         f'{name}_s.csv')
+    except Exception:
+        # a partial file is never renamed as a preprocessed file.
+        if os.path.exists(f'{dst_path}{name}_s.csv'):
+            os.remove(f'{dst_path}{name}_s.csv')
+        raise
+    os.replace(f'{dst_path}{name}_s.csv', f'{dst_path}{name}_s{size}.csv')
+
+    duration = round(time.perf_counter() - start, 7)
+
+    return file, size, duration
+
+
+def preprocess_files(path, files, dst_path, sample, label, threshold,
+                     chunk_size, chunk_bytes, workers):
+    """Preprocesses many CSV files, in parallel if more than one worker.
+
+    Each file is preprocessed by a worker process of a pool and generates its
+    own CSV file.
+
+    Parameters
+    ----------
+    path: str
+        Absolute CSV path.
+    files: list
+        CSV files with raw IP flows.
+    dst_path: str
+        Destination path where the modified flows will be exported.
+    sample: int
+        Sample size. -1 for all lines.
+    label: int
+        Flow class.
+    threshold: int
+        Aggregation threshold.
+    chunk_size: int
+        Maximum number of lines in each chunk.
+    chunk_bytes: int
+        Maximum approximate number of bytes in each chunk.
+    workers: int
+        Maximum number of worker processes.
+
+    Returns
+    -------
+    list of tuple
+        File name, number of modified flows and duration of each file."""
+
+    arguments = [(path, file, dst_path, sample, label, threshold,
+                  chunk_size, chunk_bytes) for file in files]
+
+    if workers > 1 and len(files) > 1:
+        # forked workers would inherit the locks held by the threads of the
+        # application.
+        with ProcessPoolExecutor(
+                min(workers, len(files)),
+                mp_context=multiprocessing.get_context('spawn')) as executor:
+            return list(executor.map(preprocess_file, *zip(*arguments)))
+
+    return [preprocess_file(*args) for args in arguments]
@@ -0,0 +1,372 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from app.core import metrics
+from app.core.preprocessing import Extractor, Formatter, Modifier
+
+
+logger = logging.getLogger('pipeline')
+
+# policies of a full queue of windows.
+policies = ['block', 'drop_oldest', 'sample']
+
+# window detector of each worker process.
+worker = dict()
+
+
+class WindowDetector:
+    """Formats, aggregates and classifies the flows of a window.
+
+    It is sent once to each worker process, so the windows carry only their
+    flows.
+
+    Attributes
+    ----------
+    self.detector: obj
+        Detector instance.
+    self.features: list
+        Indexes of the features of the model.
+    self.threshold: int
+        Aggregation threshold.
+    self.batch_size: int
+        Maximum number of flows classified by each prediction."""
+
+    def __init__(self, detector, features, threshold, batch_size):
+        if batch_size < 1:
+            raise ValueError(f'batch size must be at least 1, '
+                             f'got {batch_size}')
+        self.detector = detector
+        self.features = features
+        self.threshold = threshold
+        self.batch_size = batch_size
+
+    def __call__(self, flows, formatted):
+        """Detects the intrusions of a window.
+
+        Parameters
+        ----------
+        flows: list
+            IP flows without the summary lines.
+        formatted: bool
+            Whether the flows are already formatted.
+
+        Returns
+        -------
+        tuple
+            Aggregated flows classified as intrusions, number of aggregated
+            flows and seconds of each stage."""
+
+        seconds = dict()
+
+        start = time.perf_counter()
+        if not formatted:
+            formatter = Formatter(gather=False, bulk=True)
+            flows = formatter.format_flows(flows)
+        seconds['format'] = time.perf_counter() - start
+
+        # aggregating the whole window before classifying it.
+        start = time.perf_counter()
+        flows = Modifier(2, self.threshold).aggregate_flows(flows)
+        seconds['aggregate'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        features, _ = Extractor(self.features).extract_features_labels(flows)
+        seconds['extract'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        intrusions = list()
+        for idx in range(0, len(flows), self.batch_size):
+            # detecting intrusions of a batch at once.
+            pred = self.detector.test(features[idx:idx+self.batch_size])
+            intrusions.extend(flow for flow, label
+                              in zip(flows[idx:idx+self.batch_size], pred)
+                              if label)
+        seconds['predict'] = time.perf_counter() - start
+
+        return intrusions, len(flows), seconds
+
+
+def start_worker(window_detector):
+    """Keeps the window detector of a worker process.
+
+    Parameters
+    ----------
+    window_detector: obj
+        WindowDetector instance."""
+
+    worker['detector'] = window_detector
+
+
+def detect_window(flows, formatted):
+    """Detects the intrusions of a window in a worker process.
+
+    Parameters
+    ----------
+    flows: list
+        IP flows without the summary lines.
+    formatted: bool
+        Whether the flows are already formatted.
+
+    Returns
+    -------
+    tuple
+        Aggregated flows classified as intrusions, number of aggregated
+        flows and seconds of each stage."""
+
+    return worker['detector'](flows, formatted)
+
+
+class Window:
+    """Flows received together.
+
+    Attributes
+    ----------
+    self.flows: list
+        IP flows without the summary lines.
+    self.formatted: bool
+        Whether the flows are already formatted.
+    self.index: int
+        Number of windows since the first one of a replay, None otherwise.
+    self.size: int
+        Number of received flows.
+    self.received: float
+        Performance counter of the reception."""
+
+    def __init__(self, flows, formatted, index=None):
+        self.flows = flows
+        self.formatted = formatted
+        self.index = index
+        self.size = len(flows)
+        self.received = time.perf_counter()
+
+
+class WindowQueue(queue.Queue):
+    """Bounded queue of windows that applies a policy when it is full.
+
+    With the block policy the producer waits, with drop oldest the oldest
+    window is discarded and with sample the oldest window is discarded and
+    only one in some flows of the new window are kept.
+
+    Attributes
+    ----------
+    self.name: str
+        Name of the stage that consumes the queue.
+    self.policy: str
+        Policy of the full queue.
+    self.sample: int
+        One in how many flows are kept when sampling."""
+
+    def __init__(self, name, size, policy, sample):
+        if policy not in policies:
+            raise ValueError(f'unknown policy: {policy}, '
+                             f'expected one of {policies}')
+        # a single flow in one would keep the whole window.
+        if policy == 'sample' and sample < 2:
+            raise ValueError(f'sample must be at least 2, got {sample}')
+        super().__init__(size)
+        self.name = name
+        self.policy = policy
+        self.sample = sample
+
+    def offer(self, window):
+        """Queues a window according to the policy.
+
+        Parameters
+        ----------
+        window: obj
+            Window instance."""
+
+        if self.policy == 'drop_oldest':
+            while True:
+                try:
+                    self.put_nowait(window)
+                    return
+                except queue.Full:
+                    pass
+                try:
+                    dropped = self.get_nowait()
+                except queue.Empty:
+                    continue
+                metrics.dropped_windows.inc(stage=self.name)
+                metrics.dropped_flows.inc(dropped.size, stage=self.name)
+                logger.warning(f'{self.name} queue full, dropped window of '
+                               f'{dropped.size} flows')
+
+        if self.policy == 'sample':
+            try:
+                self.put_nowait(window)
+                return
+            except queue.Full:
+                pass
+
+            window.flows = window.flows[::self.sample]
+            # the producer never waits for the detection.
+            while True:
+                try:
+                    dropped = self.get_nowait()
+                except queue.Empty:
+                    dropped = None
+                if dropped:
+                    # the sampled flows of the window were already counted.
+                    metrics.dropped_windows.inc(stage=self.name)
+                    metrics.dropped_flows.inc(len(dropped.flows),
+                                              stage=self.name)
+                    logger.warning(f'{self.name} queue full, dropped window '
+                                   f'of {dropped.size} flows')
+                try:
+                    self.put_nowait(window)
+                    break
+                except queue.Full:
+                    pass
+            metrics.dropped_flows.inc(window.size - len(window.flows),
+                                      stage=self.name)
+            logger.warning(f'{self.name} queue full, sampled window of '
+                           f'{window.size} flows')
+            return
+
+        self.put(window)
+
+
+class Pipeline:
+    """Detects and mitigates the windows of flows in concurrent stages.
+
+    The source of the flows, such as the capture, queues the windows. The
+    detection stage formats, aggregates and classifies them in worker
+    processes, if more than one worker, and the mitigation stage handles the
+    intrusions in order. The stages are connected by bounded queues, the
+    policy of the detection queue decides what happens when the detection
+    falls behind, and the mitigation queue always blocks, so that the
+    detected intrusions are never dropped.
+
+    Attributes
+    ----------
+    self.window_detector: obj
+        WindowDetector instance.
+    self.handle: func
+        Function called by the mitigation stage with each window and its
+        detection.
+    self.idle: func
+        Function called by the mitigation stage while there are no windows.
+    self.interval: float
+        Seconds without windows before calling the idle function.
+    self.workers: int
+        Number of worker processes detecting the windows.
+    self.windows: obj
+        WindowQueue instance of the detection stage.
+    self.detections: obj
+        Queue of the windows and their pending detection.
+    self.executor: obj
+        Pool of the worker processes, None with a single worker.
+    self.threads: list
+        Threads of the detection and mitigation stages."""
+
+    def __init__(self, window_detector, handle, idle, interval, size,
+                 policy, sample, workers):
+        self.window_detector = window_detector
+        self.handle = handle
+        self.idle = idle
+        self.interval = interval
+        self.workers = workers
+        self.windows = WindowQueue('detection', size, policy, sample)
+        # enough detections pending to keep every worker busy.
+        self.detections = queue.Queue(max(size, workers))
+        self.executor = None
+        self.threads = list()
+
+    def start(self):
+        """Starts the stages."""
+
+        if self.workers > 1:
+            # forked workers would inherit the locks held by the threads of
+            # the application.
+            self.executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=start_worker, initargs=(self.window_detector,))
+
+        self.threads = [threading.Thread(target=self.detecting, daemon=True),
+                        threading.Thread(target=self.mitigating, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        metrics.queue_depth.track(self.windows.qsize, queue='detection')
+        metrics.queue_depth.track(self.detections.qsize, queue='detected')
+
+    def stop(self):
+        """Stops the stages after the queued windows."""
+
+        self.windows.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = list()
+
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+        metrics.queue_depth.track(None, queue='detection')
+        metrics.queue_depth.track(None, queue='detected')
+
+    def submit(self, flows, formatted=False, index=None):
+        """Queues a window of flows.
+
+        Parameters
+        ----------
+        flows: list
+            IP flows without the summary lines.
+        formatted: bool
+            Whether the flows are already formatted.
+        index: int
+            Number of windows since the first one of a replay."""
+
+        metrics.flows.inc(len(flows))
+        metrics.window_flows.set(len(flows))
+        metrics.windows.inc()
+
+        self.windows.offer(Window(flows, formatted, index))
+
+    def detecting(self):
+        """Detects the queued windows until stopped."""
+
+        while True:
+            window = self.windows.get()
+            if window is None:
+                self.detections.put(None)
+                break
+
+            if self.executor:
+                detection = self.executor.submit(detect_window, window.flows,
+                                                 window.formatted)
+            else:
+                detection = Future()
+                try:
+                    detection.set_result(self.window_detector(
+                        window.flows, window.formatted))
+                except Exception as error:
+                    detection.set_exception(error)
+            # the worker process has its own copy of the flows.
+            window.flows = None
+            self.detections.put((window, detection))
+
+    def mitigating(self):
+        """Handles the detected windows in order until stopped."""
+
+        while True:
+            try:
+                item = self.detections.get(timeout=self.interval)
+            except queue.Empty:
+                try:
+                    self.idle()
+                except Exception as error:
+                    logger.exception(f'idle mitigation failed: {error}')
+                continue
+            if item is None:
+                break
+
+            window, detection = item
+            try:
+                self.handle(window, detection.result())
+            except Exception as error:
+                logger.exception(f'window of {window.size} flows not '
+                                 f'detected: {error}')
@@ -1,11 +1,32 @@
 import ast
-from datetime import datetime
+import logging
+from datetime import datetime, timedelta
+from itertools import product
+from operator import itemgetter
 
+import numpy as np
 from sklearn.preprocessing import (StandardScaler, MinMaxScaler,
                                    MaxAbsScaler, RobustScaler,
                                    QuantileTransformer, Normalizer)
 
-from app.core import util
+from app.core import columnar, profiling, util
+from app.core.columnar import FlowColumns
+
+
+logger = logging.getLogger('preprocessing')
+
+# values of the missing features, by position in the sorted flow.
+default_values = {0: '0001-01-01 01:01:01', 1: '0001-01-01 01:01:01',
+                  2: '000.000.000.000', 3: '000.000.000.000',
+                  4: 'NONE', 5: '......', 6: '0', 7: '0',
+                  8: '0', 9: '0', 10: '0'}
+
+# TCP flags counts of the 64 flags strings displayed by nfdump.
+flags_table = {''.join(flag if bit else '.'
+                       for flag, bit in zip('UAPRSF', bits)):
+               [bits['UAPRSF'.index(flag)]
+                for flag in columnar.flags_order]
+               for bits in product([0, 1], repeat=6)}
 
 
 class Formatter:
@@ -18,13 +39,17 @@ class Formatter:
     self.gather: bool
         Signals the gathering process.
     self.train: bool
-        Signals the training process."""
+        Signals the training process.
+    self.bulk: bool
+        Signals the formatting of whole columns at once instead of flow by
+        flow. The result is the same."""
 
-    def __init__(self, gather=True, train=False):
+    def __init__(self, gather=True, train=False, bulk=False):
         self.gather = gather
         self.train = train
+        self.bulk = bulk
 
-    @util.timing
+    @profiling.profile
     def format_header(self, header):
         """Format the header.
 
@@ -43,7 +68,7 @@ class Formatter:
 
         return header
 
-    @util.timing
+    @profiling.profile
     def format_flows(self, flows):
         """Formats the flows to be used by the machine learning algorithms.
 
@@ -61,16 +86,268 @@ class Formatter:
             # deleting summary lines.
             del flows[-3:]
 
+        if self.bulk and not self.train:
+            return self.format_bulk(flows)
+
         for flow in flows:
-            if not self.train:
-                self.delete_features(flow)
-                self.sort_features(flow)
-                self.replace_features(flow)
-                self.count_flags(flow)
-            self.convert_features(flow)
+            self.format_flow(flow)
+
+        return flows
+
+    def format_chunks(self, chunks):
+        """Formats chunks of flows as they are read.
+
+        When gathering, the last three lines of the last chunk are held back
+        and deleted, because they are the summary lines.
+
+        Parameters
+        ----------
+        chunks: iterable
+            IP flows chunks.
+
+        Yields
+        ------
+        list of list
+            Formatted IP flows chunk."""
+
+        tail = list()
+
+        for chunk in chunks:
+            if self.gather:
+                # holding back the possible summary lines.
+                chunk = tail + chunk
+                tail = chunk[-3:]
+                del chunk[-3:]
+
+            if self.bulk and not self.train:
+                chunk = self.format_bulk(chunk)
+            else:
+                for flow in chunk:
+                    self.format_flow(flow)
+
+            if chunk:
+                yield chunk
+
+    def format_bulk(self, flows):
+        """Formats whole columns at once and rebuilds the flows.
+
+        Parameters
+        ----------
+        flows: list of list
+            IP flows without the summary lines.
+
+        Returns
+        -------
+        list of list
+            Formatted IP flows."""
+
+        with util.gc_paused():
+            return self.rebuild_flows(flows)
+
+    def rebuild_flows(self, flows):
+        """Rebuilds the flows from the converted columns.
+
+        Parameters
+        ----------
+        flows: list of list
+            IP flows without the summary lines.
+
+        Returns
+        -------
+        list of list
+            Formatted IP flows."""
+
+        columns = [list(column) for column in self.select_columns(flows)]
+
+        # replacing the missing features of the whole column.
+        for idx, column in enumerate(columns):
+            if '' in column:
+                default = default_values[idx]
+                columns[idx] = [feature or default for feature in column]
+
+        # each unique value is converted only once.
+        times = self.parse_times(columns[0] + columns[1])
+        flags = {flags: self.flags_counts(flags)
+                 for flags in set(columns[5])}
+        durations = {duration: round(float(duration))
+                     for duration in set(columns[8])}
+
+        flows[:] = map(list, zip(
+            map(times.__getitem__, columns[0]),
+            map(times.__getitem__, columns[1]),
+            columns[2], columns[3], columns[4],
+            [flags[flow_flags][:] if protocol == 'TCP' else [0]
+             for flow_flags, protocol in zip(columns[5], columns[4])],
+            columns[6], columns[7],
+            map(durations.__getitem__, columns[8]),
+            map(int, columns[9]), map(int, columns[10])))
 
         return flows
 
+    def parse_times(self, values):
+        """Parses the unique dates and times of a column at once.
+
+        Parameters
+        ----------
+        values: list
+            Dates and times in the %Y-%m-%d %H:%M:%S format.
+
+        Returns
+        -------
+        dict
+            Datetime object of each date and time string."""
+
+        uniques = list(set(values))
+        # datetime64 parses the fixed format of the whole array.
+        times = np.array(uniques, dtype='datetime64[s]').astype(object)
+
+        return dict(zip(uniques, times.tolist()))
+
+    def select_columns(self, flows):
+        """Selects the features in the same order of sort features.
+
+        Parameters
+        ----------
+        flows: list of list
+            IP flows without the summary lines.
+
+        Returns
+        -------
+        list
+            Tuples with the values of each sorted feature."""
+
+        getter = itemgetter(0, 1, 3, 4, 7, 8, 5, 6, 2, 11, 12)
+
+        return list(zip(*map(getter, flows))) or [()] * 11
+
+    def flags_columns(self, column, tcp):
+        """Counts the TCP flags of a whole column.
+
+        Each unique flags string is counted once, through the flags table.
+
+        Parameters
+        ----------
+        column: array
+            Flags strings.
+        tcp: array
+            Signals the TCP flows, the others have no flags counted.
+
+        Returns
+        -------
+        array
+            Matrix with the flags counts."""
+
+        uniques, inverse = np.unique(column, return_inverse=True)
+        counts = np.array([self.flags_counts(flags)
+                           for flags in uniques.tolist()],
+                          dtype=np.uint16).reshape(-1, 6)
+        flags = counts[inverse.reshape(-1)]
+        flags[~tcp] = 0
+
+        return flags
+
+    def flags_counts(self, flags):
+        """Counts the TCP flags of a flags string.
+
+        Parameters
+        ----------
+        flags: str
+            Flags string.
+
+        Returns
+        -------
+        list
+            Flags counts in the U, A, S, F, R, P order."""
+
+        counts = flags_table.get(flags)
+        if counts is None:
+            # strings out of the nfdump pattern are counted.
+            counts = [flags.count(flag) for flag in columnar.flags_order]
+
+        return list(counts)
+
+    @profiling.profile
+    def format_columns(self, flows):
+        """Formats the flows column-wise into a columnar representation.
+
+        Parameters
+        ----------
+        flows: list of list
+            IP flows.
+
+        Returns
+        -------
+        obj
+            FlowColumns instance with the formatted IP flows."""
+
+        if self.gather:
+            # deleting summary lines.
+            del flows[-3:]
+
+        if self.train:
+            return self.convert_columns(flows)
+
+        columns = [np.array(column, dtype=str)
+                   for column in self.select_columns(flows)]
+
+        # replacing the missing features of the whole column.
+        for idx, column in enumerate(columns):
+            columns[idx] = np.where(column == '', default_values[idx], column)
+
+        protocol, protocols = columnar.encode_protocols(columns[4])
+        flags = self.flags_columns(columns[5], columns[4] == 'TCP')
+
+        offsets = np.arange(len(protocol) + 1, dtype=np.int64)
+
+        return FlowColumns(columnar.encode_times(columns[0]),
+                           columnar.encode_times(columns[1]),
+                           columnar.encode_addresses(columns[2]),
+                           columnar.encode_addresses(columns[3]),
+                           protocol, protocols, flags,
+                           columnar.encode_ports(columns[6]), offsets,
+                           columnar.encode_ports(columns[7]), offsets.copy(),
+                           np.rint(columns[8].astype(float)).astype(np.int64),
+                           columns[9].astype(np.int64),
+                           columns[10].astype(np.int64))
+
+    def convert_columns(self, flows):
+        """Converts the features of modified flows column-wise.
+
+        Parameters
+        ----------
+        flows: list of list
+            Modified IP flows read from a CSV file.
+
+        Returns
+        -------
+        obj
+            FlowColumns instance with the modified IP flows."""
+
+        columns = list(zip(*flows)) or [()] * len(columnar.features)
+
+        for idx in [5, 6, 7]:
+            columns[idx] = columnar.parse_literals(columns[idx])
+        columns[8] = np.rint(np.array(columns[8], dtype=float))
+        for idx in range(8, len(columns)):
+            columns[idx] = np.array(columns[idx], dtype=np.int64)
+
+        return FlowColumns.from_columns(columns)
+
+    def format_flow(self, flow):
+        """Formats a unique flow.
+
+        Parameters
+        ----------
+        flow: list
+            IP flow."""
+
+        if not self.train:
+            self.delete_features(flow)
+            self.sort_features(flow)
+            self.replace_features(flow)
+            self.count_flags(flow)
+        self.convert_features(flow)
+
     def delete_features(self, flow):
         """Deletes non-discriminative features.
 
@@ -102,11 +379,6 @@ class Formatter:
         flow: list
             IP flow."""
 
-        default_values = {0: '0001-01-01 01:01:01', 1: '0001-01-01 01:01:01',
-                          2: '000.000.000.000', 3: '000.000.000.000',
-                          4: 'NONE', 5: '......', 6: '0', 7: '0',
-                          8: '0', 9: '0', 10: '0'}
-
         for idx, feature in enumerate(flow):
             if not feature:
                 flow[idx] = default_values[idx]
@@ -137,11 +409,8 @@ class Formatter:
             IP flow."""
 
         if flow[4] == 'TCP':
-            flags = ['U', 'A', 'S', 'F', 'R', 'P']
-            # filtering only the flags.
-            flow[5] = [flag for flag in flow[5] if flag != '.']
             # new list with flags order and count.
-            flow[5] = [flow[5].count(flag) for flag in flags]
+            flow[5] = self.flags_counts(flow[5])
         else:
             flow[5] = [0]
 
@@ -162,7 +431,7 @@ class Modifier:
         self.label = label
         self.threshold = threshold
 
-    @util.timing
+    @profiling.profile
     def extend_header(self, header):
         """Extendes header according to new aggregations features.
 
@@ -180,10 +449,17 @@ class Modifier:
 
         return header
 
-    @util.timing
+    @profiling.profile
     def aggregate_flows(self, flows):
         """Aggregates the flows to be used by the machine learning algorithms.
 
+        The flows are aggregated in a single pass, considering the same start
+        hour and minute, source address, destination address and protocol.
+
+        The threshold is useful when the flow to be aggregate from an
+        intrusion, like a DoS attack. When an aggregation reaches the
+        threshold, the next matching flow starts a new one.
+
         Parameters
         ----------
         flows: list of list
@@ -194,65 +470,269 @@ class Modifier:
         list of list
             Modified IP flows."""
 
+        # aggregations in the order of their first flow.
+        aggregations = list()
+        # aggregations that still accept flows.
+        opened = dict()
+
+        for flow in flows:
+            key = (flow[0].hour, flow[0].minute, flow[2], flow[3], flow[4])
+            aggregation = opened.get(key)
+
+            if aggregation is None:
+                # the first flow is the base of the aggregation, the unique
+                # ports and the number of aggregated flows are kept aside.
+                aggregation = [flow, {flow[6]}, {flow[7]}, 1]
+                aggregations.append(aggregation)
+            else:
+                self.aggregate(aggregation, flow)
+
+            # checking if threshold was reached.
+            if aggregation[3] == self.threshold:
+                opened.pop(key, None)
+            else:
+                opened[key] = aggregation
+
+        return [self.finish(aggregation) for aggregation in aggregations]
+
+    @profiling.profile
+    def aggregate_columns(self, columns):
+        """Aggregates the flows column-wise.
+
+        The result is the same of the aggregate flows method, using sorting
+        and reductions over the arrays instead of Python loops.
+
+        Parameters
+        ----------
+        columns: obj
+            FlowColumns instance with the formatted IP flows.
+
+        Returns
+        -------
+        obj
+            FlowColumns instance with the modified IP flows."""
+
+        size = len(columns)
+        start = columns.start
+
+        # grouping by start hour and minute, addresses and protocol.
+        keys = np.column_stack([start // 3600 % 24, start // 60 % 60,
+                                columns.protocol]).astype(np.uint64)
+        keys = np.column_stack([keys, columns.source, columns.destination])
+        group = np.unique(keys, axis=0,
+                          return_inverse=True)[1].reshape(-1)
+
+        # position of each flow inside its group, in the original order.
+        order = np.argsort(group, kind='stable')
+        bounds = self.bounds(group[order])
+        rank = np.empty(size, dtype=np.int64)
+        rank[order] = (np.arange(size) -
+                       np.repeat(bounds, np.diff(np.append(bounds, size))))
+
+        # starting a new aggregation each time the threshold is reached.
+        part = rank // self.threshold if self.threshold > 0 else 0
+        aggregation = np.unique(group * size + part,
+                                return_inverse=True)[1].reshape(-1)
+
+        # sorting the aggregations by their first flow, the base flow.
+        order = np.argsort(aggregation, kind='stable')
+        bounds = self.bounds(aggregation[order])
+        position = np.empty(len(bounds), dtype=np.int64)
+        position[np.argsort(order[bounds])] = np.arange(len(bounds))
+        aggregation = position[aggregation]
+        order = np.argsort(aggregation, kind='stable')
+        bounds = self.bounds(aggregation[order])
+        base = order[bounds]
+
+        start = start[base]
+        end = np.maximum.reduceat(columns.end[order], bounds)
+        flags = np.add.reduceat(columns.flags[order].astype(np.uint32),
+                                bounds, axis=0)
+        packets = np.add.reduceat(columns.packets[order], bounds)
+        bytes = np.add.reduceat(columns.bytes[order], bounds)
+        source_ports, source_offsets = self.unique_ports(
+            columns.source_ports, columns.source_offsets, aggregation,
+            len(bounds))
+        destination_ports, destination_offsets = self.unique_ports(
+            columns.destination_ports, columns.destination_offsets,
+            aggregation, len(bounds))
+
+        # recalculating time duration, ignoring days as timedelta seconds.
+        duration = (end - start) % 86400
+
+        modified = {'bps': self.divide(bytes, duration),
+                    'bpp': self.divide(bytes, packets),
+                    'pps': self.divide(packets, duration),
+                    'nsp': np.diff(source_offsets),
+                    'ndp': np.diff(destination_offsets),
+                    'flw': np.diff(np.append(bounds, size)),
+                    'label': np.full(len(bounds), self.label,
+                                     dtype=np.int64)}
+
+        return FlowColumns(start, end, columns.source[base],
+                           columns.destination[base], columns.protocol[base],
+                           columns.protocols, flags,
+                           source_ports, source_offsets,
+                           destination_ports, destination_offsets,
+                           duration, packets, bytes, modified)
+
+    def bounds(self, values):
+        """Finds where each run of equal values starts in a sorted array.
+
+        Parameters
+        ----------
+        values: array
+            Sorted values.
+
+        Returns
+        -------
+        array
+            Start positions."""
+
+        if not len(values):
+            return np.zeros(0, dtype=np.int64)
+
+        return np.flatnonzero(np.append(True, values[1:] != values[:-1]))
+
+    def unique_ports(self, ports, offsets, aggregation, size):
+        """Keeps only the unique ports of each aggregation.
+
+        Parameters
+        ----------
+        ports: array
+            Ports of all flows.
+        offsets: array
+            Position of each flow ports.
+        aggregation: array
+            Aggregation of each flow.
+        size: int
+            Number of aggregations.
+
+        Returns
+        -------
+        tuple
+            Unique ports of all aggregations and the position of each
+            aggregation ports."""
+
+        owner = np.repeat(aggregation, np.diff(offsets))
+        keys = np.unique(owner << 32 | ports.astype(np.int64))
+        counts = np.bincount(keys >> 32, minlength=size)
+        new_offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(counts, out=new_offsets[1:])
+
+        return (keys & 0xffffffff).astype(np.int32), new_offsets
+
+    def divide(self, dividend, divisor):
+        """Divides arrays rounding the result, 0 where the divisor is 0.
+
+        Parameters
+        ----------
+        dividend: array
+            Dividend values.
+        divisor: array
+            Divisor values.
+
+        Returns
+        -------
+        array
+            Rounded quotients."""
+
+        quotient = np.zeros(len(dividend))
+        np.divide(dividend, divisor, out=quotient, where=divisor != 0)
+
+        return np.rint(quotient).astype(np.int64)
+
+    def aggregate_chunks(self, chunks):
+        """Aggregates chunks of formatted flows as they are read.
+
+        The flows of each start minute are held until a flow two minutes
+        later arrives, so the result is the same of the aggregate flows
+        method when the flows are ordered by the start time, as exported by
+        nfdump, or out of order by at most a minute. A flow of a minute
+        already aggregated is logged, since it is aggregated apart. The
+        memory is bounded by the flows of two start minutes, not by the
+        chunk size.
+
+        Parameters
+        ----------
+        chunks: iterable
+            Formatted IP flows chunks.
+
+        Yields
+        ------
+        list of list
+            Modified IP flows chunk."""
+
+        # flows by start minute, in the order of their first flow.
+        windows = dict()
+        latest = None
+        late = 0
+
+        for chunk in chunks:
+            agg_flows = list()
+
+            for flow in chunk:
+                minute = flow[0].replace(second=0, microsecond=0)
+                if latest is None or minute > latest:
+                    latest = minute
+                    for start in list(windows):
+                        if start < latest - timedelta(minutes=1):
+                            agg_flows.extend(
+                                self.aggregate_flows(windows.pop(start)))
+                elif minute < latest - timedelta(minutes=1):
+                    late += 1
+                windows.setdefault(minute, list()).append(flow)
+
+            if agg_flows:
+                yield agg_flows
+
+        if late:
+            logger.warning(f'flows out of order: {late}, aggregated apart '
+                           f'from their start minute')
         agg_flows = list()
+        for flows in windows.values():
+            agg_flows.extend(self.aggregate_flows(flows))
+        if agg_flows:
+            yield agg_flows
 
-        while flows:
-            agg_flow, flows = self.aggregate(flows)
-            agg_flows.append(agg_flow)
+    def aggregate(self, aggregation, flow):
+        """Aggregates a formatted IP flow into an aggregation.
 
-        return agg_flows
+        Parameters
+        ----------
+        aggregation: list
+            Base flow, source ports, destination ports and number of
+            aggregated flows.
+        flow: list
+            Formatted IP flow."""
 
-    def aggregate(self, flows):
-        """Aggregates a formatted IP flow according to a established threshold.
+        base = aggregation[0]
 
-        The flow are aggregated considering the same start hour and minute,
-        source address, destination address and protocol.
+        # avoiding flows out of order.
+        if base[1] < flow[1]:
+            base[1] = flow[1]
+        base[5] = [x+y for x, y in zip(base[5], flow[5])]
+        base[9] += flow[9]
+        base[10] += flow[10]
+        aggregation[1].add(flow[6])
+        aggregation[2].add(flow[7])
+        aggregation[3] += 1
 
-        The threshold is useful when the flow to be aggregate from an
-        intrusion, like a DoS attack.
+    def finish(self, aggregation):
+        """Finishes an aggregation creating the modified IP flow.
 
         Parameters
         ----------
-        flows: list of list
-            Formatted IP flows.
+        aggregation: list
+            Base flow, source ports, destination ports and number of
+            aggregated flows.
 
         Returns
         -------
         list
             Modified IP flow."""
 
-        # separating the flow that will be matched against the others.
-        base = flows.pop(0)
-
-        # keeps only the unique ports.
-        sp = {base[6]}
-        dp = {base[7]}
-        # 1 is used instead of 0 because the base flow.
-        agg = 1
-
-        # comparing the base flow with the rest of the flows.
-        for idx, flow in enumerate(flows):
-            # checking if threshold was reached.
-            if agg != self.threshold:
-                rules = [base[0].hour == flow[0].hour,
-                         base[0].minute == flow[0].minute,
-                         base[2:5] == flow[2:5]]
-
-                if all(rules):
-                    # avoiding flows out of order.
-                    if base[1] < flow[1]:
-                        base[1] = flow[1]
-                    base[5] = [x+y for x, y in zip(base[5], flow[5])]
-                    base[8] = base[1] - base[0]
-                    base[9] += flow[9]
-                    base[10] += flow[10]
-                    sp.add(flow[6])
-                    dp.add(flow[7])
-                    # marking aggregated flows.
-                    flows[idx] = [None]
-                    agg += 1
-            else:
-                break
+        base, sp, dp, agg = aggregation
 
         base[6] = sp
         base[7] = dp
@@ -265,11 +745,7 @@ class Modifier:
         base.append(agg)
         self.create_features(base)
 
-        if agg > 1:
-            # filtering only the remaining flows.
-            flows = [flow for flow in flows if flow[0]]
-
-        return base, flows
+        return base
 
     def create_features(self, base):
         """Creates new features based on bytes, packtes and flow duration.
@@ -306,7 +782,7 @@ class Extractor:
     def __init__(self, selected_features):
         self.selected_features = selected_features
 
-    @util.timing
+    @profiling.profile
     def extract_features_labels(self, flows):
         """Extracts features and labels from flows.
 
@@ -328,6 +804,42 @@ class Extractor:
 
         return features, labels
 
+    @profiling.profile
+    def extract_columns(self, columns):
+        """Extracts features and labels column-wise.
+
+        Parameters
+        ----------
+        columns: obj
+            FlowColumns instance with the modified IP flows.
+
+        Returns
+        -------
+        tuple
+            Features matrix and labels array to be split into appropriate
+            sets."""
+
+        features = np.column_stack([columns.column(idx)
+                                    for idx in self.selected_features])
+
+        return features, columns.modified['label']
+
+    def extract_chunks(self, chunks):
+        """Extracts features and labels from chunks of flows as they are read.
+
+        Parameters
+        ----------
+        chunks: iterable
+            Formatted and modified flows chunks.
+
+        Yields
+        ------
+        tuple
+            Features and labels of the chunk."""
+
+        for chunk in chunks:
+            yield self.extract_features_labels(chunk)
+
     def extract(self, flow):
         """Extracts features and label from a unique flow.
 
@@ -0,0 +1,345 @@
+import json
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from pytz import timezone
+
+
+logger = logging.getLogger('profiling')
+
+# the histograms have linear buckets inside each power of two, from a
+# microsecond to about twelve days.
+MINIMUM = 1e-6
+STEPS = 8
+BUCKETS = 40 * STEPS + 1
+
+
+def bucket(duration):
+    """Finds the histogram bucket of a duration.
+
+    Parameters
+    ----------
+    duration: float
+        Duration in seconds.
+
+    Returns
+    -------
+    int
+        Bucket index."""
+
+    if duration <= MINIMUM:
+        return 0
+    mantissa, exponent = math.frexp(duration / MINIMUM)
+
+    return min((exponent-1)*STEPS + int((mantissa*2-1)*STEPS) + 1,
+               BUCKETS - 1)
+
+
+def upper_bound(index):
+    """Gets the largest duration of a histogram bucket.
+
+    Parameters
+    ----------
+    index: int
+        Bucket index.
+
+    Returns
+    -------
+    float
+        Duration in seconds."""
+
+    if not index:
+        return MINIMUM
+    octave, step = divmod(index - 1, STEPS)
+
+    return MINIMUM * 2**octave * (1 + (step+1)/STEPS)
+
+
+class Counter:
+    """Calls and sampled durations of a function in a thread.
+
+    Attributes
+    ----------
+    self.calls: int
+        Number of calls.
+    self.sampled: int
+        Number of timed calls.
+    self.time: float
+        Sum of the timed durations.
+    self.maximum: float
+        Largest timed duration.
+    self.histogram: list
+        Number of timed calls in each bucket."""
+
+    __slots__ = ['calls', 'sampled', 'time', 'maximum', 'histogram']
+
+    def __init__(self):
+        self.calls = 0
+        self.sampled = 0
+        self.time = 0.0
+        self.maximum = 0.0
+        self.histogram = [0] * BUCKETS
+
+    def record(self, duration):
+        """Records a timed call.
+
+        Parameters
+        ----------
+        duration: float
+            Duration in seconds."""
+
+        self.sampled += 1
+        self.time += duration
+        if duration > self.maximum:
+            self.maximum = duration
+        self.histogram[bucket(duration)] += 1
+
+    def merge(self, other):
+        """Adds the calls of other counter.
+
+        Parameters
+        ----------
+        other: obj
+            Counter instance."""
+
+        self.calls += other.calls
+        self.sampled += other.sampled
+        self.time += other.time
+        self.maximum = max(self.maximum, other.maximum)
+        self.histogram = [count + other_count for count, other_count
+                          in zip(self.histogram, other.histogram)]
+
+    def percentile(self, rank):
+        """Estimates a percentile of the timed durations.
+
+        Parameters
+        ----------
+        rank: float
+            Percentile between 0 and 1.
+
+        Returns
+        -------
+        float
+            Upper bound of the bucket of the percentile, at most the largest
+            duration."""
+
+        target = max(math.ceil(rank * self.sampled), 1)
+        cumulative = 0
+        for index, count in enumerate(self.histogram):
+            cumulative += count
+            if cumulative >= target:
+                return min(upper_bound(index), self.maximum)
+
+        return self.maximum
+
+    def describe(self):
+        """Describes the calls.
+
+        The cumulative time is estimated from the timed calls, all of them
+        if every call is timed.
+
+        Returns
+        -------
+        dict
+            Calls, timed calls, cumulative, mean, percentiles and maximum
+            durations in seconds."""
+
+        mean = self.time / self.sampled if self.sampled else 0.0
+
+        return {'calls': self.calls,
+                'sampled': self.sampled,
+                'time': round(mean * self.calls, 7),
+                'mean': round(mean, 7),
+                'p50': round(self.percentile(0.5), 7),
+                'p95': round(self.percentile(0.95), 7),
+                'p99': round(self.percentile(0.99), 7),
+                'max': round(self.maximum, 7)}
+
+
+class Profiler:
+    """Counts the calls and the latencies of the profiled functions.
+
+    Each thread counts in its own table, so a call never waits for a lock,
+    and the tables are only merged when read. One in some calls of each
+    function is timed, the first one always.
+
+    Attributes
+    ----------
+    self.sample: int
+        One in how many calls are timed by default, 0 to only count them.
+    self.local: obj
+        Table and last timed calls of the current thread.
+    self.tables: list
+        Threads and their tables of counters by function name.
+    self.retired: dict
+        Counters merged from the threads that finished.
+    self.lock: obj
+        Lock of the tables, taken once by each thread and by the readers."""
+
+    def __init__(self, sample=10):
+        self.sample = sample
+        self.local = threading.local()
+        self.tables = list()
+        self.retired = dict()
+        self.lock = threading.Lock()
+
+    def configure(self, sample):
+        """Sets the default sampling of the profiled functions.
+
+        Parameters
+        ----------
+        sample: int
+            One in how many calls are timed, 0 to only count them."""
+
+        self.sample = sample
+
+    def table(self):
+        """Gets the table of the current thread.
+
+        Returns
+        -------
+        dict
+            Counters by function name."""
+
+        try:
+            return self.local.table
+        except AttributeError:
+            table = self.local.table = dict()
+            self.local.last = dict()
+            with self.lock:
+                self.tables.append((threading.current_thread(), table))
+
+            return table
+
+    def profile(self, func=None, sample=None):
+        """Decorator to count the calls and time the sampled ones.
+
+        Parameters
+        ----------
+        func: func
+            Function to profile.
+        sample: int
+            One in how many calls are timed, by default the sample of the
+            profiler, 0 to only count them.
+
+        Returns
+        -------
+        func
+            Profiled function."""
+
+        if func is None:
+            return lambda func: self.profile(func, sample)
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @wraps(func)
+        def profiled(*args, **kwargs):
+            table = self.table()
+            counter = table.get(name)
+            if counter is None:
+                counter = table[name] = Counter()
+            counter.calls += 1
+
+            rate = self.sample if sample is None else sample
+            if not rate or (counter.calls-1) % rate:
+                return func(*args, **kwargs)
+
+            date = time.time()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                counter.record(duration)
+                self.local.last[name] = (date, duration)
+
+        profiled.profile = name
+
+        return profiled
+
+    def last(self, func):
+        """Gets the last timed call of a function in the current thread.
+
+        Parameters
+        ----------
+        func: func
+            Profiled function.
+
+        Returns
+        -------
+        tuple
+            Date and duration of the call, None if it was not timed."""
+
+        self.table()
+        call = self.local.last.get(func.profile)
+        if call is None:
+            return None
+        date, duration = call
+
+        return (datetime.fromtimestamp(date, timezone('America/Sao_Paulo')),
+                round(duration, 7))
+
+    def snapshot(self):
+        """Merges the counters of all threads.
+
+        Returns
+        -------
+        dict
+            Description of the calls by function name."""
+
+        with self.lock:
+            alive = list()
+            for thread, table in self.tables:
+                if thread.is_alive():
+                    alive.append((thread, table))
+                else:
+                    # a finished thread no longer changes its table.
+                    for name, counter in table.items():
+                        self.retired.setdefault(name, Counter()).merge(
+                            counter)
+            self.tables = alive
+
+            counters = dict()
+            for name, counter in self.retired.items():
+                counters.setdefault(name, Counter()).merge(counter)
+            for _, table in alive:
+                # the owner can add functions meanwhile.
+                for name, counter in list(table.items()):
+                    counters.setdefault(name, Counter()).merge(counter)
+
+        return {name: counters[name].describe()
+                for name in sorted(counters)}
+
+    def reset(self):
+        """Discards the counters of all threads."""
+
+        with self.lock:
+            for _, table in self.tables:
+                for name in list(table):
+                    table[name] = Counter()
+            self.retired = dict()
+
+    def dump(self, path):
+        """Writes the counters of all threads in a JSON file.
+
+        Parameters
+        ----------
+        path: str
+            Absolute path of the file."""
+
+        with open(path, 'w') as dump_file:
+            json.dump({'date': datetime.now(
+                           timezone('America/Sao_Paulo')).isoformat(),
+                       'functions': self.snapshot()},
+                      dump_file, indent=4)
+        logger.info(f'profiling dumped: {path}')
+
+
+profiler = Profiler()
+configure = profiler.configure
+profile = profiler.profile
+last = profiler.last
+snapshot = profiler.snapshot
+dump = profiler.dump
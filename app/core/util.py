@@ -1,8 +1,7 @@
+import gc
 import logging
 import os
-import time
-from datetime import datetime
-from pytz import timezone
+from contextlib import contextmanager
 
 
 logger = logging.getLogger('util')
@@ -37,53 +36,21 @@ def make_directory(path, directory):
         count += 1
 
 
-def timing(func):
-    """Decorator to record the time of a function.
+@contextmanager
+def gc_paused():
+    """Pauses the cyclic garbage collector.
 
-    Parameters
-    ----------
-    func: func
-        Function to calculate the processing time.
-
-    Returns
-    -------
-    func
-        Timer function to processes the time of a function"""
-
-    def timer(*args, **kwargs):
-        """Processes the time of a function.
-
-        Parameters
-        ----------
-        *args
-            Variable length argument list.
-        **kwargs
-            Arbitrary keyword arguments.
-
-        Returns
-        -------
-        list
-            If the function passed as an argument is to train or execute the
-            classifier, the return will be the normal return of the function,
-            date and duration.
-
-            Otherwise only the normal return of the passed function as argument
-            will be returned."""
-
-        date = datetime.now(timezone('America/Sao_Paulo'))
-        start = time.time()
-        result = func(*args, **kwargs)
-        end = time.time()
-        duration = round(end - start, 7)
-
-        logger.info(f'{func.__name__} duration: {duration}')
-
-        if func.__name__ == 'train' or func.__name__ == 'test':
-            return result, date, duration
-        else:
-            return result
+    Creating millions of lists triggers collections that traverse all the
+    flows already in memory, although flows have no reference cycles."""
+
+    enabled = gc.isenabled()
+    gc.disable()
 
-    return timer
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
 
 
 def directory_content(path):
@@ -50,6 +50,9 @@ class PreprocessingFlowsForm(FlaskForm):
     label = IntegerField('Flows label',
                          widget=NumberInput(min=0, max=10),
                          validators=[InputRequired(), NumberRange(0, 10)])
+    workers = IntegerField('Worker processes',
+                           widget=NumberInput(min=1, max=64),
+                           validators=[DataRequired(), NumberRange(1, 64)])
     submit = SubmitField('Submit')
 
 
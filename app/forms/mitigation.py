@@ -0,0 +1,33 @@
+from flask_wtf import FlaskForm
+from wtforms import SelectField, StringField, SubmitField
+from wtforms.fields.html5 import DateTimeLocalField
+from wtforms.validators import Length, Optional
+
+
+class IntrusionFilterForm(FlaskForm):
+    # the filters are in the URL, so the pages can be linked.
+    class Meta:
+        csrf = False
+
+    source = StringField('Source address prefix',
+                         validators=[Optional(), Length(max=39)])
+    destination = StringField('Destination address prefix',
+                              validators=[Optional(), Length(max=39)])
+    protocol = SelectField('Protocol',
+                           choices=[['', 'Any'], ['TCP', 'TCP'],
+                                    ['UDP', 'UDP'], ['ICMP', 'ICMP']],
+                           default='')
+    start = DateTimeLocalField('Start time', format='%Y-%m-%dT%H:%M',
+                               validators=[Optional()])
+    end = DateTimeLocalField('End time', format='%Y-%m-%dT%H:%M',
+                             validators=[Optional()])
+    sort = SelectField('Sort by',
+                       choices=[['id', 'Detection'],
+                                ['start_time', 'Start time'],
+                                ['end_time', 'End time']],
+                       default='id')
+    order = SelectField('Order',
+                        choices=[['desc', 'Descending'],
+                                 ['asc', 'Ascending']],
+                        default='desc')
+    submit = SubmitField('Filter')
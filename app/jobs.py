@@ -0,0 +1,425 @@
+import copy
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+from pytz import timezone
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from sklearn.model_selection import train_test_split
+
+from app import app, db, socketio
+from app.core import evaluator, gatherer, profiling, util
+from app.core.detection import Detector, classifiers_obj, share_array
+from app.core.preprocessing import Extractor, Formatter, preprocessing_obj
+from app.models import (Classifier, Dataset, Job,
+                        Model, Preprocessing, Result)
+
+
+logger = logging.getLogger('jobs')
+
+# worker process and monitor thread started by the web process.
+worker = None
+monitor = None
+lock = threading.Lock()
+
+
+class JobProcess(multiprocessing.get_context('spawn').Process):
+    """Executes the queued jobs, one at a time, in a local process.
+
+    The process finishes after some time without queued jobs and is started
+    again by the monitor when a new job is queued.
+
+    Attributes
+    ----------
+    self.event: obj
+        Event to stop the process."""
+
+    def __init__(self, event):
+        super().__init__()
+        self.event = event
+
+    def run(self):
+        logger.info('worker status: True')
+
+        # only one worker runs at a time, so the running jobs were interrupted.
+        Job.query.filter_by(status='running').update(
+            {'status': 'failed', 'error': 'interrupted'})
+        db.session.commit()
+
+        idle = 0
+        while not self.event.is_set() and idle < app.config['JOB_IDLE']:
+            job = Job.query.filter_by(status='queued').order_by(Job.id).first()
+
+            if job is None:
+                db.session.remove()
+                time.sleep(app.config['JOB_POLL'])
+                idle += app.config['JOB_POLL']
+                continue
+
+            idle = 0
+            self.execute(job)
+        logger.info('worker status: False')
+
+    def execute(self, job):
+        logger.info(f'job: {job.id}, kind: {job.kind}, models: {job.models}')
+        update(job.id, status='running', stage='starting',
+               started=datetime.now(timezone('America/Sao_Paulo')))
+
+        try:
+            if job.kind == 'training':
+                training(job)
+            else:
+                retraining(job)
+            update(job.id, status='finished', stage='finished',
+                   progress=1, eta=0)
+        except Exception as error:
+            logger.exception(error)
+            db.session.rollback()
+            update(job.id, status='failed', error=str(error))
+        finally:
+            update(job.id, finished=datetime.now(timezone('America/Sao_Paulo')))
+            db.session.remove()
+
+
+class JobProgress(threading.Thread):
+    """Updates the progress and the estimated remaining time of a job.
+
+    The progress is the number of fitted folds, counted in a file by the
+    ProgressScorer of the searches.
+
+    Attributes
+    ----------
+    self.event: obj
+        Event to stop the thread.
+    self.pk: int
+        Job primary key.
+    self.path: str
+        Absolute path of the file that counts the fitted folds.
+    self.total: int
+        Number of folds fitted by all searches of the job."""
+
+    def __init__(self, event, pk, path, total):
+        super().__init__()
+        self.event = event
+        self.pk = pk
+        self.path = path
+        self.total = total
+
+    def run(self):
+        start = time.time()
+
+        while not self.event.wait(app.config['JOB_POLL']):
+            if not os.path.exists(self.path):
+                continue
+
+            done = min(os.path.getsize(self.path), self.total)
+            if done:
+                elapsed = time.time() - start
+                update(self.pk, progress=round(done/self.total, 4),
+                       eta=round(elapsed/done * (self.total-done), 1))
+        db.session.remove()
+
+
+class JobMonitor(threading.Thread):
+    """Publishes the progress of the jobs through socketio.
+
+    It runs in the web process while there are queued or running jobs, and
+    starts the worker process when it is not running.
+
+    Attributes
+    ----------
+    self.event: obj
+        Event to stop the thread."""
+
+    def __init__(self, event):
+        super().__init__()
+        self.event = event
+
+    def run(self):
+        active = set()
+
+        while not self.event.wait(app.config['JOB_POLL']):
+            # the jobs finished since the last poll are published once more.
+            jobs = Job.query.filter(
+                Job.status.in_(['queued', 'running']) |
+                Job.id.in_(active)).all()
+
+            for job in jobs:
+                socketio.emit('progress', describe(job), namespace='/jobs')
+            if any(job.status == 'queued' for job in jobs):
+                start_worker()
+
+            active = {job.id for job in jobs
+                      if job.status in ['queued', 'running']}
+            db.session.remove()
+
+            if not active:
+                break
+
+
+def enqueue(kind, models):
+    """Queues a job and starts the monitor, if it is not running.
+
+    Parameters
+    ----------
+    kind: str
+        training, to tune, train and evaluate models, or retraining, to
+        retrain and persist a model.
+    models: list
+        Models primary key.
+
+    Returns
+    -------
+    obj
+        Job instance."""
+
+    global monitor
+
+    job = Job(kind=kind, status='queued',
+              models=','.join(str(model) for model in models),
+              stage='queued', progress=0,
+              created=datetime.now(timezone('America/Sao_Paulo')))
+    db.session.add(job)
+    db.session.commit()
+    logger.info(f'queued job: {job.id}')
+
+    with lock:
+        if monitor is None or not monitor.is_alive():
+            monitor = JobMonitor(threading.Event())
+            monitor.start()
+    start_worker()
+
+    return job
+
+
+def start_worker():
+    """Starts the worker process, if it is not running."""
+
+    global worker
+
+    with lock:
+        if worker is None or not worker.is_alive():
+            worker = JobProcess(multiprocessing.get_context('spawn').Event())
+            worker.start()
+            logger.info(f'worker pid: {worker.pid}')
+
+
+def stop():
+    """Stops the worker process after the current job."""
+
+    if worker is not None and worker.is_alive():
+        worker.event.set()
+
+
+def update(pk, **values):
+    """Updates the columns of a job.
+
+    Parameters
+    ----------
+    pk: int
+        Job primary key.
+    **values
+        Columns and values."""
+
+    Job.query.filter_by(id=pk).update(values)
+    db.session.commit()
+
+
+def describe(job):
+    """Describes the state of a job.
+
+    Parameters
+    ----------
+    job: obj
+        Job instance.
+
+    Returns
+    -------
+    dict
+        Job state."""
+
+    return {'id': job.id, 'kind': job.kind, 'status': job.status,
+            'stage': job.stage, 'progress': job.progress, 'eta': job.eta,
+            'error': job.error}
+
+
+def loading(dataset, model):
+    """Gathers the dataset and extracts the features of a model.
+
+    Parameters
+    ----------
+    dataset: obj
+        Dataset instance.
+    model: obj
+        Model instance.
+
+    Returns
+    -------
+    tuple
+        Features and labels."""
+
+    # gathering flows in chunks.
+    header, chunks = gatherer.stream_csv(
+        f'{util.paths["csv"]}datasets/', dataset.file,
+        chunk_size=app.config['CSV_CHUNK_SIZE'],
+        chunk_bytes=app.config['CSV_CHUNK_BYTES'])
+
+    # preprocessing flows.
+    formatter = Formatter(gather=False, train=True)
+    chunks = formatter.format_chunks(chunks)
+
+    # extracting features.
+    # adding extra value to skip first unused features.
+    extractor = Extractor([feature.id+7 for feature in model.features])
+    features, labels = list(), list()
+    for chunk_features, chunk_labels in extractor.extract_chunks(chunks):
+        features.extend(chunk_features)
+        labels.extend(chunk_labels)
+    logger.info(f'feature: {features[0]}, label: {labels[0]}')
+
+    return features, labels
+
+
+def tuning(model, kfolds, directory, progress):
+    """Creates the detector of a model with its search.
+
+    Parameters
+    ----------
+    model: obj
+        Model instance.
+    kfolds: int
+        Number of k-folds.
+    directory: str
+        Absolute path of the temporary directory used by the Pipeline object.
+    progress: str
+        Absolute path of the file that counts the fitted folds.
+
+    Returns
+    -------
+    obj
+        Detector instance."""
+
+    preprocessing = Preprocessing.query.get(model.preprocessing_id)
+    classifier = Classifier.query.get(model.classifier_id)
+    prep_key = '_'.join(preprocessing.name.lower().split(' '))
+    clf_key = '_'.join(classifier.name.lower().split(' '))
+    logger.info(f'classifier: {classifier.name}')
+    logger.info(f'preprocessing: {preprocessing.name}')
+
+    detector = Detector(copy.deepcopy(classifiers_obj[clf_key]))
+    detector.define_tuning(copy.deepcopy(preprocessing_obj[prep_key]),
+                           kfolds,
+                           directory,
+                           app.config['TRAINING_WORKERS'],
+                           progress)
+
+    return detector
+
+
+def training(job):
+    """Tunes, trains and evaluates the models of a job.
+
+    Parameters
+    ----------
+    job: obj
+        Job instance."""
+
+    models = [Model.query.get(pk) for pk in job.models.split(',')]
+    dataset = Dataset.query.get(models[-1].dataset_id)
+
+    update(job.id, stage='loading dataset')
+    features, labels = loading(dataset, models[-1])
+
+    x_train, x_test, y_train, y_test = train_test_split(
+        features, labels,
+        test_size=dataset.split/100,
+        stratify=labels)
+    logger.info(f'x_train: {len(x_train)}')
+    logger.info(f'x_test: {len(x_test)}')
+
+    # sharing the training data with the workers of the searches.
+    sharedir = mkdtemp()
+    x_train = share_array(x_train, sharedir, 'x_train.joblib')
+    y_train = share_array(y_train, sharedir, 'y_train.joblib')
+
+    # creating an absolute path of a temporary directory for each model.
+    cachedirs = [mkdtemp() for _ in models]
+    detectors = [tuning(model, dataset.kfolds, cachedir,
+                        f'{sharedir}/progress')
+                 for model, cachedir in zip(models, cachedirs)]
+
+    progress = JobProgress(threading.Event(), job.id, f'{sharedir}/progress',
+                           sum(detector.count_fits()
+                               for detector in detectors))
+    progress.start()
+
+    try:
+        for model, detector in zip(models, detectors):
+            update(job.id, stage=f'tuning {model.classifier.name}')
+            hparam = detector.train(x_train, y_train)
+            train_date, train_dur = profiling.last(Detector.train)
+            train_cpu_dur = detector.search_duration()
+            logger.info(f'train cpu duration: {train_cpu_dur}')
+
+            update(job.id, stage=f'testing {model.classifier.name}')
+            pred = detector.test(x_test)
+            test_date, test_dur = profiling.last(Detector.test)
+
+            # results.
+            outcome = evaluator.metrics(y_test, pred)
+            result = Result(
+                train_date=train_date, test_date=test_date,
+                train_duration=train_dur, test_duration=test_dur,
+                train_cpu_duration=train_cpu_dur,
+                accuracy=outcome['accuracy'], precision=outcome['precision'],
+                recall=outcome['recall'], f1_score=outcome['f1_score'],
+                true_negative=outcome['tn'], false_positive=outcome['fp'],
+                false_negative=outcome['fn'], true_positive=outcome['tp'],
+                hyperparameters=str(hparam), model_id=model.id)
+            db.session.add(result)
+            db.session.commit()
+    finally:
+        progress.event.set()
+        progress.join()
+        # removing the temporary directories used by the Pipeline objects.
+        for cachedir in cachedirs:
+            rmtree(cachedir)
+        rmtree(sharedir)
+
+
+def retraining(job):
+    """Retrains the model of a job with all flows and persists it.
+
+    Parameters
+    ----------
+    job: obj
+        Job instance."""
+
+    # creating an absolute path of a temporary directory
+    tmp_directory = mkdtemp()
+    model = Model.query.get(int(job.models))
+    dataset = Dataset.query.get(model.dataset_id)
+
+    try:
+        update(job.id, stage='loading dataset')
+        features, labels = loading(dataset, model)
+
+        # tunning and retraining.
+        update(job.id, stage=f'retraining {model.classifier.name}')
+        detector = tuning(model, dataset.kfolds, tmp_directory,
+                          f'{tmp_directory}/progress')
+        detector.retrain(features, labels)
+
+        # model persistence.
+        update(job.id, stage='saving model')
+        pickle.dump(detector,
+                    open(f'{util.paths["models"]}{model.file}', 'wb'))
+        logger.info(f'model file: {model.file}')
+    finally:
+        # removing the temporary directory used by the Pipeline object.
+        rmtree(tmp_directory)
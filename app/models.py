@@ -1,4 +1,5 @@
 from app import db
+from app.core.columnar import bitmap_ports, unpack_bitmap
 
 
 class Classifier(db.Model):
@@ -78,6 +79,7 @@ class Result(db.Model):
     test_date = db.Column(db.DateTime, nullable=False)
     train_duration = db.Column(db.Float, nullable=False)
     test_duration = db.Column(db.Float, nullable=False)
+    train_cpu_duration = db.Column(db.Float)
     accuracy = db.Column(db.Float, nullable=False)
     precision = db.Column(db.Float, nullable=False)
     recall = db.Column(db.Float, nullable=False)
@@ -95,16 +97,48 @@ class Result(db.Model):
         return f'<Result {self.id}: {self.train_date}>'
 
 
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), index=True, nullable=False)
+    models = db.Column(db.String(100), nullable=False)
+    stage = db.Column(db.String(100), nullable=False)
+    progress = db.Column(db.Float, nullable=False)
+    eta = db.Column(db.Float)
+    error = db.Column(db.Text)
+    created = db.Column(db.DateTime, nullable=False)
+    started = db.Column(db.DateTime)
+    finished = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Job {self.id}: {self.kind} {self.status}>'
+
+
 class Intrusion(db.Model):
+    # each intrusion is identified by its source, destination and protocol.
+    __table_args__ = (db.Index('ix_intrusion_flow', 'source_address',
+                               'destination_address', 'protocol',
+                               unique=True),)
+
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime, index=True, nullable=False)
     end_time = db.Column(db.DateTime, index=True, nullable=False)
     source_address = db.Column(db.String(39), nullable=False)
-    destination_address = db.Column(db.String(39), nullable=False)
-    protocol = db.Column(db.String(10), nullable=False)
-    flags = db.Column(db.String(100), nullable=False)
-    source_port = db.Column(db.Text, nullable=False)
-    destination_port = db.Column(db.Text, nullable=False)
+    # the destinations and protocols are also filtered alone.
+    destination_address = db.Column(db.String(39), index=True,
+                                    nullable=False)
+    protocol = db.Column(db.String(10), index=True, nullable=False)
+    # TCP flags counts in the order used by the Formatter class.
+    urg_flags = db.Column(db.Integer, nullable=False)
+    ack_flags = db.Column(db.Integer, nullable=False)
+    syn_flags = db.Column(db.Integer, nullable=False)
+    fin_flags = db.Column(db.Integer, nullable=False)
+    rst_flags = db.Column(db.Integer, nullable=False)
+    psh_flags = db.Column(db.Integer, nullable=False)
+    # ports as packed bitmaps of 65536 bits, the destination ports of ICMP
+    # are the type and code.
+    source_port = db.Column(db.LargeBinary, nullable=False)
+    destination_port = db.Column(db.LargeBinary, nullable=False)
     duration = db.Column(db.Integer, nullable=False)
     packets = db.Column(db.Integer, nullable=False)
     bytes = db.Column(db.Integer, nullable=False)
@@ -119,6 +153,22 @@ class Intrusion(db.Model):
                          db.ForeignKey('model.id'),
                          nullable=False)
 
+    flag_columns = ['urg_flags', 'ack_flags', 'syn_flags',
+                    'fin_flags', 'rst_flags', 'psh_flags']
+
+    @property
+    def flags(self):
+        return [getattr(self, column) for column in self.flag_columns]
+
+    @property
+    def source_ports(self):
+        return bitmap_ports(unpack_bitmap(self.source_port))
+
+    @property
+    def destination_ports(self):
+        return bitmap_ports(unpack_bitmap(self.destination_port),
+                            self.protocol == 'ICMP')
+
     def __repr__(self):
         return (f'<Intrusion {self.id}: '
                 f'{self.source_address} -> {self.destination_address} '
@@ -1,15 +1,21 @@
-import ast
+import json
 import logging
+import os
 import pickle
 import time
 import threading
+from itertools import zip_longest
 
-from sqlalchemy import func
+import numpy as np
 
-from app import db, socketio
-from app.core import gatherer, util
-from app.core.mitigation import Mitigator
-from app.core.preprocessing import Extractor, Formatter, Modifier
+from app import app, socketio
+from app.core import gatherer, metrics, util
+from app.core.cache import IntrusionCache
+from app.core.collector import Collector
+from app.core.columnar import pack_bitmap, port_bitmap
+from app.core.database import DatabaseWriter
+from app.core.mitigation import MitigationDispatcher, Mitigator
+from app.core.pipeline import Pipeline, WindowDetector
 from app.models import Dataset, Intrusion
 
 
@@ -24,13 +30,53 @@ class RealtimeThread(threading.Thread):
         self.detector = pickle.load(open(f'{util.paths["models"]}'
                                          f'{self.model.file}', 'rb'))
         self.mitigator = Mitigator()
+        self.dispatcher = MitigationDispatcher(
+            self.mitigator, app.config['MITIGATION_WORKERS'])
+        self.writer = DatabaseWriter()
+        self.pipeline = None
+        # index, number of flows and latency of the replayed windows.
+        self.windows = list()
+        self.report = None
+        self.intrusions = IntrusionCache(app.config['INTRUSION_FLUSH'],
+                                         app.config['RULE_IDLE_TIMEOUT'],
+                                         app.config['RULE_HARD_TIMEOUT'],
+                                         app.config['RULE_EXPIRY_BATCH'],
+                                         self.writer)
 
     def execution(self):
-        process = gatherer.capture_nfcapd(util.paths['nfcapd'], 60)
         dataset = Dataset.query.get(self.model.dataset_id)
-        logger.info(f'process pid: {process.pid}')
         logger.info(f'dataset file: {dataset.file}')
 
+        self.pipeline = Pipeline(
+            WindowDetector(self.detector,
+                           [feature.id+7 for feature in self.model.features],
+                           dataset.aggregation,
+                           app.config['DETECTION_BATCH_SIZE']),
+            self.handling, self.recording,
+            max(app.config['INTRUSION_FLUSH'], 1),
+            app.config['PIPELINE_QUEUE_SIZE'], app.config['PIPELINE_POLICY'],
+            app.config['PIPELINE_SAMPLE'], app.config['PIPELINE_WORKERS'])
+        self.pipeline.start()
+        start = time.perf_counter()
+
+        try:
+            if app.config['REALTIME_SOURCE'] == 'collector':
+                self.collecting()
+            elif app.config['REALTIME_SOURCE'] == 'replay':
+                self.replaying()
+            else:
+                self.capturing()
+        finally:
+            # detecting and mitigating the queued windows.
+            self.pipeline.stop()
+            if app.config['REALTIME_SOURCE'] == 'replay':
+                self.report = self.reporting(self.windows,
+                                             time.perf_counter() - start)
+
+    def capturing(self):
+        process = gatherer.capture_nfcapd(util.paths['nfcapd'], 60)
+        logger.info(f'process pid: {process.pid}')
+
         try:
             while not self.event.is_set():
                 nfcapd_files = util.directory_content(util.paths['nfcapd'])[1]
@@ -51,24 +97,9 @@ class RealtimeThread(threading.Thread):
                             raise ValueError('No matched flows')
                         logger.info(f'flow: {flows[0]}')
 
-                        # preprocessing flows.
-                        formatter = Formatter()
-                        flows = formatter.format_flows(flows)
-                        logger.info(f'formatted flow: {flows[0]}')
-
-                        modifier = Modifier(2, dataset.aggregation)
-                        extractor = Extractor([feature.id+7 for feature in
-                                               self.model.features])
-
-                        while flows:
-                            flow, flows = modifier.aggregate(flows)
-                            features, _ = extractor.extract(flow)
-                            # detecting intrusions.
-                            pred, _, _ = self.detector.test([features])
-
-                            if pred[0]:
-                                # mitigating intrusions.
-                                self.mitigating(flow)
+                        # deleting summary lines.
+                        del flows[-3:]
+                        self.pipeline.submit(flows)
                     time.sleep(2)
                 except IndexError:
                     time.sleep(2)
@@ -82,30 +113,218 @@ class RealtimeThread(threading.Thread):
             logger.info('thread status: false')
             process.kill()
 
+    def collecting(self):
+        # formatted flows received by the collector since the last window.
+        window = list()
+        lock = threading.Lock()
+
+        def receive(flows):
+            with lock:
+                window.extend(flows)
+
+        collector = Collector(app.config['COLLECTOR_HOST'],
+                              app.config['COLLECTOR_PORT'],
+                              receive)
+        collector.start()
+
+        try:
+            while not self.event.wait(app.config['COLLECTOR_WINDOW']):
+                with lock:
+                    flows = window[:]
+                    window.clear()
+
+                if flows:
+                    logger.info(f'collected flows: {len(flows)}')
+                    self.pipeline.submit(flows, formatted=True)
+        finally:
+            logger.info('thread status: false')
+            collector.stop()
+
+    def replaying(self):
+        window = app.config['REPLAY_WINDOW']
+        speed = app.config['REPLAY_SPEED']
+        start = time.perf_counter()
+        captures = self.captures(app.config['REPLAY_PATH'])
+        # windows of the previous files.
+        offset = 0
+
+        try:
+            for csv_path, csv_file, _ in captures:
+                logger.info(f'replayed file: {csv_file}')
+                _, flows = gatherer.open_csv(csv_path, csv_file)
+                # deleting summary lines.
+                del flows[-3:]
+
+                index = -1
+                for index, flows in gatherer.split_windows(flows, window):
+                    # waiting for the window at the chosen speed.
+                    if speed and self.event.wait(
+                            start + (offset+index) * window / speed -
+                            time.perf_counter()):
+                        return
+                    if self.event.is_set():
+                        return
+
+                    self.pipeline.submit(flows, index=offset + index)
+                offset += index + 1
+        finally:
+            logger.info('thread status: false')
+            # removing the converted nfcapd files.
+            for csv_path, csv_file, converted in captures:
+                if converted:
+                    os.remove(f'{csv_path}{csv_file}')
+
+    def captures(self, path):
+        """Gets the CSV files of a replayed capture.
+
+        The nfcapd files of a directory are converted into a single CSV
+        file, sorted by start time.
+
+        Parameters
+        ----------
+        path: str
+            Absolute path of a nfcapd or CSV file, or a directory of them.
+
+        Returns
+        -------
+        list
+            Path and name of each CSV file and whether it was converted."""
+
+        if os.path.isdir(path):
+            path = os.path.join(path, '')
+            files = util.directory_content(path)[1]
+        else:
+            path, files = os.path.split(path)
+            path, files = os.path.join(path, ''), [files]
+
+        captures = [(path, file, False) for file in files
+                    if file.endswith('.csv')]
+        nfcapd_files = [file for file in files
+                        if file.startswith('nfcapd.') and
+                        'current' not in file]
+        if nfcapd_files:
+            # only the file just converted, not the leftovers of an
+            # interrupted replay.
+            tmp_path = f'{util.paths["csv"]}tmp/'
+            captures.append((tmp_path,
+                             gatherer.convert_nfcapd_csv(path, nfcapd_files,
+                                                         tmp_path, 'replay'),
+                             True))
+
+        return captures
+
+    def reporting(self, windows, duration):
+        """Reports the throughput and latency of a replay.
+
+        The report is logged, emitted and saved in the replay.json file of
+        the log directory.
+
+        Parameters
+        ----------
+        windows: list
+            Index, number of flows and seconds from the reception until the
+            mitigation of each window.
+        duration: float
+            Seconds of the whole replay.
+
+        Returns
+        -------
+        dict
+            Flows, seconds, flows per second and latency percentiles."""
+
+        num_flows = sum(size for _, size, _ in windows)
+        latencies = [latency for _, _, latency in windows] or [0]
+        report = {'windows': len(windows),
+                  'flows': num_flows,
+                  'seconds': round(duration, 4),
+                  'flows_per_second': round(num_flows / duration
+                                            if duration else 0),
+                  'latency': {
+                      'p50': round(float(np.percentile(latencies, 50)), 4),
+                      'p95': round(float(np.percentile(latencies, 95)), 4),
+                      'p99': round(float(np.percentile(latencies, 99)), 4),
+                      'max': round(max(latencies), 4)},
+                  'window_latency': [{'window': index, 'flows': size,
+                                      'seconds': round(latency, 4)}
+                                     for index, size, latency in windows]}
+
+        logger.info(f'replayed flows: {num_flows}, '
+                    f'flows per second: {report["flows_per_second"]}, '
+                    f'window latency: {report["latency"]}')
+        socketio.emit('replay',
+                      {key: value for key, value in report.items()
+                       if key != 'window_latency'},
+                      namespace='/realtime')
+        with open(f'{util.paths["log"]}replay.json', 'w') as report_file:
+            json.dump(report, report_file, indent=4)
+
+        return report
+
+    def handling(self, window, detection):
+        intrusions, _, seconds = detection
+        for stage, duration in seconds.items():
+            metrics.stage_seconds.observe(duration, stage=stage)
+
+        with metrics.stage_seconds.time(stage='mitigate'):
+            for flow in intrusions:
+                # mitigating intrusions.
+                self.mitigating(flow)
+
+        # writing the intrusions behind the detection.
+        with metrics.stage_seconds.time(stage='record'):
+            self.recording()
+
+        latency = time.perf_counter() - window.received
+        metrics.window_seconds.observe(latency)
+        if window.index is not None:
+            self.windows.append((window.index, window.size, latency))
+
+    def recording(self, force=False):
+        for key, rule in self.dispatcher.collect():
+            self.intrusions.block(key, rule)
+
+        expired = self.intrusions.expire()
+        for source, destination, protocol, rule in expired:
+            # the intrusions not blocked yet have no rule to be removed.
+            if rule != 'no rule':
+                self.dispatcher.retire(
+                    Intrusion(source_address=source,
+                              destination_address=destination,
+                              protocol=protocol, rule=rule))
+        if expired:
+            socketio.emit('detection',
+                          {'num_intrusions': self.intrusions.count},
+                          namespace='/realtime')
+
+        self.intrusions.flush(force)
+        metrics.active_intrusions.set(self.intrusions.count)
+
     def gathering(self, nfcapd_files):
-        gatherer.convert_nfcapd_csv(util.paths['nfcapd'], nfcapd_files,
-                                    f'{util.paths["csv"]}tmp/',
-                                    'realtime')
+        with metrics.stage_seconds.time(stage='convert'):
+            gatherer.convert_nfcapd_csv(util.paths['nfcapd'], nfcapd_files,
+                                        f'{util.paths["csv"]}tmp/',
+                                        'realtime')
         csv_file = util.directory_content(f'{util.paths["csv"]}tmp/')[1]
         logger.info(f'csv files: {csv_file[0]}')
-        _, flows = gatherer.open_csv(f'{util.paths["csv"]}tmp/', csv_file[0])
+        with metrics.stage_seconds.time(stage='parse'):
+            _, flows = gatherer.open_csv(f'{util.paths["csv"]}tmp/',
+                                         csv_file[0])
 
         return flows
 
     def mitigating(self, flow):
-        intrusion = Intrusion.query.filter_by(source_address=flow[2],
-                                              destination_address=flow[3],
-                                              protocol=flow[4]).all()
-
-        if not intrusion:
+        # getting the intrusion from memory or the database, or creating it.
+        if not self.intrusions.find((flow[2], flow[3], flow[4])):
             logger.info(f'intrusion: {flow}')
 
             intrusion = Intrusion(start_time=flow[0], end_time=flow[1],
                                   source_address=flow[2],
                                   destination_address=flow[3],
-                                  protocol=flow[4], flags=str(flow[5]),
-                                  source_port=str(flow[6]),
-                                  destination_port=str(flow[7]),
+                                  protocol=flow[4],
+                                  source_port=pack_bitmap(
+                                      port_bitmap(flow[6])),
+                                  destination_port=pack_bitmap(
+                                      port_bitmap(flow[7])),
                                   duration=flow[8], packets=flow[9],
                                   bytes=flow[10], bytes_per_second=flow[11],
                                   bytes_per_packets=flow[12],
@@ -113,41 +332,45 @@ class RealtimeThread(threading.Thread):
                                   number_source_port=flow[14],
                                   number_destination_port=flow[15],
                                   flows=flow[16], rule='no rule',
-                                  model_id=self.model.id)
-            self.mitigator.block_attack(intrusion)
+                                  model_id=self.model.id,
+                                  **dict(zip_longest(Intrusion.flag_columns,
+                                                     flow[5], fillvalue=0)))
+            self.intrusions.add(intrusion)
+            metrics.intrusions.inc()
+            # blocking in background.
+            self.dispatcher.submit(intrusion)
 
-            num_intrusions = db.session.query(Intrusion).count()
-            logger.info(f'number of intrusions: {num_intrusions}')
+            logger.info(f'number of intrusions: {self.intrusions.count}')
             socketio.emit('detection',
-                          {'num_intrusions': num_intrusions},
+                          {'num_intrusions': self.intrusions.count},
                           namespace='/realtime')
         else:
-            intrusion = intrusion[0]
-            intrusion.end_time = flow[1]
-            flags = ast.literal_eval(intrusion.flags)
-            intrusion.flags = str([x+y for x, y in zip(flags, flow[5])])
-            sp = ast.literal_eval(intrusion.source_port) | flow[6]
-            dp = ast.literal_eval(intrusion.destination_port) | flow[7]
-            intrusion.source_port = str(sp)
-            intrusion.destination_port = str(dp)
-            intrusion.duration = (flow[1] - intrusion.start_time).seconds
-            intrusion.packets += flow[9]
-            intrusion.bytes += flow[10]
-            if intrusion.duration:
-                bps = intrusion.bytes/intrusion.duration
-                pps = intrusion.packets/intrusion.duration
-            else:
-                bps, pps = 0, 0
-            bpp = intrusion.bytes/intrusion.packets
-            intrusion.bytes_per_second = int(round(bps))
-            intrusion.bytes_per_packets = int(round(bpp))
-            intrusion.packtes_per_second = int(round(pps))
-            intrusion.number_source_port = len(sp)
-            intrusion.number_destination_port = len(dp)
-            intrusion.flows += flow[16]
-        db.session.add(intrusion)
-        db.session.commit()
+            rule = self.intrusions.update(flow)
+            if rule is not None:
+                # the flows reach the detection only after the switch removed
+                # the idle rule.
+                logger.info(f'removed rule: {rule}, intrusion: {flow}')
+                self.dispatcher.renew(
+                    Intrusion(source_address=flow[2],
+                              destination_address=flow[3],
+                              protocol=flow[4], rule=rule))
 
     def run(self):
         logger.info('thread status: True')
-        self.execution()
+
+        self.dispatcher.start()
+        self.writer.start()
+        metrics.queue_depth.track(self.dispatcher.requests.qsize,
+                                  queue='mitigation')
+        metrics.queue_depth.track(self.writer.requests.qsize,
+                                  queue='database')
+
+        try:
+            self.execution()
+        finally:
+            # waiting for the queued intrusions and writes.
+            self.dispatcher.stop()
+            self.recording(force=True)
+            self.writer.stop()
+            metrics.queue_depth.track(None, queue='mitigation')
+            metrics.queue_depth.track(None, queue='database')
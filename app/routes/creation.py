@@ -1,10 +1,9 @@
 import logging
 
-from flask import (Blueprint, redirect, request,
+from flask import (Blueprint, current_app, flash, redirect, request,
                    render_template, session, url_for)
 
-from app.core import exporter, gatherer, util
-from app.core.preprocessing import Formatter, Modifier
+from app.core import exporter, gatherer, parallel, util
 from app.forms.creation import (ContentForm, ConvertNfcapdCsvForm,
                                 ConvertPcapNfcapdForm, MergingFlowsForm,
                                 PreprocessingFlowsForm, SplitPcapForm)
@@ -121,7 +120,8 @@ def convert_nfcapd_csv(directory):
 @bp.route('/parameters/preprocessing_flows/<directory>/',
           methods=['GET', 'POST'])
 def preprocessing_flows(directory):
-    form = PreprocessingFlowsForm()
+    form = PreprocessingFlowsForm(
+        workers=current_app.config['PREPROCESSING_WORKERS'])
 
     if request.method == 'POST' and form.validate_on_submit():
         path = (session['paths_hist']['root'] +
@@ -131,28 +131,17 @@ def preprocessing_flows(directory):
                     f'threshold: {form.threshold.data}, '
                     f'label: {form.label.data}')
 
-        for file in session['files']:
-            # gathering flows.
-            header, flows = gatherer.open_csv(path, file, form.sample.data)
-            logger.info(f'flow: {flows[0]}')
-
-            # preprocessing flows.
-            formatter = Formatter()
-            header = formatter.format_header(header)
-            flows = formatter.format_flows(flows)
-            logger.info(f'formatted flow: {flows[0]}')
-
-            modifier = Modifier(label=form.label.data,
-                                threshold=form.threshold.data)
-            header = modifier.extend_header(header)
-            flows = modifier.aggregate_flows(flows)
-            logger.info(f'modified flow: {flows[0]}')
-
-            # exporting flows.
-            name = file.split(".csv")[0]
-            exporter.flows_csv(header, flows,
-                               f'{util.paths["csv"]}/flows/',
-                               f'{name}_s{len(flows)}.csv')
+        logger.info(f'workers: {form.workers.data}')
+
+        timings = parallel.preprocess_files(
+            path, session['files'], f'{util.paths["csv"]}/flows/',
+            form.sample.data, form.label.data, form.threshold.data,
+            current_app.config['CSV_CHUNK_SIZE'],
+            current_app.config['CSV_CHUNK_BYTES'], form.workers.data)
+        for file, size, duration in timings:
+            logger.info(f'{file} modified flows: {size}, '
+                        f'duration: {duration}')
+            flash(f'{file}: {size} modified flows in {duration} seconds')
 
         return redirect(url_for('creation.content',
                                 function='preprocessing_flows',
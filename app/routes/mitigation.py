@@ -1,11 +1,15 @@
 import logging
+from datetime import datetime
 
-from flask import (Blueprint, redirect, request,
+from flask import (abort, Blueprint, jsonify, redirect, request,
                    render_template, session, url_for)
+from sqlalchemy import and_, or_
 
-from app import db
+from app import app, db
 from app.core.mitigation import Mitigator
+from app.forms.mitigation import IntrusionFilterForm
 from app.models import Intrusion
+from app.routes import detection
 
 
 bp = Blueprint('mitigation', __name__)
@@ -17,19 +21,213 @@ def intrusion():
     if request.method == 'POST':
         intrusion = Intrusion.query.get(request.form['itr_pk'])
         mitigator = Mitigator()
-        mitigator.remove_rule(intrusion.rule)
+        mitigator.unblock(intrusion)
         logger.info(f'removed rule: {intrusion.rule}')
+        key = (intrusion.source_address, intrusion.destination_address,
+               intrusion.protocol)
 
         db.session.delete(intrusion)
         db.session.commit()
+        # the realtime detection forgets the false positive.
+        if detection.thread is not None and detection.thread.is_alive():
+            detection.thread.intrusions.discard(key)
 
-        return redirect(url_for('mitigation.intrusion'))
-    intrusions = Intrusion.query.all()
+        return redirect(url_for('mitigation.intrusion', **request.args))
+    form = IntrusionFilterForm(request.args)
+    intrusions, following = list(), None
+    if form.validate():
+        intrusions, following = page(form, request.args.get('after'),
+                                     app.config['INTRUSION_PAGE_SIZE'])
     columns = [column.key for column in Intrusion.__table__.columns]
-    columns_info = columns[:7]
-    columns_quant = columns[9:18]
+    # the ports are shown apart.
+    columns_info = columns[:columns.index('source_port')]
+    columns_quant = columns[columns.index('destination_port')+1:
+                            columns.index('rule')]
 
+    filters = {key: value for key, value in request.args.items()
+               if key not in ['after', 'submit']}
     return render_template('mitigation/intrusion.html',
+                           form=form,
+                           filters=filters,
+                           following=following,
                            columns_info=columns_info,
                            columns_quant=columns_quant,
                            intrusions=intrusions)
+
+
+@bp.route('/intrusions')
+def intrusions():
+    form = IntrusionFilterForm(request.args)
+    if not form.validate():
+        return jsonify({'errors': form.errors}), 400
+
+    limit = min(request.args.get('limit', app.config['INTRUSION_PAGE_SIZE'],
+                                 type=int),
+                app.config['INTRUSION_PAGE_MAX'])
+    intrusions, following = page(form, request.args.get('after'),
+                                 max(limit, 1))
+    ports = request.args.get('ports', 0, type=int)
+
+    return jsonify({'intrusions': [describe(intrusion, ports)
+                                   for intrusion in intrusions],
+                    'next': following})
+
+
+def page(form, after, limit):
+    """Gets a page of the filtered intrusions.
+
+    The pages are found by the sort column and primary key of the last
+    intrusion of the previous page, instead of an offset, so through the
+    indexes and in constant time.
+
+    Parameters
+    ----------
+    form: obj
+        IntrusionFilterForm instance with valid data.
+    after: str
+        Position after the last intrusion of the previous page, None to get
+        the first page.
+    limit: int
+        Number of intrusions of the page.
+
+    Returns
+    -------
+    tuple
+        Intrusions of the page and the position of the next page, None if
+        it is the last one."""
+
+    column = getattr(Intrusion, form.sort.data)
+    query = Intrusion.query
+
+    # the address prefixes as ranges, the LIKE of SQLite ignores the case
+    # and so the indexes.
+    if form.source.data:
+        query = query.filter(*prefix_range(Intrusion.source_address,
+                                           form.source.data))
+    if form.destination.data:
+        query = query.filter(*prefix_range(Intrusion.destination_address,
+                                           form.destination.data))
+    if form.protocol.data:
+        query = query.filter(Intrusion.protocol == form.protocol.data)
+    # intrusions active in the time range.
+    if form.start.data:
+        query = query.filter(Intrusion.end_time >= form.start.data)
+    if form.end.data:
+        query = query.filter(Intrusion.start_time <= form.end.data)
+
+    if after:
+        value, pk = position(after, form.sort.data)
+        if form.order.data == 'asc':
+            query = query.filter(or_(column > value,
+                                     and_(column == value,
+                                          Intrusion.id > pk)))
+        else:
+            query = query.filter(or_(column < value,
+                                     and_(column == value,
+                                          Intrusion.id < pk)))
+
+    if form.order.data == 'asc':
+        query = query.order_by(column.asc(), Intrusion.id.asc())
+    else:
+        query = query.order_by(column.desc(), Intrusion.id.desc())
+
+    # an extra intrusion shows if there is a next page.
+    intrusions = query.limit(limit + 1).all()
+    if len(intrusions) <= limit:
+        return intrusions, None
+
+    last = intrusions[limit - 1]
+    value = getattr(last, form.sort.data)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+
+    return intrusions[:limit], f'{value},{last.id}'
+
+
+def prefix_range(column, prefix):
+    """Creates the conditions of the values of a column starting with a
+    prefix.
+
+    Parameters
+    ----------
+    column: obj
+        Column of a model.
+    prefix: str
+        Prefix of the values.
+
+    Returns
+    -------
+    tuple
+        Conditions of the lower and upper bounds of the values."""
+
+    # the first string after every string starting with the prefix.
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    return column >= prefix, column < upper
+
+
+def position(after, sort):
+    """Parses the position after the last intrusion of a page.
+
+    Parameters
+    ----------
+    after: str
+        Sort column value and primary key separated by comma.
+    sort: str
+        Sort column.
+
+    Returns
+    -------
+    tuple
+        Sort column value and primary key."""
+
+    try:
+        value, pk = after.rsplit(',', 1)
+        if sort == 'id':
+            value = int(value)
+        else:
+            value = datetime.fromisoformat(value)
+
+        return value, int(pk)
+    except ValueError:
+        abort(400)
+
+
+def describe(intrusion, ports=False):
+    """Describes an intrusion.
+
+    Parameters
+    ----------
+    intrusion: obj
+        Intrusion instance.
+    ports: bool
+        Whether to include the ports, which can be thousands.
+
+    Returns
+    -------
+    dict
+        Intrusion columns."""
+
+    data = {'id': intrusion.id,
+            'start_time': intrusion.start_time.isoformat(),
+            'end_time': intrusion.end_time.isoformat(),
+            'source_address': intrusion.source_address,
+            'destination_address': intrusion.destination_address,
+            'protocol': intrusion.protocol,
+            'flags': intrusion.flags,
+            'duration': intrusion.duration,
+            'packets': intrusion.packets,
+            'bytes': intrusion.bytes,
+            'bytes_per_second': intrusion.bytes_per_second,
+            'bytes_per_packets': intrusion.bytes_per_packets,
+            'packtes_per_second': intrusion.packtes_per_second,
+            'number_source_port': intrusion.number_source_port,
+            'number_destination_port': intrusion.number_destination_port,
+            'flows': intrusion.flows,
+            'rule': intrusion.rule,
+            'model_id': intrusion.model_id}
+    if ports:
+        data['source_ports'] = intrusion.source_ports
+        data['destination_ports'] = intrusion.destination_ports
+
+    return data
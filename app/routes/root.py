@@ -1,4 +1,6 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, jsonify, render_template, request, Response
+
+from app.core import metrics, profiling, util
 
 
 bp = Blueprint('root', __name__)
@@ -13,3 +15,20 @@ def home():
 @bp.route('/about')
 def about():
     return render_template('about.html')
+
+
+@bp.route('/profiling', methods=['GET', 'POST'])
+def profile():
+    if request.method == 'POST':
+        path = f'{util.paths["log"]}profiling.json'
+        profiling.dump(path)
+
+        return jsonify({'path': path})
+
+    return jsonify(profiling.snapshot())
+
+
+@bp.route('/metrics')
+def exposition():
+    return Response(metrics.registry.expose(),
+                    mimetype='text/plain; version=0.0.4')
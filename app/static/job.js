@@ -0,0 +1,30 @@
+$(document).ready(function() {
+    var job = $('#job');
+
+    function show(msg) {
+        if (msg['id'] != job.data('id')) {
+            return;
+        }
+        $('#status').html(msg['status']);
+        $('#stage').html(msg['stage']);
+        $('#progress').html((msg['progress'] * 100).toFixed(1));
+        $('#eta').html(msg['eta'] === null ? '-' : msg['eta']);
+        $('#error').html(msg['error'] || '');
+
+        if (msg['status'] == 'finished') {
+            window.location = job.data('following');
+        }
+    };
+
+    // connect to the server
+    var socket = io.connect('http://' + document.domain + ':' + location.port + '/jobs');
+
+    // receive progress from server
+    socket.on('progress', show);
+
+    // polling in case the messages are missed
+    $.getJSON(job.data('status'), show);
+    setInterval(function() {
+        $.getJSON(job.data('status'), show);
+    }, 5000);
+});
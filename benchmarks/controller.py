@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+import time
+from http import client
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app.core.mitigation import ConnectionPool
+from floodlight import FloodlightServer
+
+
+# requests sent by each benchmark
+num_requests = 2000
+
+
+def single_request(host, port, action, uri, body, headers):
+    """Executes a request through a new connection, as the Mitigator did
+    before the connection pool."""
+
+    conn = client.HTTPConnection(host, port)
+    conn.request(action, uri, body, headers)
+    resp = conn.getresponse()
+    ret = (resp.status, resp.read())
+    conn.close()
+
+    return ret
+
+
+def benchmark(request, threads):
+    """Measures the requests per second sent by some threads.
+
+    Parameters
+    ----------
+    request: func
+        Function that sends a request.
+    threads: int
+        Number of threads sending the requests.
+
+    Returns
+    -------
+    float
+        Requests per second."""
+
+    def send(amount):
+        for idx in range(amount):
+            if idx % 2:
+                status, _ = request('GET', '/wm/device/', '{}')
+            else:
+                status, _ = request('POST', '/wm/staticflowpusher/json',
+                                    '{"name": "block1", "switch": "1"}')
+            assert status == 200
+
+    workers = [threading.Thread(target=send, args=(num_requests//threads,))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return num_requests / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    server = FloodlightServer('127.0.0.1', 0, num_devices=0)
+    host, port = server.start()
+
+    headers = {'Content-type': 'application/json',
+               'Accept': 'application/json'}
+    pool = ConnectionPool(host, port, 4, 5)
+
+    for threads in [1, 4]:
+        before = benchmark(lambda action, uri, body: single_request(
+            host, port, action, uri, body, headers), threads)
+        after = benchmark(lambda action, uri, body: pool.request(
+            action, uri, body, headers), threads)
+        print(f'threads: {threads}, new connection: {before:.0f} req/s, '
+              f'connection pool: {after:.0f} req/s, '
+              f'speedup: {after/before:.2f}x')
+
+    server.stop()
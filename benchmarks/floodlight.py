@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# seconds added to each answer, number of devices and devices by switch of
+# the server started by this script.
+latency = float(os.environ.get('FLOODLIGHT_LATENCY') or 0)
+num_devices = int(os.environ.get('FLOODLIGHT_DEVICES') or 1000)
+devices_per_switch = 50
+
+
+class FloodlightHandler(BaseHTTPRequestHandler):
+    """Answers the device and static entry pusher REST calls as the
+    Floodlight controller, keeping the connections alive."""
+
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.body()
+
+        if self.path.startswith('/wm/device/'):
+            self.answer(200, {'devices': self.server.devices})
+        elif self.path.startswith('/wm/staticflowpusher/list/all/json'):
+            with self.server.lock:
+                rules = list(self.server.rules.values())
+            self.answer(200, rules)
+        else:
+            self.answer(404, {'status': 'Not found'})
+
+    def do_POST(self):
+        rule = self.body()
+
+        if self.path != '/wm/staticflowpusher/json':
+            return self.answer(404, {'status': 'Not found'})
+        if not rule.get('name') or not rule.get('switch'):
+            return self.answer(400, {'status': 'Invalid entry'})
+
+        with self.server.lock:
+            self.server.rules[rule['name']] = rule
+            self.server.pushed += 1
+        self.answer(200, {'status': 'Entry pushed'})
+
+    def do_DELETE(self):
+        rule = self.body()
+
+        if self.path != '/wm/staticflowpusher/json':
+            return self.answer(404, {'status': 'Not found'})
+
+        with self.server.lock:
+            self.server.rules.pop(rule.get('name'), None)
+            self.server.deleted += 1
+        self.answer(200, {'status': 'Entry deleted'})
+
+    def body(self):
+        # the request body must be consumed to keep the connection alive.
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        try:
+            return json.loads(data or b'{}')
+        except ValueError:
+            return dict()
+
+    def answer(self, status, data):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FloodlightServer(ThreadingHTTPServer):
+    """Lightweight stand-in of the Floodlight controller REST API.
+
+    The devices have consecutive IPv4 addresses from 10.0.0.1 and are
+    attached to consecutive switches, the pushed rules are kept in memory.
+
+    Attributes
+    ----------
+    self.latency: float
+        Seconds added to each answer.
+    self.devices: list
+        Devices in the format of the device API.
+    self.rules: dict
+        Pushed rules by name.
+    self.pushed: int
+        Number of pushed rules.
+    self.deleted: int
+        Number of deleted rules.
+    self.lock: obj
+        Lock of the rules."""
+
+    daemon_threads = True
+
+    def __init__(self, host, port, latency=0, num_devices=1000,
+                 devices_per_switch=50):
+        super().__init__((host, port), FloodlightHandler)
+        self.latency = latency
+        self.devices = [device(idx, devices_per_switch)
+                        for idx in range(num_devices)]
+        self.rules = dict()
+        self.pushed = 0
+        self.deleted = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Serves the requests in a background thread.
+
+        Returns
+        -------
+        tuple
+            Host and port of the server."""
+
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+        return self.server_address
+
+    def stop(self):
+        """Stops the server and closes its socket."""
+
+        self.shutdown()
+        self.server_close()
+
+
+def device(idx, devices_per_switch):
+    """Creates a device in the format of the device API.
+
+    Parameters
+    ----------
+    idx: int
+        Device index.
+    devices_per_switch: int
+        Number of devices attached to each switch.
+
+    Returns
+    -------
+    dict
+        Device addresses and attachment point."""
+
+    address = 0x0a000001 + idx
+    switch = idx // devices_per_switch + 1
+
+    return {'mac': [f'00:00:00:{address >> 16 & 255:02x}:'
+                    f'{address >> 8 & 255:02x}:{address & 255:02x}'],
+            'ipv4': ['.'.join(str(address >> shift & 255)
+                              for shift in [24, 16, 8, 0])],
+            'ipv6': [],
+            'vlan': ['0x0'],
+            'attachmentPoint': [{'switch': ':'.join(
+                                     f'{switch >> shift & 255:02x}'
+                                     for shift in range(56, -8, -8)),
+                                 'port': str(idx % devices_per_switch + 1)}],
+            'lastSeen': int(time.time() * 1000)}
+
+
+if __name__ == '__main__':
+    server = FloodlightServer(os.environ.get('CONTROLLER_HOST') or
+                              '127.0.0.1',
+                              int(os.environ.get('CONTROLLER_PORT') or 8080),
+                              latency, num_devices, devices_per_switch)
+    print(f'floodlight: {server.server_address}, latency: {latency}s, '
+          f'devices: {num_devices}')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
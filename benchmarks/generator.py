@@ -0,0 +1,195 @@
+import csv
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+
+# columns of the nfdump CSV output.
+header = ['ts', 'te', 'td', 'sa', 'da', 'sp', 'dp', 'pr', 'flg', 'fwd',
+          'stos', 'ipkt', 'ibyt', 'opkt', 'obyt', 'in', 'out', 'sas', 'das',
+          'smk', 'dmk', 'dtos', 'dir', 'nh', 'nhb', 'svln', 'dvln', 'ismc',
+          'odmc', 'idmc', 'osmc', 'mpls1', 'mpls2', 'mpls3', 'mpls4',
+          'mpls5', 'mpls6', 'mpls7', 'mpls8', 'mpls9', 'mpls10', 'cl', 'sl',
+          'al', 'ra', 'eng', 'exid', 'tr']
+
+# fraction of the flows of each attack by default.
+attack_mix = {'syn_flood': 0.1, 'port_scan': 0.05,
+              'udp_flood': 0.05, 'icmp_flood': 0.02}
+
+
+def normal_flow(rnd, keys):
+    """Creates the features of a normal flow.
+
+    Parameters
+    ----------
+    rnd: obj
+        Random instance.
+    keys: list
+        Source address, destination address and protocol of the normal
+        traffic.
+
+    Returns
+    -------
+    list
+        Source and destination addresses and ports, protocol, flags,
+        packets and bytes."""
+
+    source, destination, protocol = rnd.choice(keys)
+    packets = rnd.randint(1, 50)
+
+    if protocol == 'TCP':
+        return [source, destination, str(rnd.randint(1024, 65535)),
+                rnd.choice(['80', '443', '22']), protocol,
+                rnd.choice(['.AP.SF', '.AP...', '.A....', '.AP.S.']),
+                packets, packets * rnd.randint(40, 1500)]
+    if protocol == 'UDP':
+        return [source, destination, str(rnd.randint(1024, 65535)),
+                rnd.choice(['53', '123']), protocol, '......',
+                packets, packets * rnd.randint(60, 512)]
+
+    return [source, destination, '0', rnd.choice(['8.0', '0.0']), protocol,
+            '......', packets, packets * 84]
+
+
+def attack_flow(rnd, attack):
+    """Creates the features of an attack flow.
+
+    Parameters
+    ----------
+    rnd: obj
+        Random instance.
+    attack: str
+        Attack name.
+
+    Returns
+    -------
+    list
+        Source and destination addresses and ports, protocol, flags,
+        packets and bytes."""
+
+    # a few attackers against a single target.
+    source = f'192.168.0.{rnd.randint(1, 8)}'
+    target = '172.16.0.1'
+
+    if attack == 'syn_flood':
+        return [source, target, str(rnd.randint(1024, 65535)), '80', 'TCP',
+                '....S.', 1, 40]
+    if attack == 'port_scan':
+        return [source, target, str(rnd.randint(1024, 65535)),
+                str(rnd.randint(1, 1024)), 'TCP', '....S.', 1, 44]
+    if attack == 'udp_flood':
+        return [source, target, str(rnd.randint(1024, 65535)),
+                str(rnd.randint(1, 65535)), 'UDP', '......', 1, 1024]
+
+    return [source, target, '0', '8.0', 'ICMP', '......', 1, 1084]
+
+
+def generate(path, size, seed=1, attacks=None, num_keys=1000,
+             missing=0.001):
+    """Writes a CSV file of synthetic flows as converted by nfdump.
+
+    The same arguments always write the same file. The flows are sorted by
+    the start time, about a thousand per second, and followed by the three
+    summary lines.
+
+    Parameters
+    ----------
+    path: str
+        Absolute path of the file.
+    size: int
+        Number of flows.
+    seed: int
+        Seed of the random flows.
+    attacks: dict
+        Fraction of the flows of each attack, by default the attack mix.
+    num_keys: int
+        Number of distinct source address, destination address and protocol
+        of the normal traffic.
+    missing: float
+        Fraction of the flows with missing features."""
+
+    rnd = random.Random(seed)
+    attacks = attack_mix if attacks is None else attacks
+    unknown = set(attacks) - set(attack_mix)
+    if unknown:
+        raise ValueError(f'unknown attacks: {sorted(unknown)}')
+
+    keys = [(f'10.{idx >> 16 & 255}.{idx >> 8 & 255}.{idx & 255}',
+             f'172.16.0.{rnd.randint(2, 17)}',
+             rnd.choice(['TCP', 'TCP', 'TCP', 'UDP', 'ICMP']))
+            for idx in range(num_keys)]
+    kinds = list(attacks) + ['normal']
+    weights = list(attacks.values()) + [max(1 - sum(attacks.values()), 0)]
+
+    start = datetime(2019, 1, 1)
+    packets, octets = 0, 0
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+
+        for idx in range(size):
+            kind = rnd.choices(kinds, weights)[0]
+            if kind == 'normal':
+                features = normal_flow(rnd, keys)
+            else:
+                features = attack_flow(rnd, kind)
+            source, destination, source_port, destination_port, \
+                protocol, flags, flow_packets, flow_bytes = features
+
+            first = start + timedelta(milliseconds=idx)
+            duration = rnd.randint(0, 5000) if flow_packets > 1 else 0
+            last = first + timedelta(milliseconds=duration)
+            flow = [first.strftime('%Y-%m-%d %H:%M:%S'),
+                    last.strftime('%Y-%m-%d %H:%M:%S'),
+                    f'{duration / 1000:.3f}', source, destination,
+                    source_port, destination_port, protocol, flags, '0',
+                    '0', str(flow_packets), str(flow_bytes)]
+            flow.extend(['0'] * (len(header) - len(flow)))
+
+            # exporters may leave features empty.
+            if rnd.random() < missing:
+                flow[2] = flow[5] = flow[6] = flow[8] = ''
+
+            writer.writerow(flow)
+            packets += flow_packets
+            octets += flow_bytes
+
+        writer.writerow(['Summary'])
+        writer.writerow(['flows', 'bytes', 'packets', 'avg_bps', 'avg_pps',
+                         'avg_bpp'])
+        seconds = max(size / 1000, 1)
+        writer.writerow([size, octets, packets, int(octets * 8 / seconds),
+                         int(packets / seconds),
+                         int(octets / packets) if packets else 0])
+
+
+def parse_attacks(value):
+    """Parses an attack mix.
+
+    Parameters
+    ----------
+    value: str
+        Attack names and fractions, as syn_flood=0.1,port_scan=0.05.
+
+    Returns
+    -------
+    dict
+        Fraction of the flows of each attack."""
+
+    attacks = dict()
+    for attack in filter(None, value.split(',')):
+        name, fraction = attack.split('=')
+        attacks[name] = float(fraction)
+
+    return attacks
+
+
+if __name__ == '__main__':
+    # file and number of flows, the other arguments by environment.
+    generate(sys.argv[1], int(sys.argv[2]),
+             int(os.environ.get('GENERATOR_SEED') or 1),
+             parse_attacks(os.environ['GENERATOR_ATTACKS'])
+             if 'GENERATOR_ATTACKS' in os.environ else None,
+             int(os.environ.get('GENERATOR_KEYS') or 1000),
+             float(os.environ.get('GENERATOR_MISSING') or 0.001))
@@ -0,0 +1,110 @@
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from sqlalchemy import create_engine, select
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app.core.columnar import pack_bitmap, port_bitmap
+from app.models import Intrusion
+
+
+# table sizes measured, rows inserted at once and lookups of each
+# measurement.
+sizes = [1000, 10000, 100000, 1000000]
+batch_size = 50000
+num_lookups = 200
+
+
+def row(idx):
+    """Creates the columns of a distinct intrusion.
+
+    Parameters
+    ----------
+    idx: int
+        Intrusion index.
+
+    Returns
+    -------
+    dict
+        Intrusion columns."""
+
+    date = datetime(2019, 1, 1)
+
+    return {'start_time': date, 'end_time': date,
+            'source_address': f'10.{idx >> 16 & 255}.{idx >> 8 & 255}.'
+                              f'{idx & 255}',
+            'destination_address': f'172.16.0.{idx % 7}',
+            'protocol': ['TCP', 'UDP', 'ICMP'][idx % 3],
+            **dict.fromkeys(Intrusion.flag_columns, 0),
+            'source_port': pack_bitmap(port_bitmap({'80'})),
+            'destination_port': pack_bitmap(port_bitmap({'80'})),
+            'duration': 0, 'packets': 1,
+            'bytes': 40, 'bytes_per_second': 0, 'bytes_per_packets': 40,
+            'packtes_per_second': 0, 'number_source_port': 1,
+            'number_destination_port': 1, 'flows': 1, 'rule': 'block1',
+            'model_id': 1}
+
+
+def lookup(engine, size):
+    """Measures the lookups of random intrusions by source, destination and
+    protocol.
+
+    Parameters
+    ----------
+    engine: obj
+        Database engine.
+    size: int
+        Number of intrusions in the table.
+
+    Returns
+    -------
+    float
+        Mean microseconds of a lookup."""
+
+    table = Intrusion.__table__
+    keys = [row(random.randrange(size)) for _ in range(num_lookups)]
+
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for key in keys:
+            conn.execute(select([table.c.id]).where(
+                (table.c.source_address == key['source_address']) &
+                (table.c.destination_address == key['destination_address']) &
+                (table.c.protocol == key['protocol']))).first()
+
+    return (time.perf_counter() - start) / num_lookups * 1e6
+
+
+if __name__ == '__main__':
+    directory = mkdtemp()
+
+    # the same rows with and without the index of the flows.
+    engines = {'index': create_engine(f'sqlite:///{directory}/index.db'),
+               'scan': create_engine(f'sqlite:///{directory}/scan.db')}
+    for name, engine in engines.items():
+        Intrusion.__table__.create(engine)
+        if name == 'scan':
+            engine.execute('DROP INDEX ix_intrusion_flow')
+
+    try:
+        inserted = 0
+        for size in sizes:
+            while inserted < size:
+                rows = [row(idx) for idx in
+                        range(inserted, min(inserted+batch_size, size))]
+                for engine in engines.values():
+                    engine.execute(Intrusion.__table__.insert(), rows)
+                inserted += len(rows)
+
+            print(f'rows: {size}, '
+                  f'index: {lookup(engines["index"], size):.1f} us/lookup, '
+                  f'scan: {lookup(engines["scan"], size):.1f} us/lookup')
+    finally:
+        rmtree(directory)
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app import app
+from app.core.mitigation import MitigationDispatcher, Mitigator
+from app.models import Intrusion
+from floodlight import FloodlightServer
+
+
+# intrusions per second submitted by each benchmark, seconds of each
+# benchmark, seconds added to each answer of the controller and number of
+# devices known by the controller, enough for a different source by
+# intrusion.
+rates = [50, 100, 200, 500, 1000, 2000]
+duration = float(os.environ.get('BENCHMARK_DURATION') or 2)
+latency = float(os.environ.get('FLOODLIGHT_LATENCY') or 0.002)
+num_devices = int(os.environ.get('FLOODLIGHT_DEVICES') or 5000)
+
+
+class TimedMitigator(Mitigator):
+    """Mitigator that records when each intrusion is blocked.
+
+    Attributes
+    ----------
+    self.blocked: dict
+        Time of the blocking by source address."""
+
+    def __init__(self):
+        super().__init__()
+        self.blocked = dict()
+
+    def block_attack(self, intrusion):
+        rule = super().block_attack(intrusion)
+        if rule:
+            self.blocked[intrusion.source_address] = time.perf_counter()
+
+        return rule
+
+
+def benchmark(rate, sources):
+    """Submits intrusions to the dispatcher at a constant rate.
+
+    Parameters
+    ----------
+    rate: int
+        Intrusions per second.
+    sources: list
+        Source addresses of the devices known by the controller.
+
+    Returns
+    -------
+    dict
+        Number of blocked intrusions, p50 and p99 time to block in
+        milliseconds and rules per second."""
+
+    mitigator = TimedMitigator()
+    dispatcher = MitigationDispatcher(mitigator,
+                                      app.config['MITIGATION_WORKERS'])
+    dispatcher.start()
+
+    submitted = dict()
+    start = time.perf_counter()
+    for idx in range(int(rate * duration)):
+        # waiting for the time of the next intrusion.
+        delay = start + idx/rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        source = sources[idx % len(sources)]
+        submitted[source] = time.perf_counter()
+        dispatcher.submit(Intrusion(source_address=source,
+                                    destination_address='10.255.0.1',
+                                    protocol='TCP'))
+    dispatcher.stop()
+
+    times = [(mitigator.blocked[source] - submitted[source]) * 1000
+             for source in submitted if source in mitigator.blocked]
+    elapsed = max(mitigator.blocked.values()) - start
+
+    return {'blocked': len(times),
+            'p50': np.percentile(times, 50),
+            'p99': np.percentile(times, 99),
+            'rules': len(times) / elapsed}
+
+
+if __name__ == '__main__':
+    server = FloodlightServer('127.0.0.1', 0, latency, num_devices)
+    host, port = server.start()
+    app.config['CONTROLLER_HOST'] = host
+    app.config['CONTROLLER_PORT'] = port
+
+    # each intrusion of a benchmark has a different source.
+    sources = [device['ipv4'][0] for device in server.devices]
+    print(f'latency: {latency*1000:.1f} ms, devices: {num_devices}, '
+          f'workers: {app.config["MITIGATION_WORKERS"]}')
+
+    for rate in rates:
+        result = benchmark(rate, sources[:int(rate * duration)])
+        print(f'rate: {rate} intrusions/s, blocked: {result["blocked"]}, '
+              f'time to block p50: {result["p50"]:.1f} ms, '
+              f'p99: {result["p99"]:.1f} ms, '
+              f'rules: {result["rules"]:.0f} rules/s')
+
+    server.stop()
@@ -0,0 +1,164 @@
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from tempfile import mkdtemp
+from shutil import rmtree
+
+from sklearn.tree import DecisionTreeClassifier
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app.core import exporter, gatherer
+from app.core.detection import Detector
+from app.core.preprocessing import Extractor, Formatter, Modifier
+from generator import generate
+
+
+# flows of each benchmark, aggregation threshold, indexes of the extracted
+# features, from the duration to the number of flows, and flows used to
+# fit the classifier.
+sizes = [int(size) for size in
+         (os.environ.get('BENCHMARK_SIZES') or '10000,100000,1000000')
+         .split(',')]
+threshold = 10
+features = list(range(8, 17))
+num_training = 10000
+
+
+def measure(func, *args):
+    """Measures a single call of a function.
+
+    Parameters
+    ----------
+    func: func
+        Function to call.
+    *args
+        Variable length argument list.
+
+    Returns
+    -------
+    tuple
+        Result of the function and seconds of the call."""
+
+    start = time.perf_counter()
+    result = func(*args)
+
+    return result, time.perf_counter() - start
+
+
+def fit_detector(directory):
+    """Fits a classifier to flag the flows of the attackers.
+
+    Parameters
+    ----------
+    directory: str
+        Absolute path of a temporary directory.
+
+    Returns
+    -------
+    obj
+        Detector instance."""
+
+    generate(f'{directory}training.csv', num_training, seed=2)
+    _, flows = gatherer.open_csv(directory, 'training.csv')
+    flows = Modifier(0, threshold).aggregate_flows(
+        Formatter(bulk=True).format_flows(flows))
+    training_features, _ = Extractor(features).extract_features_labels(flows)
+    # the generator attacks from 192.168.0.0/24.
+    labels = [int(flow[2].startswith('192.168.0.')) for flow in flows]
+
+    detector = Detector({'obj': DecisionTreeClassifier(random_state=1)})
+    detector.classifier['obj'].fit(training_features, labels)
+    os.remove(f'{directory}training.csv')
+
+    return detector
+
+
+def benchmark(directory, size, detector):
+    """Measures each preprocessing step over the same synthetic flows.
+
+    Parameters
+    ----------
+    directory: str
+        Absolute path of a temporary directory.
+    size: int
+        Number of flows.
+    detector: obj
+        Detector instance.
+
+    Returns
+    -------
+    dict
+        Seconds and flows per second of each step."""
+
+    generate(f'{directory}flows.csv', size)
+    seconds = dict()
+
+    (_, flows), seconds['open_csv'] = measure(
+        gatherer.open_csv, directory, 'flows.csv')
+    flows, seconds['format_flows'] = measure(
+        Formatter(bulk=True).format_flows, flows)
+    flows, seconds['aggregate_flows'] = measure(
+        Modifier(0, threshold).aggregate_flows, flows)
+    (extracted, _), seconds['extract_features_labels'] = measure(
+        Extractor(features).extract_features_labels, flows)
+    _, seconds['flows_csv'] = measure(
+        exporter.flows_csv, ['flows'], flows, directory, 'exported.csv')
+    _, seconds['test'] = measure(detector.test, extracted)
+
+    os.remove(f'{directory}flows.csv')
+    os.remove(f'{directory}exported.csv')
+
+    return {step: {'seconds': round(duration, 4),
+                   'flows_per_second': round(size / duration)}
+            for step, duration in seconds.items()}
+
+
+def compare(results, baseline):
+    """Prints the change of each step from a previous run.
+
+    Parameters
+    ----------
+    results: dict
+        Results of this run by number of flows.
+    baseline: dict
+        Results of the previous run by number of flows."""
+
+    for size, steps in results.items():
+        for step, result in steps.items():
+            previous = baseline.get(size, {}).get(step)
+            if previous:
+                change = result['seconds'] / previous['seconds'] - 1
+                print(f'flows: {size}, {step}: {change:+.1%}')
+
+
+if __name__ == '__main__':
+    # file of the results and, optionally, of a previous run.
+    output = sys.argv[1] if len(sys.argv) > 1 else 'preprocessing.json'
+    directory = f'{mkdtemp()}/'
+
+    try:
+        detector = fit_detector(directory)
+
+        results = dict()
+        for size in sizes:
+            results[str(size)] = benchmark(directory, size, detector)
+            for step, result in results[str(size)].items():
+                print(f'flows: {size}, {step}: {result["seconds"]} s, '
+                      f'{result["flows_per_second"]} flows/s')
+    finally:
+        rmtree(directory)
+
+    with open(output, 'w') as results_file:
+        json.dump({'date': datetime.now().isoformat(),
+                   'python': platform.python_version(),
+                   'machine': platform.machine(),
+                   'results': results}, results_file, indent=4)
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2]) as baseline_file:
+            compare(results, json.load(baseline_file)['results'])
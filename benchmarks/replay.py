@@ -0,0 +1,47 @@
+import os
+import sys
+import threading
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app import app
+from app.models import Model
+from app.realtime import RealtimeThread
+from floodlight import FloodlightServer
+
+
+# seconds added to each answer of the controller and number of devices
+# known by the controller.
+latency = float(os.environ.get('FLOODLIGHT_LATENCY') or 0.002)
+num_devices = int(os.environ.get('FLOODLIGHT_DEVICES') or 5000)
+
+
+if __name__ == '__main__':
+    # model of the detection, the capture and the speed-up factor by
+    # REPLAY_PATH and REPLAY_SPEED.
+    model = Model.query.get(int(sys.argv[1]))
+
+    server = FloodlightServer('127.0.0.1', 0, latency, num_devices)
+    host, port = server.start()
+    app.config['CONTROLLER_HOST'] = host
+    app.config['CONTROLLER_PORT'] = port
+    app.config['REALTIME_SOURCE'] = 'replay'
+
+    try:
+        # replaying in this thread until the capture ends.
+        thread = RealtimeThread(threading.Event(), model)
+        thread.run()
+    finally:
+        server.stop()
+
+    report = thread.report
+    print(f'capture: {app.config["REPLAY_PATH"]}, '
+          f'speed: {app.config["REPLAY_SPEED"] or "maximum"}')
+    print(f'windows: {report["windows"]}, flows: {report["flows"]}, '
+          f'seconds: {report["seconds"]}, '
+          f'flows/s: {report["flows_per_second"]}')
+    print(f'window latency p50: {report["latency"]["p50"]} s, '
+          f'p95: {report["latency"]["p95"]} s, '
+          f'p99: {report["latency"]["p99"]} s, '
+          f'max: {report["latency"]["max"]} s')
@@ -10,3 +10,81 @@ class Config(object):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(base_dir, 'instance/app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # whether SQLite uses write-ahead logging and relaxed synchronization, so
+    # the readers do not wait for the writer, the page cache in KiB and the
+    # milliseconds waiting for a locked database.
+    SQLITE_WAL = bool(int(os.environ.get('SQLITE_WAL') or 0))
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or 20000)
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    # maximum lines and approximate bytes of the CSV chunks read at once.
+    CSV_CHUNK_SIZE = int(os.environ.get('CSV_CHUNK_SIZE') or 10000)
+    CSV_CHUNK_BYTES = int(os.environ.get('CSV_CHUNK_BYTES') or 0) or None
+    # default number of processes preprocessing CSV files in parallel.
+    PREPROCESSING_WORKERS = int(os.environ.get('PREPROCESSING_WORKERS') or
+                                os.cpu_count() or 1)
+    # number of processes fitting the candidates of each grid search.
+    TRAINING_WORKERS = int(os.environ.get('TRAINING_WORKERS') or
+                           os.cpu_count() or 1)
+    # seconds between the polls of the jobs and before an idle worker stops.
+    JOB_POLL = int(os.environ.get('JOB_POLL') or 1)
+    JOB_IDLE = int(os.environ.get('JOB_IDLE') or 60)
+    # source of the realtime flows, nfcapd files, the built-in collector or
+    # a replayed capture.
+    REALTIME_SOURCE = os.environ.get('REALTIME_SOURCE') or 'nfcapd'
+    # nfcapd or CSV file, or directory of them, replayed by the replay source,
+    # seconds of capture of each window and speed-up factor, 0 to replay as
+    # fast as possible.
+    REPLAY_PATH = os.environ.get('REPLAY_PATH') or \
+        os.path.join(base_dir, 'data/nfcapd/')
+    REPLAY_WINDOW = int(os.environ.get('REPLAY_WINDOW') or 60)
+    REPLAY_SPEED = float(os.environ.get('REPLAY_SPEED') or 0)
+    COLLECTOR_HOST = os.environ.get('COLLECTOR_HOST') or '127.0.0.1'
+    COLLECTOR_PORT = int(os.environ.get('COLLECTOR_PORT') or 7777)
+    # seconds between the detections of the collected flows.
+    COLLECTOR_WINDOW = int(os.environ.get('COLLECTOR_WINDOW') or 10)
+    # address of the Floodlight controller REST API.
+    CONTROLLER_HOST = os.environ.get('CONTROLLER_HOST') or '127.0.0.1'
+    CONTROLLER_PORT = int(os.environ.get('CONTROLLER_PORT') or 8080)
+    # keep-alive connections and seconds to wait for the controller.
+    CONTROLLER_POOL_SIZE = int(os.environ.get('CONTROLLER_POOL_SIZE') or 4)
+    CONTROLLER_TIMEOUT = float(os.environ.get('CONTROLLER_TIMEOUT') or 5)
+    # seconds before the devices are downloaded again from the controller,
+    # and between the downloads caused by unknown addresses.
+    TOPOLOGY_TTL = float(os.environ.get('TOPOLOGY_TTL') or 30)
+    TOPOLOGY_MISS_INTERVAL = float(os.environ.get('TOPOLOGY_MISS_INTERVAL') or
+                                   1)
+    # whether the blocked sources are merged in prefix rules, whether the
+    # prefixes may be widened over sources not blocked to fit the rules of a
+    # switch, the minimum prefix length and the maximum number of rules of
+    # each switch.
+    RULE_COMPACTION = bool(int(os.environ.get('RULE_COMPACTION') or 0))
+    RULE_WIDEN_PREFIX = bool(int(os.environ.get('RULE_WIDEN_PREFIX') or 0))
+    RULE_MIN_PREFIX = int(os.environ.get('RULE_MIN_PREFIX') or 24)
+    RULE_MAX_PER_SWITCH = int(os.environ.get('RULE_MAX_PER_SWITCH') or 1000)
+    # seconds without packets before the switch removes the rule, seconds
+    # since the blocking before the rule and the intrusion expire, 0 to never
+    # expire, and the maximum number of intrusions expired at once.
+    RULE_IDLE_TIMEOUT = int(os.environ.get('RULE_IDLE_TIMEOUT') or 0)
+    RULE_HARD_TIMEOUT = int(os.environ.get('RULE_HARD_TIMEOUT') or 0)
+    RULE_EXPIRY_BATCH = int(os.environ.get('RULE_EXPIRY_BATCH') or 1000)
+    # number of intrusions blocked at the same time.
+    MITIGATION_WORKERS = int(os.environ.get('MITIGATION_WORKERS') or 4)
+    # minimum seconds between the writes of the updated intrusions.
+    INTRUSION_FLUSH = int(os.environ.get('INTRUSION_FLUSH') or 5)
+    # intrusions of each page and maximum intrusions of a page of the API.
+    INTRUSION_PAGE_SIZE = int(os.environ.get('INTRUSION_PAGE_SIZE') or 50)
+    INTRUSION_PAGE_MAX = int(os.environ.get('INTRUSION_PAGE_MAX') or 500)
+    # one in how many calls of each profiled function are timed, 0 to only
+    # count them.
+    PROFILING_SAMPLE = int(os.environ.get('PROFILING_SAMPLE') or 10)
+    # windows waiting in each queue of the realtime pipeline, policy when the
+    # detection falls behind, block, drop_oldest or sample, one in how many
+    # flows are kept when sampling and processes detecting the windows.
+    PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE') or 2)
+    PIPELINE_POLICY = os.environ.get('PIPELINE_POLICY') or 'block'
+    PIPELINE_SAMPLE = int(os.environ.get('PIPELINE_SAMPLE') or 2)
+    PIPELINE_WORKERS = int(os.environ.get('PIPELINE_WORKERS') or
+                           os.cpu_count() or 1)
+    # maximum number of flows classified by each prediction.
+    DETECTION_BATCH_SIZE = int(os.environ.get('DETECTION_BATCH_SIZE') or
+                               10000)
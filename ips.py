@@ -1,7 +1,7 @@
-from app import app, db, socketio
+from app import app, db, jobs, socketio
 from app.core import util
 from app.models import (Classifier, Dataset, Feature,
-                        Intrusion, Model, Preprocessing,
+                        Intrusion, Job, Model, Preprocessing,
                         Result)
 
 
@@ -10,7 +10,7 @@ def make_shell_context():
     return {'app': app, 'db': db, 'socketio': socketio,
             'Classifier': Classifier, 'Dataset': Dataset,
             'Feature': Feature, 'Intrusion': Intrusion,
-            'Model': Model, 'Preprocessing': Preprocessing,
+            'Job': Job, 'Model': Model, 'Preprocessing': Preprocessing,
             'Result': Result}
 
 
@@ -18,6 +18,7 @@ if __name__ == '__main__':
     try:
         socketio.run(app)
     finally:
+        jobs.stop()
         for itr in Intrusion.query.all():
             db.session.delete(itr)
         db.session.commit()
@@ -0,0 +1,388 @@
+import os
+import sys
+import time
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app import app, db
+from app.core.cache import IntrusionCache
+from app.models import Intrusion
+from app.realtime import RealtimeThread
+
+
+class MemoryCache(IntrusionCache):
+    """Intrusion cache without the intrusions of the database."""
+
+    def load(self):
+        pass
+
+
+def intrusion(source):
+    return Intrusion(start_time=datetime(2019, 1, 1),
+                     end_time=datetime(2019, 1, 1),
+                     source_address=source, destination_address='10.0.1.1',
+                     protocol='TCP', urg_flags=0, ack_flags=1, syn_flags=1,
+                     fin_flags=0, rst_flags=0, psh_flags=0,
+                     source_port=b'', destination_port=b'', duration=0,
+                     packets=1, bytes=40, bytes_per_second=0,
+                     bytes_per_packets=40, packtes_per_second=0,
+                     number_source_port=0, number_destination_port=0,
+                     flows=1, rule=f'block{source.split(".")[-1]}',
+                     model_id=1)
+
+
+def flow(source):
+    return [datetime(2019, 1, 1), datetime(2019, 1, 2), source, '10.0.1.1',
+            'TCP', [0, 1, 0, 0, 0, 0], {'1024'}, {'80'}, 0, 1, 40, 0, 40, 0,
+            1, 1, 1, 1]
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Test case with an empty database in memory."""
+
+    def setUp(self):
+        self.uri = app.config['SQLALCHEMY_DATABASE_URI']
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.session.remove()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        app.config['SQLALCHEMY_DATABASE_URI'] = self.uri
+
+
+# unit tests
+class TestIntrusionCache(unittest.TestCase):
+    """Tests the IntrusionCache class in cache module."""
+
+    def test_idle_timeout(self):
+        """Tests if the intrusions do not expire without new flows, and
+        if the flows after the idle timeout report the rule removed by the
+        switch."""
+
+        cache = MemoryCache(60, idle_timeout=0.2)
+        for source in ['10.0.0.1', '10.0.0.2']:
+            cache.add(intrusion(source))
+
+        time.sleep(0.1)
+        self.assertIsNone(cache.update(flow('10.0.0.2')))
+
+        time.sleep(0.15)
+        self.assertListEqual(cache.expire(), [])
+        self.assertEqual(cache.update(flow('10.0.0.1')), 'block1')
+        self.assertIsNone(cache.update(flow('10.0.0.2')))
+        self.assertEqual(
+            cache.intrusions[('10.0.0.1', '10.0.1.1', 'TCP')]['rule'],
+            'no rule')
+        self.assertIsNone(cache.update(flow('10.0.0.1')))
+
+    def test_update(self):
+        """Tests if the flags are added and the ports merged in the
+        bitmaps."""
+
+        cache = MemoryCache(60)
+        cache.add(intrusion('10.0.0.1'))
+        for ports in [{'80', '443'}, {'443', '65535'}]:
+            cache.update([datetime(2019, 1, 1), datetime(2019, 1, 2),
+                          '10.0.0.1', '10.0.1.1', 'TCP', [0, 1, 0, 0, 0, 1],
+                          {'1024'}, ports, 0, 1, 40, 0, 40, 0, 1, 1, 1, 1])
+
+        row = cache.row(cache.intrusions[('10.0.0.1', '10.0.1.1', 'TCP')])
+        self.assertListEqual([row[column] for column in
+                              Intrusion.flag_columns], [0, 3, 1, 0, 0, 2])
+        self.assertEqual(row['number_destination_port'], 3)
+        self.assertEqual(len(row['destination_port']), 8192)
+        self.assertListEqual(Intrusion(source_port=row['source_port'],
+                                       protocol='TCP').source_ports,
+                             ['1024'])
+
+    def test_hard_timeout(self):
+        """Tests if the intrusions expire in batches after the hard
+        timeout, even with new flows."""
+
+        cache = MemoryCache(60, idle_timeout=60, hard_timeout=0.1, batch=2)
+        for idx in range(3):
+            cache.add(intrusion(f'10.0.0.{idx}'))
+
+        time.sleep(0.15)
+        self.assertEqual(len(cache.expire()), 2)
+        self.assertEqual(len(cache.expire()), 1)
+        self.assertEqual(cache.count, 0)
+        self.assertListEqual(cache.deadlines, [])
+
+
+class TestWrite(DatabaseTestCase):
+    """Tests the writes of the IntrusionCache class in cache module."""
+
+    def test_flush(self):
+        """Tests if the new and updated intrusions are written together
+        and only once."""
+
+        cache = IntrusionCache(0)
+        for source in ['10.0.0.1', '10.0.0.2']:
+            cache.add(intrusion(source))
+        cache.flush(force=True)
+        cache.update(flow('10.0.0.2'))
+        cache.flush(force=True)
+
+        self.assertListEqual([(row.source_address, row.flows) for row in
+                              Intrusion.query.order_by(
+                                  Intrusion.source_address)],
+                             [('10.0.0.1', 1), ('10.0.0.2', 2)])
+        self.assertSetEqual(cache.updated, set())
+        self.assertSetEqual(cache.created, set())
+
+    def test_interval(self):
+        """Tests if the writes wait for the interval unless forced."""
+
+        cache = IntrusionCache(0.2)
+        cache.add(intrusion('10.0.0.1'))
+        cache.flush()
+        self.assertEqual(Intrusion.query.count(), 0)
+
+        time.sleep(0.25)
+        cache.flush()
+        self.assertEqual(Intrusion.query.count(), 1)
+
+        cache.add(intrusion('10.0.0.2'))
+        cache.flush(force=True)
+        self.assertEqual(Intrusion.query.count(), 2)
+
+    def test_missing(self):
+        """Tests if only the updated intrusions are checked, those deleted
+        by others are removed from memory and the others are kept."""
+
+        for source in ['10.0.0.1', '10.0.0.2', '10.0.0.3']:
+            db.session.add(intrusion(source))
+        db.session.commit()
+        cache = IntrusionCache(0)
+        for source in ['10.0.0.1', '10.0.0.2', '10.0.0.3']:
+            cache.find((source, '10.0.1.1', 'TCP'))
+        self.assertEqual(cache.count, 3)
+
+        Intrusion.query.filter(
+            Intrusion.source_address != '10.0.0.2').delete()
+        db.session.commit()
+        for source in ['10.0.0.1', '10.0.0.2']:
+            cache.update(flow(source))
+        cache.flush(force=True)
+        cache.flush(force=True)
+
+        self.assertNotIn(('10.0.0.1', '10.0.1.1', 'TCP'), cache)
+        self.assertIn(('10.0.0.2', '10.0.1.1', 'TCP'), cache)
+        # not written since it was found.
+        self.assertIn(('10.0.0.3', '10.0.1.1', 'TCP'), cache)
+        self.assertEqual(cache.count, 2)
+
+    def test_discard(self):
+        """Tests if an intrusion deleted by others and notified is removed
+        from memory without being written again."""
+
+        cache = IntrusionCache(0)
+        cache.add(intrusion('10.0.0.1'))
+        cache.flush(force=True)
+        cache.update(flow('10.0.0.1'))
+
+        Intrusion.query.delete()
+        db.session.commit()
+        cache.discard(('10.0.0.1', '10.0.1.1', 'TCP'))
+        cache.flush(force=True)
+
+        self.assertEqual(cache.count, 0)
+        self.assertSetEqual(cache.updated, set())
+        self.assertListEqual(cache.results, [])
+        self.assertEqual(Intrusion.query.count(), 0)
+
+    def test_unchanged(self):
+        """Tests if nothing is written without new or updated
+        intrusions."""
+
+        cache = IntrusionCache(0)
+        cache.add(intrusion('10.0.0.1'))
+        cache.flush(force=True)
+        cache.flush(force=True)
+
+        self.assertListEqual(cache.results, [])
+
+    def test_load(self):
+        """Tests if the intrusions expire since their last flows, those past
+        the hard timeout being deleted by the next expire."""
+
+        recent = intrusion('10.0.0.2')
+        recent.end_time = datetime.now()
+        db.session.add_all([intrusion('10.0.0.1'), recent])
+        db.session.commit()
+
+        self.assertDictEqual(IntrusionCache(0).intrusions, dict())
+        cache = IntrusionCache(0, hard_timeout=60)
+        self.assertLessEqual(
+            cache.deadline(cache.intrusions[('10.0.0.2', '10.0.1.1',
+                                             'TCP')]),
+            time.monotonic() + 60)
+        self.assertListEqual(cache.expire(),
+                             [('10.0.0.1', '10.0.1.1', 'TCP', 'block1')])
+        self.assertListEqual([row.source_address
+                              for row in Intrusion.query],
+                             ['10.0.0.2'])
+        self.assertEqual(cache.count, 1)
+
+    def test_count(self):
+        """Tests if the intrusions not loaded are counted, and the count
+        follows the created and deleted intrusions."""
+
+        db.session.add_all([intrusion('10.0.0.1'), intrusion('10.0.0.2')])
+        db.session.commit()
+
+        cache = IntrusionCache(0)
+        self.assertDictEqual(cache.intrusions, dict())
+        self.assertEqual(cache.count, 2)
+
+        cache.add(intrusion('10.0.0.3'))
+        self.assertEqual(cache.count, 3)
+        cache.flush(force=True)
+        self.assertTrue(cache.find(('10.0.0.1', '10.0.1.1', 'TCP')))
+        self.assertEqual(cache.count, 3)
+
+        Intrusion.query.filter_by(source_address='10.0.0.2').delete()
+        db.session.commit()
+        cache.discard(('10.0.0.2', '10.0.1.1', 'TCP'))
+        cache.flush(force=True)
+        self.assertEqual(cache.count, Intrusion.query.count())
+
+    def test_delete_update(self):
+        """Tests if an intrusion deleted by others is skipped by the update
+        and recreated by the next flows."""
+
+        key = ('10.0.0.1', '10.0.1.1', 'TCP')
+        cache = IntrusionCache(0)
+        cache.add(intrusion('10.0.0.1'))
+        cache.flush(force=True)
+        cache.flush(force=True)
+        self.assertIsNotNone(cache.intrusions[key]['id'])
+
+        # false positive removed from the intrusions page.
+        db.session.delete(Intrusion.query.one())
+        db.session.commit()
+        cache.update(flow('10.0.0.1'))
+        cache.flush(force=True)
+        cache.flush(force=True)
+        self.assertNotIn(key, cache)
+
+        self.assertFalse(cache.find(key))
+        cache.add(intrusion('10.0.0.1'))
+        cache.flush(force=True)
+        self.assertEqual(Intrusion.query.count(), 1)
+
+    def test_saved_by_others(self):
+        """Tests if a new intrusion saved meanwhile by others is updated
+        with its primary key."""
+
+        cache = IntrusionCache(0)
+        cache.add(intrusion('10.0.0.1'))
+        # the same intrusion saved by another detection.
+        db.session.add(intrusion('10.0.0.1'))
+        db.session.commit()
+        pk = Intrusion.query.one().id
+        cache.update(flow('10.0.0.1'))
+        cache.flush(force=True)
+        cache.flush(force=True)
+
+        self.assertEqual(Intrusion.query.one().flows, 2)
+        self.assertEqual(
+            cache.intrusions[('10.0.0.1', '10.0.1.1', 'TCP')]['id'], pk)
+
+
+class TestFind(DatabaseTestCase):
+    """Tests the find method of IntrusionCache class in cache module."""
+
+    def test_memory(self):
+        """Tests if an intrusion in memory is found before being
+        written."""
+
+        cache = IntrusionCache(60)
+        cache.add(intrusion('10.0.0.1'))
+
+        self.assertTrue(cache.find(('10.0.0.1', '10.0.1.1', 'TCP')))
+        self.assertEqual(Intrusion.query.count(), 0)
+
+    def test_index(self):
+        """Tests if an intrusion saved by others is loaded through the
+        index."""
+
+        db.session.add(intrusion('10.0.0.1'))
+        db.session.commit()
+        cache = IntrusionCache(60)
+
+        self.assertTrue(cache.find(('10.0.0.1', '10.0.1.1', 'TCP')))
+        self.assertFalse(cache.find(('10.0.0.2', '10.0.1.1', 'TCP')))
+        self.assertEqual(cache.count, 1)
+        self.assertSetEqual(cache.created, set())
+
+    def test_mitigating(self):
+        """Tests if the realtime detection updates the intrusions found in
+        memory or through the index and creates and blocks the others."""
+
+        blocked = list()
+        thread = SimpleNamespace(intrusions=IntrusionCache(0),
+                                 model=SimpleNamespace(id=1),
+                                 dispatcher=SimpleNamespace(
+                                     submit=blocked.append))
+        db.session.add(intrusion('10.0.0.2'))
+        db.session.commit()
+
+        for source in ['10.0.0.1', '10.0.0.1', '10.0.0.2']:
+            RealtimeThread.mitigating(thread, flow(source))
+        thread.intrusions.flush(force=True)
+
+        self.assertListEqual([item.source_address for item in blocked],
+                             ['10.0.0.1'])
+        self.assertListEqual([(row.source_address, row.flows) for row in
+                              Intrusion.query.order_by(Intrusion.id)],
+                             [('10.0.0.2', 2), ('10.0.0.1', 2)])
+
+
+# collections of test cases
+def intrusion_cache_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestIntrusionCache('test_idle_timeout'))
+    suite.addTest(TestIntrusionCache('test_update'))
+    suite.addTest(TestIntrusionCache('test_hard_timeout'))
+
+    return suite
+
+
+def write_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestWrite('test_flush'))
+    suite.addTest(TestWrite('test_interval'))
+    suite.addTest(TestWrite('test_missing'))
+    suite.addTest(TestWrite('test_discard'))
+    suite.addTest(TestWrite('test_unchanged'))
+    suite.addTest(TestWrite('test_load'))
+    suite.addTest(TestWrite('test_count'))
+    suite.addTest(TestWrite('test_delete_update'))
+    suite.addTest(TestWrite('test_saved_by_others'))
+
+    return suite
+
+
+def find_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestFind('test_memory'))
+    suite.addTest(TestFind('test_index'))
+    suite.addTest(TestFind('test_mitigating'))
+
+    return suite
+
+
+# outcome of the test cases
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(intrusion_cache_suite())
+    runner.run(write_suite())
+    runner.run(find_suite())
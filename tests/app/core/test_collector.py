@@ -0,0 +1,209 @@
+import os
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app.core import collector
+from app.core.collector import Collector, Decoder
+
+
+# export time of the datagrams used during the tests
+export_secs = 1448383252
+export_time = datetime.fromtimestamp(export_secs)
+
+
+def v5_datagram():
+    """Creates a NetFlow v5 datagram with a TCP and an ICMP flow."""
+
+    header = struct.pack('!HHIIIIBBH', 5, 2, 10000, export_secs, 0, 1,
+                         0, 0, 0)
+    tcp = struct.pack('!4s4s4sHHIIIIHHBBBBHHBBH',
+                      bytes([146, 164, 69, 172]), bytes([146, 164, 69, 1]),
+                      bytes(4), 0, 0, 3, 678, 8000, 10000, 51000, 80,
+                      0, 0x12, 6, 0, 0, 0, 0, 0, 0)
+    icmp = struct.pack('!4s4s4sHHIIIIHHBBBBHHBBH',
+                       bytes([146, 164, 69, 172]), bytes([146, 164, 69, 1]),
+                       bytes(4), 0, 0, 1, 84, 10000, 10000, 0, 0x0800,
+                       0, 0, 1, 0, 0, 0, 0, 0, 0)
+
+    return header + tcp + icmp
+
+
+def v9_datagrams():
+    """Creates a NetFlow v9 template datagram and a data datagram."""
+
+    # source and destination address, ports, protocol, flags, packets,
+    # bytes and first and last switched.
+    template = [(8, 4), (12, 4), (7, 2), (11, 2), (4, 1), (6, 1),
+                (2, 4), (1, 4), (22, 4), (21, 4)]
+    body = struct.pack('!HH', 256, len(template))
+    for field in template:
+        body += struct.pack('!HH', *field)
+    template_set = struct.pack('!HH', 0, len(body) + 4) + body
+
+    record = struct.pack('!4s4sHHBBIIII', bytes([10, 0, 0, 1]),
+                         bytes([10, 0, 0, 2]), 631, 631, 17, 0,
+                         3, 678, 8000, 10000)
+    # padding to a 32 bits boundary.
+    data_set = struct.pack('!HH', 256, len(record) + 6) + record + bytes(2)
+
+    header = struct.pack('!HHIIII', 9, 1, 10000, export_secs, 1, 0)
+
+    return [header + template_set, header + data_set]
+
+
+def ipfix_datagram():
+    """Creates an IPFIX message with a template and a data set."""
+
+    # ipv6 addresses, ports, protocol, flags, packets, bytes and flow start
+    # and end seconds.
+    template = [(27, 16), (28, 16), (7, 2), (11, 2), (4, 1), (6, 2),
+                (2, 8), (1, 8), (150, 4), (151, 4)]
+    body = struct.pack('!HH', 300, len(template))
+    for field in template:
+        body += struct.pack('!HH', *field)
+    template_set = struct.pack('!HH', 2, len(body) + 4) + body
+
+    record = struct.pack('!16s16sHHBHQQII',
+                         bytes(15) + b'\x01', bytes(15) + b'\x02',
+                         40000, 443, 6, 0x19, 10, 1500,
+                         export_secs - 4, export_secs)
+    data_set = struct.pack('!HH', 300, len(record) + 4) + record
+
+    sets = template_set + data_set
+    header = struct.pack('!HHIII', 10, len(sets) + 16, export_secs, 1, 0)
+
+    return header + sets
+
+
+# unit tests
+class TestDecoder(unittest.TestCase):
+    """Tests the Decoder class in collector module."""
+
+    def test_decode_v5(self):
+        """Tests if the v5 records are formatted as the Formatter class."""
+
+        flows = Decoder().decode(v5_datagram(), ('127.0.0.1', 0))
+
+        self.assertListEqual(flows[0], [datetime.fromtimestamp(
+                                            export_secs - 2),
+                                        export_time, '146.164.69.172',
+                                        '146.164.69.1', 'TCP',
+                                        [0, 1, 1, 0, 0, 0], '51000', '80',
+                                        2, 3, 678])
+        self.assertListEqual(flows[1][4:8], ['ICMP', [0], '0', '8.0'])
+
+    def test_decode_v9(self):
+        """Tests if the v9 records are decoded with the announced template
+        and the padding is ignored."""
+
+        decoder = Decoder()
+        datagrams = v9_datagrams()
+
+        self.assertListEqual(decoder.decode(datagrams[1], ('127.0.0.1', 0)),
+                             [], 'decoded without template')
+        decoder.decode(datagrams[0], ('127.0.0.1', 0))
+        flows = decoder.decode(datagrams[1], ('127.0.0.1', 0))
+
+        self.assertEqual(len(flows), 1, 'padding decoded as a record')
+        self.assertListEqual(flows[0][2:], ['10.0.0.1', '10.0.0.2', 'UDP',
+                                            [0], '631', '631', 2, 3, 678])
+
+    def test_decode_ipfix(self):
+        """Tests if the IPFIX records are decoded with ipv6 addresses."""
+
+        flows = Decoder().decode(ipfix_datagram(), ('127.0.0.1', 0))
+
+        self.assertEqual(flows[0][2], '0000:0000:0000:0000:'
+                                      '0000:0000:0000:0001')
+        self.assertListEqual(flows[0][4:], ['TCP', [0, 1, 0, 1, 0, 1],
+                                            '40000', '443', 4, 10, 1500])
+
+    def test_malformed_datagram(self):
+        """Tests if a truncated datagram is discarded."""
+
+        self.assertListEqual(Decoder().decode(v5_datagram()[:50],
+                                              ('127.0.0.1', 0)), [])
+
+
+class TestCollector(unittest.TestCase):
+    """Tests the Collector class with datagrams replayed to localhost."""
+
+    def setUp(self):
+        """Starts a collector in a free port recording the datagrams."""
+
+        self.flows = list()
+        self.received = threading.Event()
+        record_file, self.record = tempfile.mkstemp()
+        os.close(record_file)
+        self.collector = Collector('127.0.0.1', 0, self.receive, self.record)
+        self.port = self.collector.start()
+
+    def tearDown(self):
+        """Stops the collector and removes the record file."""
+
+        self.collector.stop()
+        os.remove(self.record)
+
+    def receive(self, flows):
+        self.flows.extend(flows)
+        if len(self.flows) >= 4:
+            self.received.set()
+
+    def test_replay(self):
+        """Tests if the replayed datagrams are collected and recorded."""
+
+        datagrams = [v5_datagram(), *v9_datagrams(), ipfix_datagram()]
+        collector.replay(datagrams, '127.0.0.1', self.port)
+
+        self.assertTrue(self.received.wait(5), 'flows not collected')
+        self.assertEqual(len(self.flows), 4)
+        self.collector.stop()
+        self.assertListEqual(list(collector.load_datagrams(self.record)),
+                             datagrams, 'datagrams recorded incorrectly')
+
+    def test_port_in_use(self):
+        """Tests if a collector in a port already used raises the error
+        instead of waiting."""
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as used:
+            used.bind(('127.0.0.1', 0))
+            busy = Collector('127.0.0.1', used.getsockname()[1],
+                             self.receive)
+
+            with self.assertRaises(OSError):
+                busy.start(timeout=5)
+        self.assertFalse(busy.thread.is_alive())
+
+
+# collections of test cases
+def decoder_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestDecoder('test_decode_v5'))
+    suite.addTest(TestDecoder('test_decode_v9'))
+    suite.addTest(TestDecoder('test_decode_ipfix'))
+    suite.addTest(TestDecoder('test_malformed_datagram'))
+
+    return suite
+
+
+def collector_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestCollector('test_replay'))
+    suite.addTest(TestCollector('test_port_in_use'))
+
+    return suite
+
+
+# outcome of the test cases
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(decoder_suite())
+    runner.run(collector_suite())
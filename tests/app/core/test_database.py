@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import unittest
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app import db
+from app.core.database import DatabaseWriter
+
+
+# unit tests
+class TestDatabaseWriter(unittest.TestCase):
+    """Tests the DatabaseWriter class in database module."""
+
+    def setUp(self):
+        self.commits = list()
+        self.commit = db.session.commit
+        db.session.commit = lambda: self.commits.append(1)
+
+    def tearDown(self):
+        db.session.commit = self.commit
+
+    def test_coalesce(self):
+        """Tests if the writes queued during a transaction are committed
+        together in the next one."""
+
+        started, release = threading.Event(), threading.Event()
+
+        def slow_write():
+            started.set()
+            release.wait()
+
+        writer = DatabaseWriter()
+        writer.start()
+        writer.submit(slow_write)
+        started.wait()
+
+        for idx in range(10):
+            writer.submit(lambda idx=idx: idx)
+        release.set()
+        writer.stop()
+
+        self.assertEqual(len(self.commits), 2)
+        self.assertListEqual(writer.collect(), list(range(10)))
+        self.assertListEqual(writer.collect(), [])
+
+    def test_error(self):
+        """Tests if a failed transaction does not stop the writer."""
+
+        def failed_write():
+            raise ValueError('failed write')
+
+        writer = DatabaseWriter()
+        writer.start()
+        writer.submit(failed_write)
+        writer.submit(lambda: 'written')
+        writer.stop()
+
+        self.assertIn('written', writer.collect())
+
+
+# collections of test cases
+def database_writer_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestDatabaseWriter('test_coalesce'))
+    suite.addTest(TestDatabaseWriter('test_error'))
+
+    return suite
+
+
+# outcome of the test cases
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(database_writer_suite())
@@ -222,6 +222,30 @@ class TestCaptureNfcapd(unittest.TestCase):
         self.assertIn('nfcapd.current', util.directory_content(nfcapd_path)[1][0])
 
 
+class TestSplitWindows(unittest.TestCase):
+    """Tests the split_windows function in gatherer module."""
+
+    def setUp(self):
+        """Initiates the parameters to feed the test function."""
+
+        self.flows = [['2019-01-01 00:00:10', 'a'],
+                      ['2019-01-01 00:00:50', 'b'],
+                      ['2019-01-01 00:01:00', 'c'],
+                      ['2019-01-01 00:00:30', 'd'],
+                      ['2019-01-01 00:04:59', 'e']]
+
+    def test_windows(self):
+        """Tests if the flows are split by the minute of capture, keeping
+        the late flows in the current window and counting the empty
+        windows."""
+
+        windows = [(index, [flow[1] for flow in flows]) for index, flows
+                   in gatherer.split_windows(self.flows, 60)]
+
+        self.assertListEqual(windows, [(0, ['a', 'b']), (1, ['c', 'd']),
+                                       (4, ['e'])])
+
+
 # collections of test cases
 def split_pcap_suite():
     suite = unittest.TestSuite()
@@ -262,6 +286,13 @@ def capture_nfcapd_suite():
 
     return suite
 
+
+def split_windows_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestSplitWindows('test_windows'))
+
+    return suite
+
 # outcome of the test cases
 if __name__ == '__main__':
     runner = unittest.TextTestRunner()
@@ -269,5 +300,6 @@ if __name__ == '__main__':
     runner.run(convert_pcap_nfcapd_suite())
     runner.run(convert_nfcapd_csv_suite())
     runner.run(open_csv_suite())
+    runner.run(split_windows_suite())
     # requires the simulation of a software-defined networking
     #runner.run(capture_nfcapd_suite())
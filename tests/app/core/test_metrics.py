@@ -0,0 +1,95 @@
+import os
+import sys
+import unittest
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app.core.metrics import Counter, Gauge, Histogram, Registry
+
+
+# unit tests
+class TestRegistry(unittest.TestCase):
+    """Tests the Registry class in metrics module."""
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter(self):
+        """Tests if the counters are exposed by label values."""
+
+        rules = self.registry.register(Counter('rules_total', 'Rules.',
+                                               ['action']))
+        rules.inc(action='block')
+        rules.inc(2, action='block')
+        rules.inc(action='unblock')
+
+        self.assertEqual(self.registry.expose(),
+                         '# HELP rules_total Rules.\n'
+                         '# TYPE rules_total counter\n'
+                         'rules_total{action="block"} 3\n'
+                         'rules_total{action="unblock"} 1\n')
+        with self.assertRaises(ValueError):
+            rules.inc()
+
+    def test_gauge(self):
+        """Tests if the tracked gauges are read when exposed."""
+
+        depth = self.registry.register(Gauge('depth', 'Depth.', ['queue']))
+        items = [1, 2]
+        depth.track(lambda: len(items), queue='mitigation')
+        items.append(3)
+
+        self.assertIn('depth{queue="mitigation"} 3\n',
+                      self.registry.expose())
+
+        depth.track(None, queue='mitigation')
+        self.assertNotIn('depth{', self.registry.expose())
+
+    def test_histogram(self):
+        """Tests if the histogram buckets are cumulative."""
+
+        latency = self.registry.register(Histogram('latency_seconds',
+                                                   'Latency.',
+                                                   buckets=[0.1, 1]))
+        for value in [0.05, 0.5, 0.5, 5]:
+            latency.observe(value)
+
+        self.assertEqual(self.registry.expose(),
+                         '# HELP latency_seconds Latency.\n'
+                         '# TYPE latency_seconds histogram\n'
+                         'latency_seconds_bucket{le="0.1"} 1\n'
+                         'latency_seconds_bucket{le="1"} 3\n'
+                         'latency_seconds_bucket{le="+Inf"} 4\n'
+                         'latency_seconds_count 4\n'
+                         'latency_seconds_sum 6.05\n')
+
+    def test_precision(self):
+        """Tests if large values keep every digit."""
+
+        flows = self.registry.register(Counter('flows_total', 'Flows.'))
+        flows.inc(123456789)
+        latency = self.registry.register(Histogram('latency_seconds',
+                                                   'Latency.', buckets=[1]))
+        latency.observe(1234567.25)
+
+        self.assertIn('flows_total 123456789\n', self.registry.expose())
+        self.assertIn('latency_seconds_sum 1234567.25\n',
+                      self.registry.expose())
+
+
+# collections of test cases
+def registry_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestRegistry('test_counter'))
+    suite.addTest(TestRegistry('test_gauge'))
+    suite.addTest(TestRegistry('test_histogram'))
+    suite.addTest(TestRegistry('test_precision'))
+
+    return suite
+
+
+# outcome of the test cases
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(registry_suite())
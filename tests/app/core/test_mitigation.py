@@ -0,0 +1,525 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app import app, db
+from app.core import metrics, mitigation
+from app.core.mitigation import (ConnectionPool, MitigationDispatcher,
+                                 Mitigator, RuleCompactor, TopologyCache,
+                                 connection_pool, rule_compactor)
+from app.models import Intrusion
+
+
+class ControllerHandler(BaseHTTPRequestHandler):
+    """Answers any request with an empty JSON object, counting the
+    connections and closing them after some idle time."""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = 0.2
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        ControllerHandler.connections += 1
+
+    def do_GET(self):
+        self.answer()
+
+    def do_POST(self):
+        self.answer()
+
+    def answer(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+# unit tests
+class TestConnectionPool(unittest.TestCase):
+    """Tests the ConnectionPool class in mitigation module."""
+
+    def setUp(self):
+        """Starts the controller in a free port."""
+
+        ControllerHandler.connections = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ControllerHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.pool = ConnectionPool(*self.server.server_address, 2, 5)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        """Tests if the requests reuse the same connection."""
+
+        for _ in range(10):
+            status, body = self.pool.request('POST', '/', '{}', {})
+            self.assertEqual(status, 200)
+            self.assertEqual(body, b'{}')
+
+        self.assertEqual(self.pool.created, 1, 'connection not reused')
+        self.assertEqual(ControllerHandler.connections, 1)
+
+    def test_reconnect(self):
+        """Tests if a connection closed by the server is reconnected."""
+
+        self.assertEqual(self.pool.request('GET', '/', '{}', {})[0], 200)
+        time.sleep(0.5)
+
+        self.assertEqual(self.pool.request('GET', '/', '{}', {})[0], 200)
+        self.assertEqual(ControllerHandler.connections, 2)
+
+
+class DevicesPusher:
+    """Returns the devices as the Floodlight controller, counting the
+    downloads."""
+
+    def __init__(self):
+        self.downloads = 0
+        self.devices = [{'ipv4': ['10.0.0.1'], 'ipv6': ['fe80::1'],
+                         'attachmentPoint': [{'switch': '00:01'}]},
+                        {'ipv4': ['10.0.0.2'], 'ipv6': [],
+                         'attachmentPoint': []}]
+
+    def get(self):
+        self.downloads += 1
+
+        return {'devices': self.devices}
+
+
+class TestTopologyCache(unittest.TestCase):
+    """Tests the TopologyCache class in mitigation module."""
+
+    def setUp(self):
+        self.pusher = DevicesPusher()
+        self.topology = TopologyCache(self.pusher, 60, 0)
+
+    def test_lookup(self):
+        """Tests if the addresses are found with a single download."""
+
+        self.assertEqual(self.topology.lookup('10.0.0.1'), '00:01')
+        self.assertEqual(self.topology.lookup('fe80:0000:0000:0000:'
+                                              '0000:0000:0000:0001'), '00:01')
+        self.assertEqual(self.pusher.downloads, 1)
+        self.assertDictEqual(self.topology.stats(),
+                             {'hits': 1, 'misses': 1, 'addresses': 2})
+
+    def test_metrics(self):
+        """Tests if the hits and misses are exposed at the metrics."""
+
+        hits = metrics.topology_lookups.values.get(('hit',), 0)
+        misses = metrics.topology_lookups.values.get(('miss',), 0)
+        for address in ['10.0.0.1', '10.0.0.1', '10.0.0.4']:
+            self.topology.lookup(address)
+
+        exposed = metrics.registry.expose()
+        self.assertIn('ips_mitigation_topology_lookups_total{result="hit"} '
+                      f'{hits + 1}\n', exposed)
+        self.assertIn('ips_mitigation_topology_lookups_total{result="miss"} '
+                      f'{misses + 2}\n', exposed)
+
+    def test_miss(self):
+        """Tests if an unknown address causes a new download."""
+
+        self.assertIsNone(self.topology.lookup('10.0.0.2'))
+        self.pusher.devices.append({'ipv4': ['10.0.0.3'],
+                                    'attachmentPoint': [{'switch': '00:02'}]})
+
+        self.assertEqual(self.topology.lookup('10.0.0.3'), '00:02')
+        self.assertEqual(self.pusher.downloads, 2)
+
+
+class SlowMitigator:
+    """Blocks intrusions slowly, recording the maximum concurrency."""
+
+    def __init__(self):
+        self.running = 0
+        self.concurrency = 0
+        self.unblocked = list()
+        self.lock = threading.Lock()
+
+    def block_attack(self, intrusion):
+        with self.lock:
+            self.running += 1
+            self.concurrency = max(self.concurrency, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+
+        return f'block{intrusion.source_address.split(".")[-1]}'
+
+    def unblock(self, intrusion):
+        with self.lock:
+            self.unblocked.append(intrusion.rule)
+
+    def renew(self, intrusion):
+        self.unblock(intrusion)
+
+        return self.block_attack(intrusion)
+
+
+class TestMitigationDispatcher(unittest.TestCase):
+    """Tests the MitigationDispatcher class in mitigation module."""
+
+    def test_dispatch(self):
+        """Tests if the intrusions are blocked by the bounded number of
+        threads without blocking the submission."""
+
+        mitigator = SlowMitigator()
+        dispatcher = MitigationDispatcher(mitigator, 3)
+        dispatcher.start()
+
+        start = time.time()
+        for idx in range(12):
+            dispatcher.submit(Intrusion(source_address=f'10.0.0.{idx}',
+                                        destination_address='10.0.1.1',
+                                        protocol='TCP'))
+        self.assertLess(time.time() - start, 0.05, 'submission blocked')
+        dispatcher.stop()
+
+        results = dispatcher.collect()
+        self.assertEqual(mitigator.concurrency, 3)
+        self.assertEqual(len(results), 12)
+        self.assertIn((('10.0.0.5', '10.0.1.1', 'TCP'), 'block5'), results)
+        self.assertListEqual(dispatcher.collect(), [])
+
+    def test_retire(self):
+        """Tests if the expired intrusions are unblocked without results."""
+
+        mitigator = SlowMitigator()
+        dispatcher = MitigationDispatcher(mitigator, 2)
+        dispatcher.start()
+
+        for idx in range(4):
+            dispatcher.retire(Intrusion(source_address=f'10.0.0.{idx}',
+                                        destination_address='10.0.1.1',
+                                        protocol='TCP', rule=f'block{idx}'))
+        dispatcher.stop()
+
+        self.assertListEqual(sorted(mitigator.unblocked),
+                             ['block0', 'block1', 'block2', 'block3'])
+        self.assertListEqual(dispatcher.collect(), [])
+
+    def test_renew(self):
+        """Tests if an intrusion whose rule was removed by the switch is
+        unblocked and blocked again with a new rule."""
+
+        mitigator = SlowMitigator()
+        dispatcher = MitigationDispatcher(mitigator, 2)
+        dispatcher.start()
+
+        dispatcher.renew(Intrusion(source_address='10.0.0.7',
+                                   destination_address='10.0.1.1',
+                                   protocol='TCP', rule='block1'))
+        dispatcher.stop()
+
+        self.assertListEqual(mitigator.unblocked, ['block1'])
+        self.assertListEqual(dispatcher.collect(),
+                             [(('10.0.0.7', '10.0.1.1', 'TCP'), 'block7')])
+
+
+class RulesPusher:
+    """Records the rules pushed and deleted as the Floodlight controller."""
+
+    def __init__(self):
+        self.pushed = list()
+        self.deleted = list()
+        self.failures = 0
+
+    def post(self, rule):
+        if self.failures:
+            self.failures -= 1
+            return False
+        self.pushed.append(rule['ipv4_src'])
+
+        return True
+
+    def delete(self, rule):
+        self.deleted.append(rule['name'].split('_')[2])
+
+        return True
+
+
+class TestRuleCompactor(unittest.TestCase):
+    """Tests the RuleCompactor class in mitigation module."""
+
+    def setUp(self):
+        self.pusher = RulesPusher()
+        self.compactor = RuleCompactor(self.pusher, 24, 2)
+
+    def test_collapse(self):
+        """Tests if adjacent sources are merged and only the changed rules
+        are pushed."""
+
+        for address in ['10.0.0.0', '10.0.0.1', '10.0.0.2']:
+            self.compactor.add('00:01', address, '10.0.1.1')
+        self.compactor.add('00:01', '10.0.0.3', '10.0.1.1')
+
+        self.assertListEqual(self.pusher.pushed[-1:], ['10.0.0.0/30'])
+        self.assertListEqual(sorted(self.pusher.deleted[-2:]),
+                             ['10.0.0.0/31', '10.0.0.2/32'])
+        self.assertEqual(len(self.compactor.rules['00:01']), 1)
+
+    def test_max_rules(self):
+        """Tests if the sources are grouped in wider prefixes when the switch
+        has too many rules, but not shorter than the minimum, and the rules
+        still over the maximum are left out."""
+
+        self.compactor.widen = True
+        for address in ['10.0.0.1', '10.0.0.9', '10.0.0.17']:
+            self.assertTrue(self.compactor.add('00:01', address, '10.0.1.1'))
+        self.assertListEqual(sorted(self.compactor.rules['00:01']),
+                             ['block_00:01_10.0.0.0/28_10.0.1.1',
+                              'block_00:01_10.0.0.16/29_10.0.1.1'])
+
+        self.assertTrue(self.compactor.add('00:01', '10.0.1.1', '10.0.1.1'))
+        self.assertFalse(self.compactor.add('00:01', '10.0.2.1',
+                                            '10.0.1.1'))
+        self.assertListEqual(sorted(self.compactor.rules['00:01']),
+                             ['block_00:01_10.0.0.0/24_10.0.1.1',
+                              'block_00:01_10.0.1.0/24_10.0.1.1'])
+
+    def test_exact(self):
+        """Tests if the prefixes cover only blocked sources unless widened,
+        leaving out the sources over the maximum."""
+
+        for address in ['10.0.0.1', '10.0.0.9']:
+            self.assertTrue(self.compactor.add('00:01', address, '10.0.1.1'))
+        # the installed rules are kept before the new ones.
+        for address in ['10.0.0.17', '10.0.0.5']:
+            self.assertFalse(self.compactor.add('00:01', address,
+                                                '10.0.1.1'))
+
+        self.assertListEqual(sorted(self.compactor.rules['00:01']),
+                             ['block_00:01_10.0.0.1/32_10.0.1.1',
+                              'block_00:01_10.0.0.9/32_10.0.1.1'])
+        self.assertEqual(len(self.compactor.sources['00:01']['10.0.1.1']), 2)
+
+    def test_timeouts(self):
+        """Tests if the prefix rules expire as the rules of a source."""
+
+        compactor = RuleCompactor(self.pusher, 24, 2, idle_timeout=60,
+                                  hard_timeout=300)
+        compactor.add('00:01', '10.0.0.1', '10.0.1.1')
+
+        rule, = compactor.rules['00:01'].values()
+        self.assertEqual(rule['idle_timeout'], '60')
+        self.assertEqual(rule['hard_timeout'], '300')
+
+    def test_failed_push(self):
+        """Tests if a rule refused by the controller is not recorded and is
+        pushed again."""
+
+        self.pusher.failures = 1
+        self.compactor.add('00:01', '10.0.0.1', '10.0.1.1')
+        self.assertDictEqual(self.compactor.rules['00:01'], {})
+
+        self.compactor.add('00:01', '10.0.0.3', '10.0.1.1')
+        self.assertListEqual(sorted(self.pusher.pushed),
+                             ['10.0.0.1/32', '10.0.0.3/32'])
+        self.assertEqual(len(self.compactor.rules['00:01']), 2)
+
+    def test_restore(self):
+        """Tests if the sources blocked before a restart are pushed again and
+        can be unblocked."""
+
+        self.compactor.restore([('10.0.0.0', '10.0.1.1'),
+                                ('10.0.0.1', '10.0.1.1'),
+                                ('10.0.0.7', '10.0.1.1')],
+                               {'10.0.0.0': '00:01',
+                                '10.0.0.1': '00:01'}.get)
+        self.assertListEqual(self.pusher.pushed, ['10.0.0.0/31'])
+
+        self.compactor.remove('10.0.0.1', '10.0.1.1')
+        self.assertListEqual(list(self.compactor.rules['00:01']),
+                             ['block_00:01_10.0.0.0/32_10.0.1.1'])
+
+    def test_renew(self):
+        """Tests if a widened prefix removed by the switch is pushed again
+        although the prefixes did not change."""
+
+        self.compactor.widen = True
+        for address in ['10.0.0.1', '10.0.0.9', '10.0.0.17']:
+            self.compactor.add('00:01', address, '10.0.1.1')
+        pushed = len(self.pusher.pushed)
+
+        self.assertTrue(self.compactor.renew('00:01', '10.0.0.9',
+                                             '10.0.1.1'))
+        self.assertListEqual(self.pusher.pushed[pushed:], ['10.0.0.0/28'])
+        self.assertListEqual(sorted(self.compactor.rules['00:01']),
+                             ['block_00:01_10.0.0.0/28_10.0.1.1',
+                              'block_00:01_10.0.0.16/29_10.0.1.1'])
+
+    def test_unknown_switch(self):
+        """Tests if a source missing from the topology is not blocked nor
+        recorded by the prefix rules."""
+
+        mitigator = SimpleNamespace(
+            compactor=self.compactor,
+            get_switch=TopologyCache(DevicesPusher(), 60, 0).lookup)
+
+        self.assertIsNone(Mitigator.block_attack(
+            mitigator, Intrusion(source_address='10.0.0.9',
+                                 destination_address='10.0.1.1')))
+        self.assertListEqual(self.pusher.pushed, [])
+        self.assertDictEqual(self.compactor.sources, {})
+        self.assertEqual(Mitigator.block_attack(
+            mitigator, Intrusion(source_address='10.0.0.1',
+                                 destination_address='10.0.1.1')),
+            'compact')
+
+    def test_remove(self):
+        """Tests if an unblocked source is removed from its prefix."""
+
+        for address in ['10.0.0.0', '10.0.0.1']:
+            self.compactor.add('00:01', address, '10.0.1.1')
+        self.compactor.remove('10.0.0.1', '10.0.1.1')
+
+        self.assertListEqual(list(self.compactor.rules['00:01']),
+                             ['block_00:01_10.0.0.0/32_10.0.1.1'])
+        self.assertIn('10.0.0.0/31', self.pusher.deleted)
+
+
+class TestRestore(unittest.TestCase):
+    """Tests the rule_compactor function in mitigation module."""
+
+    def setUp(self):
+        """Initiates a database in a file, shared by the threads, with a
+        source blocked by a prefix rule."""
+
+        self.uri = app.config['SQLALCHEMY_DATABASE_URI']
+        self.file = tempfile.NamedTemporaryFile(suffix='.db')
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.file.name}'
+        db.session.remove()
+        db.create_all()
+        db.session.add(Intrusion(
+            start_time=datetime(2019, 1, 1), end_time=datetime(2019, 1, 1),
+            source_address='10.0.0.1', destination_address='10.0.1.1',
+            protocol='TCP', urg_flags=0, ack_flags=1, syn_flags=1,
+            fin_flags=0, rst_flags=0, psh_flags=0, source_port=b'',
+            destination_port=b'', duration=0, packets=1, bytes=40,
+            bytes_per_second=0, bytes_per_packets=40, packtes_per_second=0,
+            number_source_port=0, number_destination_port=0, flows=1,
+            rule='compact', model_id=1))
+        db.session.commit()
+
+        self.key = ('10.0.0.100', 8080)
+        self.pusher = RulesPusher()
+        self.release = threading.Event()
+        self.mitigator = SimpleNamespace(
+            controller_ip=self.key[0], controller_port=self.key[1],
+            post=self.pusher.post, delete=self.pusher.delete,
+            get_switch=lambda source: self.release.wait(5) and '00:01')
+
+    def tearDown(self):
+        self.release.set()
+        mitigation.compactors.pop(self.key, None)
+        mitigation.pools.pop(self.key, None)
+        db.session.remove()
+        db.drop_all()
+        app.config['SQLALCHEMY_DATABASE_URI'] = self.uri
+        self.file.close()
+
+    def test_lock(self):
+        """Tests if the restore does not hold the lock of the pools and the
+        other callers wait for it."""
+
+        restoring = threading.Thread(target=rule_compactor,
+                                     args=(self.mitigator,))
+        restoring.start()
+        while self.key not in mitigation.compactors:
+            time.sleep(0.01)
+
+        start = time.time()
+        connection_pool(*self.key)
+        self.assertLess(time.time() - start, 0.5, 'pools locked')
+
+        compactors = list()
+        waiting = threading.Thread(target=lambda: compactors.append(
+            rule_compactor(self.mitigator)))
+        waiting.start()
+        waiting.join(0.1)
+        self.assertTrue(waiting.is_alive(), 'restore not awaited')
+
+        self.release.set()
+        restoring.join()
+        waiting.join()
+        self.assertListEqual(self.pusher.pushed, ['10.0.0.1/32'])
+        self.assertIs(compactors[0], mitigation.compactors[self.key])
+
+
+# collections of test cases
+def connection_pool_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestConnectionPool('test_keep_alive'))
+    suite.addTest(TestConnectionPool('test_reconnect'))
+
+    return suite
+
+
+def topology_cache_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestTopologyCache('test_lookup'))
+    suite.addTest(TestTopologyCache('test_miss'))
+    suite.addTest(TestTopologyCache('test_metrics'))
+
+    return suite
+
+
+def mitigation_dispatcher_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestMitigationDispatcher('test_dispatch'))
+    suite.addTest(TestMitigationDispatcher('test_retire'))
+    suite.addTest(TestMitigationDispatcher('test_renew'))
+
+    return suite
+
+
+def rule_compactor_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestRuleCompactor('test_collapse'))
+    suite.addTest(TestRuleCompactor('test_max_rules'))
+    suite.addTest(TestRuleCompactor('test_exact'))
+    suite.addTest(TestRuleCompactor('test_timeouts'))
+    suite.addTest(TestRuleCompactor('test_failed_push'))
+    suite.addTest(TestRuleCompactor('test_restore'))
+    suite.addTest(TestRuleCompactor('test_renew'))
+    suite.addTest(TestRuleCompactor('test_unknown_switch'))
+    suite.addTest(TestRuleCompactor('test_remove'))
+
+    return suite
+
+
+def restore_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestRestore('test_lock'))
+
+    return suite
+
+
+# outcome of the test cases
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(connection_pool_suite())
+    runner.run(topology_cache_suite())
+    runner.run(mitigation_dispatcher_suite())
+    runner.run(rule_compactor_suite())
+    runner.run(restore_suite())
@@ -0,0 +1,133 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app.core import exporter, gatherer, parallel
+from app.core.preprocessing import Formatter, Modifier
+from benchmarks.generator import generate
+
+
+# unit tests
+class TestParallel(unittest.TestCase):
+    """Tests the parallel module."""
+
+    def setUp(self):
+        """Creates the raw CSV files and the destination directories."""
+
+        self.path = tempfile.mkdtemp() + '/'
+        self.files = ['first.csv', 'second.csv', 'third.csv']
+        for idx, file in enumerate(self.files):
+            generate(f'{self.path}{file}', 200, seed=idx)
+
+        os.makedirs(f'{self.path}serial/')
+        os.makedirs(f'{self.path}parallel/')
+        os.makedirs(f'{self.path}whole/')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def exported(self, path, file):
+        """Reads the modified flows exported to a CSV file."""
+
+        _, flows = gatherer.open_csv(path, file)
+
+        return Formatter(gather=False, train=True).format_flows(flows)
+
+    def test_preprocess_files(self):
+        """Tests if the worker processes export the same flows as a single
+        process."""
+
+        serial = parallel.preprocess_files(self.path, self.files,
+                                           f'{self.path}serial/', -1, 0, 5,
+                                           64, None, 1)
+        timings = parallel.preprocess_files(self.path, self.files,
+                                            f'{self.path}parallel/', -1, 0, 5,
+                                            64, None, 3)
+
+        self.assertListEqual([timing[:2] for timing in timings],
+                             [timing[:2] for timing in serial],
+                             'files preprocessed incorrectly')
+        for file, size, duration in timings:
+            name = f'{file.split(".csv")[0]}_s{size}.csv'
+            self.assertGreater(duration, 0)
+            # the ports sets are exported in the order of each process.
+            self.assertListEqual(
+                self.exported(f'{self.path}parallel/', name),
+                self.exported(f'{self.path}serial/', name),
+                'flows exported incorrectly')
+
+
+    def test_whole_file(self):
+        """Tests if the chunks export the same flows as the whole file
+        gathered, formatted, aggregated and exported at once."""
+
+        header, flows = gatherer.open_csv(self.path, 'first.csv')
+        formatter = Formatter()
+        header = formatter.format_header(header)
+        flows = formatter.format_flows(flows)
+        modifier = Modifier(label=0, threshold=5)
+        header = modifier.extend_header(header)
+        flows = modifier.aggregate_flows(flows)
+        name = f'first_s{len(flows)}.csv'
+        exporter.flows_csv(header, flows, f'{self.path}whole/', name)
+
+        (_, size, _), = parallel.preprocess_files(
+            self.path, ['first.csv'], f'{self.path}serial/', -1, 0, 5, 64,
+            None, 1)
+
+        self.assertEqual(size, len(flows))
+        self.assertListEqual(self.exported(f'{self.path}serial/', name),
+                             self.exported(f'{self.path}whole/', name),
+                             'flows exported incorrectly')
+
+    def test_partial_file(self):
+        """Tests if a file left by a failed run is replaced, and the file of
+        a failed run is removed."""
+
+        with open(f'{self.path}serial/first_s.csv', 'w') as partial:
+            partial.write('ts,te\n2019-01-01 00:00:00,\n')
+        (_, size, _), = parallel.preprocess_files(
+            self.path, ['first.csv'], f'{self.path}serial/', -1, 0, 5, 64,
+            None, 1)
+        (_, whole, _), = parallel.preprocess_files(
+            self.path, ['first.csv'], f'{self.path}whole/', -1, 0, 5, 64,
+            None, 1)
+
+        self.assertEqual(size, whole)
+        with open(f'{self.path}serial/first_s{size}.csv') as replaced, \
+                open(f'{self.path}whole/first_s{size}.csv') as fresh:
+            self.assertEqual(replaced.read(), fresh.read(),
+                             'partial file appended')
+
+        # a malformed flow after the first exported chunks.
+        with open(f'{self.path}second.csv') as raw:
+            lines = raw.readlines()
+        lines[100] = 'malformed' + lines[100][19:]
+        with open(f'{self.path}second.csv', 'w') as raw:
+            raw.writelines(lines)
+        with self.assertRaises(ValueError):
+            parallel.preprocess_files(self.path, ['second.csv'],
+                                      f'{self.path}parallel/', -1, 0, 5, 64,
+                                      None, 1)
+        self.assertListEqual(os.listdir(f'{self.path}parallel/'), [])
+
+
+# collections of test cases
+def parallel_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestParallel('test_preprocess_files'))
+    suite.addTest(TestParallel('test_whole_file'))
+    suite.addTest(TestParallel('test_partial_file'))
+
+    return suite
+
+
+# outcome of the test cases
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(parallel_suite())
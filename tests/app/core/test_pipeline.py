@@ -0,0 +1,213 @@
+import os
+import sys
+import threading
+import unittest
+from datetime import datetime
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app.core import metrics
+from app.core.pipeline import Pipeline, Window, WindowDetector, WindowQueue
+
+
+class BatchDetector:
+    """Detector that records the size of each batch and classifies the
+    flows with an odd number of packets as intrusions."""
+
+    def __init__(self):
+        self.batches = list()
+
+    def test(self, features):
+        self.batches.append(len(features))
+
+        return [feature[0] % 2 for feature in features]
+
+
+# unit tests
+class TestWindowQueue(unittest.TestCase):
+    """Tests the WindowQueue class in pipeline module."""
+
+    def test_drop_oldest(self):
+        """Tests if a full queue drops the oldest window."""
+
+        windows = WindowQueue('detection', 2, 'drop_oldest', 2)
+        for size in [1, 2, 3]:
+            windows.offer(Window([0]*size, True))
+
+        self.assertListEqual([windows.get().size, windows.get().size],
+                             [2, 3])
+
+    def test_sample(self):
+        """Tests if a full queue drops the oldest window and keeps one in
+        some flows of the new window."""
+
+        windows = WindowQueue('detection', 2, 'sample', 4)
+        for start in [0, 8, 16]:
+            windows.offer(Window(list(range(start, start + 8)), True))
+
+        self.assertListEqual(windows.get().flows, list(range(8, 16)))
+        window = windows.get()
+        self.assertListEqual(window.flows, [16, 20])
+        self.assertEqual(window.size, 8)
+
+    def test_sample_full(self):
+        """Tests if a full queue queues the sampled window without waiting
+        and counts the discarded flows."""
+
+        dropped_windows = metrics.dropped_windows.values.get(('detection',), 0)
+        dropped_flows = metrics.dropped_flows.values.get(('detection',), 0)
+        windows = WindowQueue('detection', 1, 'sample', 4)
+        windows.offer(Window(list(range(8)), True))
+        producer = threading.Thread(target=windows.offer,
+                                    args=(Window(list(range(8)), True),))
+        producer.start()
+        producer.join(1)
+
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(windows.qsize(), 1)
+        self.assertListEqual(windows.get().flows, [0, 4])
+        self.assertEqual(metrics.dropped_windows.values[('detection',)],
+                         dropped_windows + 1)
+        self.assertEqual(metrics.dropped_flows.values[('detection',)],
+                         dropped_flows + 8 + 6)
+
+    def test_policy(self):
+        """Tests if an unknown policy is refused."""
+
+        with self.assertRaises(ValueError):
+            WindowQueue('detection', 1, 'drop_newest', 2)
+
+    def test_sample_size(self):
+        """Tests if the sample policy refuses to keep every flow."""
+
+        for sample in [0, 1]:
+            with self.assertRaises(ValueError):
+                WindowQueue('detection', 1, 'sample', sample)
+        WindowQueue('detection', 1, 'block', 0)
+
+
+class TestPipeline(unittest.TestCase):
+    """Tests the Pipeline class in pipeline module."""
+
+    def test_order(self):
+        """Tests if every window is handled in order after the stop."""
+
+        handled = list()
+        pipeline = Pipeline(lambda flows, formatted: (flows, len(flows), {}),
+                            lambda window, detection: handled.append(
+                                (window.index, detection[0])),
+                            lambda: None, 1, 1, 'block', 2, 1)
+        pipeline.start()
+        for idx in range(20):
+            pipeline.submit([idx], index=idx)
+        pipeline.stop()
+
+        self.assertListEqual(handled, [(idx, [idx]) for idx in range(20)])
+
+    def test_idle_error(self):
+        """Tests if an error of the idle function does not stop the
+        mitigation."""
+
+        handled = list()
+        idled = threading.Event()
+
+        def idle():
+            idled.set()
+            raise RuntimeError('database is locked')
+
+        pipeline = Pipeline(lambda flows, formatted: (flows, len(flows), {}),
+                            lambda window, detection: handled.append(
+                                window.index),
+                            idle, 0.01, 1, 'block', 2, 1)
+        pipeline.start()
+        self.assertTrue(idled.wait(1))
+        for idx in range(5):
+            pipeline.submit([idx], index=idx)
+        stopper = threading.Thread(target=pipeline.stop)
+        stopper.start()
+        stopper.join(5)
+
+        self.assertFalse(stopper.is_alive())
+        self.assertListEqual(handled, list(range(5)))
+
+
+class TestWindowDetector(unittest.TestCase):
+    """Tests the WindowDetector class in pipeline module."""
+
+    def setUp(self):
+        """Initiates the formatted flows of five sources."""
+
+        self.flows = [[datetime(2019, 1, 1), datetime(2019, 1, 1),
+                       f'10.0.0.{idx}', '10.0.1.1', 'TCP', [0, 1, 0, 0, 1, 0],
+                       '50000', '80', 0, idx, 40 * idx]
+                      for idx in range(1, 6)]
+
+    def detect(self, batch_size):
+        """Detects the flows in batches, classifying by the packets."""
+
+        detector = BatchDetector()
+        intrusions, size, _ = WindowDetector(detector, [9], 1, batch_size)(
+            [flow[:] for flow in self.flows], True)
+
+        return [flow[2] for flow in intrusions], size, detector.batches
+
+    def test_batches(self):
+        """Tests if the last batch keeps the remaining flows and the
+        intrusions do not depend on the batch size."""
+
+        intrusions = ['10.0.0.1', '10.0.0.3', '10.0.0.5']
+        for batch_size, batches in [(1, [1, 1, 1, 1, 1]), (2, [2, 2, 1]),
+                                    (5, [5]), (7, [5])]:
+            self.assertTupleEqual(self.detect(batch_size),
+                                  (intrusions, 5, batches))
+
+    def test_empty(self):
+        """Tests if a window without flows is not classified."""
+
+        self.flows = list()
+
+        self.assertTupleEqual(self.detect(2), ([], 0, []))
+
+    def test_batch_size(self):
+        """Tests if a batch without flows is refused."""
+
+        with self.assertRaises(ValueError):
+            WindowDetector(BatchDetector(), [9], 1, 0)
+
+
+# collections of test cases
+def window_queue_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestWindowQueue('test_drop_oldest'))
+    suite.addTest(TestWindowQueue('test_sample'))
+    suite.addTest(TestWindowQueue('test_sample_full'))
+    suite.addTest(TestWindowQueue('test_policy'))
+    suite.addTest(TestWindowQueue('test_sample_size'))
+
+    return suite
+
+
+def window_detector_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestWindowDetector('test_batches'))
+    suite.addTest(TestWindowDetector('test_empty'))
+    suite.addTest(TestWindowDetector('test_batch_size'))
+
+    return suite
+
+
+def pipeline_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestPipeline('test_order'))
+    suite.addTest(TestPipeline('test_idle_error'))
+
+    return suite
+
+
+# outcome of the test cases
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(window_queue_suite())
+    runner.run(window_detector_suite())
+    runner.run(pipeline_suite())
@@ -1,14 +1,18 @@
 import os
+import shutil
 import sys
+import tempfile
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 
 base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
 sys.path.append(base_path)
 
-from app.core import gatherer
+from app.core import exporter, gatherer
 from app.core import util
+from app.core.columnar import FlowColumns
 from app.core.preprocessing import Formatter, Modifier, Extractor
+from benchmarks.generator import generate
 
 
 # defines the main paths use during the tests
@@ -17,6 +21,14 @@ modifier_path = f'{base_path}/tests/app/core/data/preprocessing/modifier/'
 extractor_path = f'{base_path}/tests/app/core/data/preprocessing/extractor/'
 
 
+def formatted_flow(second, source, destination_port='80'):
+    """Creates a formatted TCP flow started some seconds after 13:40."""
+
+    ts = datetime(2015, 11, 24, 13, 40) + timedelta(seconds=second)
+    return [ts, ts + timedelta(seconds=1), source, '10.0.1.1', 'TCP',
+            [0, 1, 0, 0, 1, 0], '50000', destination_port, 1, 2, 80]
+
+
 # unit tests
 class TestFormatter(unittest.TestCase):
     """Tests the Formatter class in preprocess module."""
@@ -92,6 +104,29 @@ class TestFormatter(unittest.TestCase):
         self.assertListEqual(self.flows[3][5], [0, 1, 0, 0, 0, 1])
 
 
+class TestBulkFormat(unittest.TestCase):
+    """Tests the bulk formatting of Formatter class in preprocess module."""
+
+    def setUp(self):
+        """Generates the raw CSV file, some flows with missing features."""
+
+        self.path = tempfile.mkdtemp() + '/'
+        generate(f'{self.path}flows.csv', 2000, missing=0.01)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_bulk_format(self):
+        """Tests if the bulk formatting matches the formatting flow by
+        flow."""
+
+        _, flows = gatherer.open_csv(self.path, 'flows.csv')
+        expt_flows = Formatter().format_flows([flow[:] for flow in flows])
+
+        self.assertListEqual(Formatter(bulk=True).format_flows(flows),
+                             expt_flows, 'bulk formatted incorrectly')
+
+
 class TestModifier(unittest.TestCase):
     """Tests the Modifier class in preprocess module."""
 
@@ -145,6 +180,65 @@ class TestModifier(unittest.TestCase):
                              'aggregation performed incorrectly in flows')
 
 
+class TestAggregation(unittest.TestCase):
+    """Tests the aggregate flows method of Modifier class in preprocess
+    module."""
+
+    def setUp(self):
+        """Initiates the flows of two keys, interleaved and with a flow of
+        the next minute."""
+
+        self.flows = [formatted_flow(1, '10.0.0.1'),
+                      formatted_flow(2, '10.0.0.2'),
+                      formatted_flow(3, '10.0.0.1', '443'),
+                      formatted_flow(4, '10.0.0.1', '443'),
+                      formatted_flow(5, '10.0.0.2'),
+                      formatted_flow(60, '10.0.0.1')]
+
+    def aggregations(self, threshold):
+        """Aggregates the flows and gets their source, start second, number
+        of destination ports and number of flows."""
+
+        return [(flow[2], flow[0].second, flow[15], flow[16]) for flow in
+                Modifier(label=0, threshold=threshold).aggregate_flows(
+                    self.flows)]
+
+    def test_threshold_zero(self):
+        """Tests if the threshold 0 aggregates every flow of a key in the
+        order of the first flow."""
+
+        self.assertListEqual(self.aggregations(0),
+                             [('10.0.0.1', 1, 2, 3), ('10.0.0.2', 2, 1, 2),
+                              ('10.0.0.1', 0, 1, 1)])
+
+    def test_threshold_one(self):
+        """Tests if the threshold 1 keeps each flow alone and in order."""
+
+        self.assertListEqual(self.aggregations(1),
+                             [('10.0.0.1', 1, 1, 1), ('10.0.0.2', 2, 1, 1),
+                              ('10.0.0.1', 3, 1, 1), ('10.0.0.1', 4, 1, 1),
+                              ('10.0.0.2', 5, 1, 1), ('10.0.0.1', 0, 1, 1)])
+
+    def test_threshold(self):
+        """Tests if the flow after the threshold starts a new aggregation,
+        placed by its first flow."""
+
+        self.assertListEqual(self.aggregations(2),
+                             [('10.0.0.1', 1, 2, 2), ('10.0.0.2', 2, 1, 2),
+                              ('10.0.0.1', 4, 1, 1), ('10.0.0.1', 0, 1, 1)])
+
+    def test_features(self):
+        """Tests if the features of an aggregation are summed and
+        recalculated."""
+
+        flow = Modifier(label=1, threshold=0).aggregate_flows(
+            self.flows)[0]
+
+        self.assertListEqual(flow[5], [0, 3, 0, 0, 3, 0])
+        self.assertSetEqual(flow[7], {'80', '443'})
+        self.assertListEqual(flow[8:], [4, 6, 240, 60, 40, 2, 1, 2, 3, 1])
+
+
 class TestExtractor(unittest.TestCase):
     """Tests the Extractor class in preprocess module."""
 
@@ -186,6 +280,230 @@ class TestExtractor(unittest.TestCase):
                             'features extracted incorrectly')
 
 
+class TestColumnar(unittest.TestCase):
+    """Tests the column-wise methods of the preprocess module against the
+    list format."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Initiates the parameters to feed the test functions."""
+
+        # gathering flows, some of them with missing features
+        cls.path = tempfile.mkdtemp() + '/'
+        generate(f'{cls.path}flows.csv', 2000, missing=0.01)
+        header, flows = gatherer.open_csv(cls.path, 'flows.csv')
+
+        # preprocessing flows in both formats
+        cls.columns = Formatter().format_columns([flow[:] for flow in flows])
+        cls.flows = Formatter().format_flows(flows)
+        cls.agg_columns = Modifier(label=0,
+                                   threshold=5).aggregate_columns(cls.columns)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.path)
+
+    def test_format_columns(self):
+        """Tests if the formatted columns match the formatted flows."""
+
+        self.assertListEqual(self.columns.to_flows(), self.flows,
+                             'formatted incorrectly')
+
+    def test_aggregate_columns(self):
+        """Tests if the aggregated columns match the aggregated flows."""
+
+        agg_flows = Modifier(label=0, threshold=5).aggregate_flows(
+            [flow[:] for flow in self.flows])
+
+        self.assertListEqual(self.agg_columns.to_flows(), agg_flows,
+                             'aggregated incorrectly')
+
+    def test_extract_columns(self):
+        """Tests if the features matrix matches the extracted features."""
+
+        extractor = Extractor([feature+7 for feature in range(1, 10)])
+        features, labels = extractor.extract_columns(self.agg_columns)
+        expt_features, expt_labels = extractor.extract_features_labels(
+            self.agg_columns.to_flows())
+
+        self.assertListEqual(features.tolist(), expt_features,
+                             'features extracted incorrectly')
+        self.assertListEqual(labels.tolist(), expt_labels,
+                             'labels extracted incorrectly')
+
+    def test_convert_flows(self):
+        """Tests if the conversion from the list format is reversible."""
+
+        self.assertListEqual(
+            FlowColumns.from_flows(self.flows).to_flows(), self.flows,
+            'formatted flows converted incorrectly')
+        self.assertListEqual(
+            FlowColumns.from_flows(self.agg_columns.to_flows()).to_flows(),
+            self.agg_columns.to_flows(),
+            'modified flows converted incorrectly')
+
+
+class TestChunks(unittest.TestCase):
+    """Tests the chunked gathering, preprocessing and exporting against the
+    whole file."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Generates the raw CSV file of 1000 flows and 3 summary lines."""
+
+        cls.path = tempfile.mkdtemp() + '/'
+        generate(f'{cls.path}flows.csv', 1000)
+        cls.header, cls.flows = gatherer.open_csv(cls.path, 'flows.csv')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.path)
+
+    def chunks(self, chunk_size, sample_size=-1, chunk_bytes=None):
+        """Reads the raw CSV file in chunks."""
+
+        header, chunks = gatherer.stream_csv(self.path, 'flows.csv',
+                                             sample_size, chunk_size,
+                                             chunk_bytes)
+        self.assertListEqual(header, self.header, 'header read incorrectly')
+
+        return list(chunks)
+
+    def test_stream_csv(self):
+        """Tests if the chunks have at most the chunk size and the same lines
+        of the whole file."""
+
+        chunks = self.chunks(300)
+
+        self.assertListEqual([len(chunk) for chunk in chunks],
+                             [300, 300, 300, 103])
+        self.assertListEqual(sum(chunks, []), self.flows,
+                             'chunks read incorrectly')
+
+    def test_stream_sample(self):
+        """Tests if the chunks stop at the sample size."""
+
+        chunks = self.chunks(300, sample_size=450)
+
+        self.assertListEqual([len(chunk) for chunk in chunks], [300, 150])
+        self.assertListEqual(sum(chunks, []),
+                             gatherer.open_csv(self.path, 'flows.csv',
+                                               450)[1],
+                             'sample read incorrectly')
+
+    def test_stream_bytes(self):
+        """Tests if the chunks end as soon as they reach the approximate
+        number of bytes."""
+
+        chunks = self.chunks(10000, chunk_bytes=4096)
+
+        def size(lines):
+            return sum(sum(map(len, line)) + len(line) for line in lines)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks[:-1]:
+            self.assertGreaterEqual(size(chunk), 4096)
+            self.assertLess(size(chunk[:-1]), 4096)
+        self.assertListEqual(sum(chunks, []), self.flows,
+                             'chunks read incorrectly')
+
+    def test_format_chunks(self):
+        """Tests if the formatted chunks match the whole formatted flows,
+        with the summary lines split by the last chunk."""
+
+        # the last chunk only has the last summary line.
+        for bulk in [False, True]:
+            formatted = Formatter(bulk=bulk).format_chunks(self.chunks(501))
+
+            self.assertListEqual(
+                sum(formatted, []),
+                Formatter(bulk=bulk).format_flows(
+                    [flow[:] for flow in self.flows]),
+                'chunks formatted incorrectly')
+
+    def test_aggregate_chunks(self):
+        """Tests if the aggregated chunks match the whole aggregated flows,
+        with the aggregations spread over many chunks."""
+
+        chunks = Formatter().format_chunks(self.chunks(64))
+        agg_flows = Modifier(label=0, threshold=5).aggregate_flows(
+            Formatter().format_flows([flow[:] for flow in self.flows]))
+
+        self.assertListEqual(
+            sum(Modifier(label=0, threshold=5).aggregate_chunks(chunks), []),
+            agg_flows, 'chunks aggregated incorrectly')
+
+    def test_aggregate_minutes(self):
+        """Tests if an aggregation crossing a chunk boundary is finished by
+        the flows two minutes later in the middle of a chunk."""
+
+        def flows():
+            return [formatted_flow(58, '10.0.0.1'),
+                    formatted_flow(59, '10.0.0.1', '443'),
+                    formatted_flow(60, '10.0.0.1'),
+                    formatted_flow(121, '10.0.0.2'),
+                    formatted_flow(122, '10.0.0.2')]
+
+        chunks = list(Modifier(label=0, threshold=0).aggregate_chunks(
+            [flows()[:1], flows()[1:3], flows()[3:]]))
+        agg_flows = Modifier(label=0, threshold=0).aggregate_flows(flows())
+
+        self.assertListEqual([[(flow[2], flow[0].minute, flow[16])
+                               for flow in chunk] for chunk in chunks],
+                             [[('10.0.0.1', 40, 2)],
+                              [('10.0.0.1', 41, 1), ('10.0.0.2', 42, 2)]])
+        self.assertListEqual(sum(chunks, []), agg_flows,
+                             'chunks aggregated incorrectly')
+
+    def test_aggregate_out_of_order(self):
+        """Tests if the flows out of order by a minute are aggregated as the
+        whole flows."""
+
+        def flows():
+            return [formatted_flow(1, '10.0.0.1'),
+                    formatted_flow(61, '10.0.0.1'),
+                    formatted_flow(2, '10.0.0.1'),
+                    formatted_flow(62, '10.0.0.2'),
+                    formatted_flow(3, '10.0.0.2')]
+
+        chunks = Modifier(label=0, threshold=0).aggregate_chunks(
+            [flows()[:2], flows()[2:]])
+        agg_flows = Modifier(label=0, threshold=0).aggregate_flows(flows())
+
+        self.assertEqual(len(agg_flows), 4)
+        self.assertCountEqual(sum(chunks, []), agg_flows,
+                              'chunks aggregated incorrectly')
+
+    def test_aggregate_late(self):
+        """Tests if a flow of a minute already aggregated is logged."""
+
+        flows = [formatted_flow(1, '10.0.0.1'),
+                 formatted_flow(121, '10.0.0.1'),
+                 formatted_flow(2, '10.0.0.1')]
+
+        with self.assertLogs('preprocessing', 'WARNING'):
+            chunks = list(Modifier(label=0, threshold=0).aggregate_chunks(
+                [flows]))
+        self.assertListEqual([flow[16] for flow in sum(chunks, [])],
+                             [1, 1, 1])
+
+    def test_flows_csv_chunks(self):
+        """Tests if the exported chunks match the exported whole flows."""
+
+        flows = Formatter().format_flows([flow[:] for flow in self.flows])
+        chunks = [flows[idx:idx+128] for idx in range(0, len(flows), 128)]
+
+        exporter.flows_csv(['ts'], flows, self.path, 'whole.csv')
+        size = exporter.flows_csv_chunks(['ts'], chunks, self.path,
+                                         'chunks.csv')
+
+        self.assertEqual(size, len(flows))
+        with open(f'{self.path}whole.csv') as whole, \
+                open(f'{self.path}chunks.csv') as chunked:
+            self.assertEqual(chunked.read(), whole.read(),
+                             'chunks exported incorrectly')
+
+
 # collections of test cases
 def formatter_suite():
     suite = unittest.TestSuite()
@@ -198,6 +516,13 @@ def formatter_suite():
     return suite
 
 
+def bulk_format_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestBulkFormat('test_bulk_format'))
+
+    return suite
+
+
 def modifier_suite():
     suite = unittest.TestSuite()
     suite.addTest(TestModifier('test_header_order'))
@@ -207,6 +532,16 @@ def modifier_suite():
     return suite
 
 
+def aggregation_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestAggregation('test_threshold_zero'))
+    suite.addTest(TestAggregation('test_threshold_one'))
+    suite.addTest(TestAggregation('test_threshold'))
+    suite.addTest(TestAggregation('test_features'))
+
+    return suite
+
+
 def extractor_suite():
     suite = unittest.TestSuite()
     suite.addTest(TestExtractor('test_extract_features_labels'))
@@ -215,9 +550,38 @@ def extractor_suite():
     return suite
 
 
+def columnar_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestColumnar('test_format_columns'))
+    suite.addTest(TestColumnar('test_aggregate_columns'))
+    suite.addTest(TestColumnar('test_extract_columns'))
+    suite.addTest(TestColumnar('test_convert_flows'))
+
+    return suite
+
+
+def chunks_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestChunks('test_stream_csv'))
+    suite.addTest(TestChunks('test_stream_sample'))
+    suite.addTest(TestChunks('test_stream_bytes'))
+    suite.addTest(TestChunks('test_format_chunks'))
+    suite.addTest(TestChunks('test_aggregate_chunks'))
+    suite.addTest(TestChunks('test_aggregate_minutes'))
+    suite.addTest(TestChunks('test_aggregate_out_of_order'))
+    suite.addTest(TestChunks('test_aggregate_late'))
+    suite.addTest(TestChunks('test_flows_csv_chunks'))
+
+    return suite
+
+
 # outcome of the test cases
 if __name__ == '__main__':
    runner = unittest.TextTestRunner()
    runner.run(formatter_suite())
+   runner.run(bulk_format_suite())
    runner.run(modifier_suite())
+   runner.run(aggregation_suite())
    runner.run(extractor_suite())
+   runner.run(columnar_suite())
+   runner.run(chunks_suite())
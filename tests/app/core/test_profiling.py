@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app.core.profiling import Profiler
+
+
+# unit tests
+class TestProfiler(unittest.TestCase):
+    """Tests the Profiler class in profiling module."""
+
+    def setUp(self):
+        self.profiler = Profiler()
+
+    def test_sample(self):
+        """Tests if every call is counted and one in each sample is
+        timed."""
+
+        @self.profiler.profile(sample=10)
+        def double(number):
+            return number * 2
+
+        self.assertListEqual([double(idx) for idx in range(100)],
+                             list(range(0, 200, 2)))
+
+        stats = self.profiler.snapshot()[double.profile]
+        self.assertEqual(stats['calls'], 100)
+        self.assertEqual(stats['sampled'], 10)
+
+    def test_configure(self):
+        """Tests if the configured sample is the default of the profiled
+        functions."""
+
+        @self.profiler.profile
+        def double(number):
+            return number * 2
+
+        self.profiler.configure(4)
+        for idx in range(20):
+            double(idx)
+
+        self.assertEqual(self.profiler.snapshot()[double.profile]['sampled'],
+                         5)
+
+    def test_percentiles(self):
+        """Tests if the percentiles are close to the durations."""
+
+        @self.profiler.profile(sample=1)
+        def sleep(duration):
+            time.sleep(duration)
+
+        for _ in range(19):
+            sleep(0.001)
+        sleep(0.05)
+
+        stats = self.profiler.snapshot()[sleep.profile]
+        self.assertGreaterEqual(stats['p50'], 0.001)
+        self.assertLess(stats['p50'], 0.01)
+        self.assertGreaterEqual(stats['p99'], 0.05)
+        self.assertAlmostEqual(stats['time'], 0.069, delta=0.03)
+        self.assertEqual(self.profiler.last(sleep)[1], stats['max'])
+
+    def test_threads(self):
+        """Tests if the calls of finished threads are merged."""
+
+        @self.profiler.profile(sample=1)
+        def work():
+            pass
+
+        threads = [threading.Thread(target=lambda: [work()
+                                                    for _ in range(100)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        work()
+
+        self.assertEqual(self.profiler.snapshot()[work.profile]['calls'],
+                         401)
+        self.assertEqual(len(self.profiler.tables), 1)
+        self.assertEqual(self.profiler.snapshot()[work.profile]['sampled'],
+                         401)
+
+
+# collections of test cases
+def profiler_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestProfiler('test_sample'))
+    suite.addTest(TestProfiler('test_configure'))
+    suite.addTest(TestProfiler('test_percentiles'))
+    suite.addTest(TestProfiler('test_threads'))
+
+    return suite
+
+
+# outcome of the test cases
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(profiler_suite())
@@ -0,0 +1,130 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+base_path = os.path.abspath(os.path.dirname('intrusion_prevention_system'))
+sys.path.append(base_path)
+
+from app import app, db
+from app.models import Intrusion
+
+
+def intrusion(idx, source, protocol='TCP'):
+    start = datetime(2019, 1, 1) + timedelta(minutes=idx)
+
+    return Intrusion(start_time=start, end_time=start + timedelta(minutes=1),
+                     source_address=source, destination_address='10.0.1.1',
+                     protocol=protocol, urg_flags=0, ack_flags=0,
+                     syn_flags=1, fin_flags=0, rst_flags=0, psh_flags=0,
+                     source_port=b'', destination_port=b'', duration=60,
+                     packets=1, bytes=40, bytes_per_second=0,
+                     bytes_per_packets=40, packtes_per_second=0,
+                     number_source_port=0, number_destination_port=0,
+                     flows=1, rule='no rule', model_id=1)
+
+
+# unit tests
+class TestIntrusions(unittest.TestCase):
+    """Tests the intrusions pages in mitigation routes."""
+
+    def setUp(self):
+        """Saves intrusions in an empty database in memory."""
+
+        self.uri = app.config['SQLALCHEMY_DATABASE_URI']
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.session.remove()
+        db.create_all()
+
+        sources = ['10.0.0.1', '10.0.0.2', '10.0.1.1', '10.1.0.1',
+                   '10.0.0.10']
+        for idx, source in enumerate(sources):
+            db.session.add(intrusion(idx, source,
+                                     'UDP' if idx % 2 else 'TCP'))
+        db.session.commit()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        app.config['SQLALCHEMY_DATABASE_URI'] = self.uri
+
+    def get(self, **args):
+        response = self.client.get('/mitigation/intrusions',
+                                   query_string=args)
+        self.assertEqual(response.status_code, 200)
+
+        return response.get_json()
+
+    def test_pages(self):
+        """Tests if the pages follow each other without repetitions."""
+
+        ids, following = list(), None
+        while True:
+            args = {'limit': 2}
+            if following:
+                args['after'] = following
+            data = self.get(**args)
+            ids.append([item['id'] for item in data['intrusions']])
+            following = data['next']
+            if following is None:
+                break
+
+        self.assertListEqual(ids, [[5, 4], [3, 2], [1]])
+
+    def test_sort(self):
+        """Tests if the pages sorted by time follow each other."""
+
+        data = self.get(sort='start_time', order='asc', limit=3)
+        self.assertListEqual([item['id'] for item in data['intrusions']],
+                             [1, 2, 3])
+        self.assertEqual(data['next'], '2019-01-01T00:02:00,3')
+
+        data = self.get(sort='start_time', order='asc', limit=3,
+                        after=data['next'])
+        self.assertListEqual([item['id'] for item in data['intrusions']],
+                             [4, 5])
+        self.assertIsNone(data['next'])
+
+    def test_filters(self):
+        """Tests if the address prefixes and the protocol are filtered."""
+
+        data = self.get(source='10.0.0')
+        self.assertListEqual([item['id'] for item in data['intrusions']],
+                             [5, 2, 1])
+
+        data = self.get(source='10.0.0.1', protocol='TCP')
+        self.assertListEqual([item['id'] for item in data['intrusions']],
+                             [5, 1])
+
+        data = self.get(destination='10.0.2')
+        self.assertListEqual(data['intrusions'], [])
+
+    def test_position(self):
+        """Tests if an invalid position is refused."""
+
+        response = self.client.get('/mitigation/intrusions',
+                                   query_string={'after': 'today,1',
+                                                 'sort': 'start_time'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get('/mitigation/intrusions',
+                                   query_string={'protocol': 'SCTP'})
+        self.assertIn('protocol', response.get_json()['errors'])
+
+
+# collections of test cases
+def intrusions_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(TestIntrusions('test_pages'))
+    suite.addTest(TestIntrusions('test_sort'))
+    suite.addTest(TestIntrusions('test_filters'))
+    suite.addTest(TestIntrusions('test_position'))
+
+    return suite
+
+
+# outcome of the test cases
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(intrusions_suite())